@@ -0,0 +1,255 @@
+"""
+前向自动微分（Automatic Differentiation）
+功能：用对偶数 a + b·ε（ε² = 0）在原函数 AST 上单遍求值，同时得到 f(x) 与 f'(x)
+无需构造符号导函数，避免求导后语法树膨胀
+"""
+import math
+import numpy as np
+from parser import *
+from lexer import TokenType
+from evaluator import Evaluator
+
+class Dual:
+    """对偶数：value 为函数值，deriv 为导数值（可以是标量或 NumPy 数组）"""
+    __slots__ = ('value', 'deriv')
+
+    def __init__(self, value, deriv):
+        self.value = value
+        self.deriv = deriv
+
+    def __repr__(self):
+        return f"Dual({self.value}, {self.deriv})"
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value + other.value, self.deriv + other.deriv)
+        return Dual(self.value + other, self.deriv)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value - other.value, self.deriv - other.deriv)
+        return Dual(self.value - other, self.deriv)
+
+    def __rsub__(self, other):
+        return Dual(other - self.value, -self.deriv)
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value * other.value,
+                        self.deriv * other.value + self.value * other.deriv)
+        return Dual(self.value * other, self.deriv * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value / other.value,
+                        (self.deriv * other.value - self.value * other.deriv) / (other.value * other.value))
+        return Dual(self.value / other, self.deriv / other)
+
+    def __rtruediv__(self, other):
+        return Dual(other / self.value, -other * self.deriv / (self.value * self.value))
+
+    def __neg__(self):
+        return Dual(-self.value, -self.deriv)
+
+def _value(u):
+    """对偶数或常数的函数值部分"""
+    return u.value if isinstance(u, Dual) else u
+
+def _pow(base, exponent):
+    """幂（0 的负数次幂报错，而不是抛出 ZeroDivisionError）"""
+    try:
+        return base ** exponent
+    except ZeroDivisionError:
+        raise Exception("0 的负数次幂无定义")
+
+def _as_array(u):
+    """函数值与导数值都转为浮点数组（对偶数或常数）"""
+    if isinstance(u, Dual):
+        return Dual(np.asarray(u.value, dtype=float), np.asarray(u.deriv, dtype=float))
+    return np.asarray(u, dtype=float)
+
+class DualEvaluator(Evaluator):
+    """
+    对偶数求值器（标量）
+    与 Evaluator 相同的遍历与错误处理，结果为 Dual(f(x), f'(x))，
+    表达式不含 x 时返回普通数值
+    """
+    _sin = staticmethod(math.sin)
+    _cos = staticmethod(math.cos)
+    _log = staticmethod(math.log)
+
+    def eval_variable(self, node):
+        """变量 x 的导数为 1"""
+        if self.x_value is None:
+            raise Exception("变量 x 未赋值")
+        return Dual(self.x_value, 1.0)
+
+    def eval_binary_op(self, node, left, right):
+        """求值二元运算节点"""
+        if node.op == TokenType.PLUS:
+            return left + right
+        elif node.op == TokenType.MINUS:
+            return left - right
+        elif node.op == TokenType.MULTIPLY:
+            return left * right
+        elif node.op == TokenType.DIVIDE:
+            return self._divide(left, right)
+        elif node.op == TokenType.POWER:
+            return self._power(left, right)
+        else:
+            raise Exception(f"未知运算符: {node.op}")
+
+    def eval_function(self, node, args):
+        """求值函数节点（链式法则）"""
+        if node.name == TokenType.SIN:
+            if len(node.args) != 1:
+                raise Exception("sin 函数需要 1 个参数")
+            u = args[0]
+            return self._chain(u, self._sin, self._cos)
+
+        elif node.name == TokenType.COS:
+            if len(node.args) != 1:
+                raise Exception("cos 函数需要 1 个参数")
+            u = args[0]
+            return self._chain(u, self._cos, lambda v: -self._sin(v))
+
+        elif node.name == TokenType.LOG:
+            if len(node.args) == 1:
+                return self._ln(args[0])
+            elif len(node.args) == 2:
+                base = args[0]
+                arg = args[1]
+                self._check_log_base(base)
+                # log_a(u) = ln(u) / ln(a)
+                return self._ln(arg) / self._ln(base)
+            else:
+                raise Exception("log 函数需要 1 或 2 个参数")
+
+        else:
+            raise Exception(f"未知函数: {node.name}")
+
+    def _chain(self, u, f, df):
+        """f(u) 及其导数 f'(u)·u'"""
+        if isinstance(u, Dual):
+            return Dual(f(u.value), df(u.value) * u.deriv)
+        return f(u)
+
+    def _divide(self, left, right):
+        """除法（除数为零时报错）"""
+        if _value(right) == 0:
+            raise Exception("除数不能为零")
+        return left / right
+
+    def _ln(self, u):
+        """自然对数（参数必须为正）"""
+        if _value(u) <= 0:
+            raise Exception("对数函数参数必须大于 0")
+        return self._chain(u, self._log, lambda v: 1 / v)
+
+    def _check_log_base(self, base):
+        """检查对数底数"""
+        b = _value(base)
+        if b <= 0 or b == 1:
+            raise Exception("对数底数必须大于 0 且不等于 1")
+
+    def _power(self, base, exponent):
+        """
+        幂运算：
+        - f^c:   c * f^(c-1) * f'
+        - a^g:   a^g * ln(a) * g'
+        - f^g:   f^g * (g' * ln(f) + g * f'/f)
+        """
+        if not isinstance(exponent, Dual):
+            if not isinstance(base, Dual):
+                return _pow(base, exponent)
+            value = _pow(base.value, exponent)
+            try:
+                slope = base.value ** (exponent - 1)
+            except ZeroDivisionError:
+                slope = math.nan  # 导数在 0 处无界（如 x^0.5），与数组模式相同记为 NaN
+            return Dual(value, exponent * slope * base.deriv)
+        power = _pow(_value(base), exponent.value)
+        return Dual(power, power * (self._ln(base) * exponent).deriv)
+
+class VectorDualEvaluator(DualEvaluator):
+    """
+    对偶数求值器（NumPy 数组）
+    x 为数组，定义域错误不抛异常，对应位置记为 NaN
+    """
+    _sin = staticmethod(np.sin)
+    _cos = staticmethod(np.cos)
+    _log = staticmethod(np.log)
+
+    def __init__(self, x_values):
+        super().__init__(x_value=np.asarray(x_values, dtype=float))
+
+    def evaluate(self, node):
+        """求值 AST 节点，忽略浮点警告"""
+        with np.errstate(all='ignore'):
+            return super().evaluate(node)
+
+    def _mask(self, result, invalid):
+        """invalid 处置为 NaN"""
+        if isinstance(result, Dual):
+            return Dual(np.where(invalid, np.nan, result.value),
+                        np.where(invalid, np.nan, result.deriv))
+        return np.where(invalid, np.nan, result)
+
+    def _divide(self, left, right):
+        # 先转为浮点数组：导数部分可能是 Python 浮点数（如 x 的导数 1.0），
+        # 除数为 Python 的 0.0（常数 1/0，或折叠为零的多项式）时 / 会抛出 ZeroDivisionError
+        left, right = _as_array(left), _as_array(right)
+        return self._mask(left / right, _value(right) == 0)
+
+    def _ln(self, u):
+        return self._mask(self._chain(u, self._log, lambda v: 1 / v), _value(u) <= 0)
+
+    def _check_log_base(self, base):
+        # 非法底数由 _ln 与除法的掩码处理（ln(1) = 0 作除数）
+        pass
+
+    def _power(self, base, exponent):
+        if isinstance(base, Dual):
+            base = Dual(np.asarray(base.value, dtype=float), base.deriv)
+        else:
+            base = np.asarray(base, dtype=float)
+        # pow(1, nan) 与 pow(nan, 0) 为 1：底数或指数无定义处仍记为 NaN
+        undefined = np.isnan(_value(base)) | np.isnan(_value(exponent))
+        if not isinstance(exponent, Dual):
+            return self._mask(super()._power(base, exponent), undefined)
+        power = np.power(_value(base), exponent.value)
+        log_term = self._ln(base) * exponent
+        deriv = log_term.deriv if isinstance(log_term, Dual) else 0.0
+        return self._mask(Dual(power, power * deriv), undefined)
+
+def value_and_derivative(node, x_value):
+    """
+    在一点处同时计算 f(x) 与 f'(x)
+    返回：(函数值, 导数值)；出错时抛出与 Evaluator 相同的异常
+    """
+    result = DualEvaluator(x_value=x_value).evaluate(node)
+    if isinstance(result, Dual):
+        return result.value, result.deriv
+    return result, 0.0
+
+def evaluate_dual_vectorized(node, x_values):
+    """
+    对一组 x 值同时计算 f(x) 与 f'(x)
+    返回：(y, dy) 两个与 x_values 形状相同的数组，无定义或溢出的点为 NaN
+    （函数值无定义处导数值也为 NaN）
+    """
+    x_values = np.asarray(x_values, dtype=float)
+    result = VectorDualEvaluator(x_values).evaluate(node)
+    if isinstance(result, Dual):
+        y, dy = result.value, result.deriv
+    else:
+        y, dy = result, 0.0
+    y = np.array(np.broadcast_to(y, x_values.shape), dtype=float)
+    dy = np.array(np.broadcast_to(dy, x_values.shape), dtype=float)
+    y[~np.isfinite(y)] = np.nan
+    dy[~np.isfinite(dy) | np.isnan(y)] = np.nan
+    return y, dy
@@ -0,0 +1,368 @@
+"""
+性能基准脚本
+功能：对比不同求值方式在测试表达式上的耗时
+用法：python benchmark.py
+"""
+import math
+import pickle
+import shutil
+import tempfile
+import timeit
+from lexer import Lexer
+from parser import Parser
+import numpy as np
+from evaluator import (Evaluator, VectorEvaluator, partial_evaluate, format_result, format_results,
+                       evaluate_vectorized)
+from compiler import Compiler, compile_ast
+from traversal import postorder
+from derivative import Derivative, ast_to_string, format_with_bindings
+from simplifier import simplify, count_nodes
+from taylor import derivatives_at
+from solver import analyze, find_zeros, dual_function
+from integration import integrate, integrate_function
+from interval import interval_function
+from sampler import TileCache
+from expression_cache import ExpressionCache, DerivativeCache
+from disk_cache import DiskCache
+from bytecode import Bytecode, compile_bytecode
+
+# 与 test_calculator.py 相同的测试用例
+EXPRESSIONS = [
+    ("x^2", 3),
+    ("x^2 + sin(x)", math.pi),
+    ("2^x", 3),
+    ("sin(x) + cos(x)", 0),
+    ("log(x)", math.e),
+    ("x^3 + 2*x^2 - 5*x + 1", 2),
+    ("sin(x^2)", 1),
+]
+
+def parse(expr):
+    """解析表达式为 AST"""
+    return Parser(Lexer(expr).tokenize()).parse()
+
+def best_time(func, number):
+    """多次重复取最短耗时，返回单次调用的微秒数"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+def generated_expression(terms):
+    """生成长表达式（模拟程序生成的输入）"""
+    return " + ".join(f"sin({i}.5*x^2) * log(2, x + {i})" for i in range(terms))
+
+def bench_lexer(number=20):
+    """长表达式的词法分析：紧凑 Token 序列 vs 惰性模式（微秒）"""
+    print(f"\n{'='*60}")
+    print("词法分析：tokenize vs iter_tokens（微秒）")
+    print(f"{'字符数':>8}{'Token 数':>10}{'tokenize':>12}{'iter_tokens':>14}")
+    for terms in (10, 120, 1000):
+        expr = generated_expression(terms)
+        t_list = best_time(lambda: Lexer(expr).tokenize(), number)
+        t_lazy = best_time(lambda: list(Lexer(expr).iter_tokens()), number)
+        print(f"{len(expr):>8}{len(Lexer(expr).tokenize()):>10}{t_list:>12.1f}{t_lazy:>14.1f}")
+
+def bench_parser(number=3):
+    """深层嵌套与长表达式的语法分析（毫秒）"""
+    print(f"\n{'='*60}")
+    print("语法分析：深层与宽表达式（毫秒，不含词法分析）")
+    print(f"{'输入':<24}{'Token 数':>10}{'耗时':>10}{'每 Token (微秒)':>18}")
+    cases = [
+        ("嵌套括号 x 5000", "(" * 5000 + "x" + ")" * 5000),
+        ("嵌套 sin x 2000", "sin(" * 2000 + "x" + ")" * 2000),
+        ("^ 链 x 5000", "x^" * 5000 + "x"),
+        ("一元负号 x 5000", "-" * 5000 + "x"),
+        ("宽表达式 x 1000 项", generated_expression(1000)),
+    ]
+    for name, expr in cases:
+        tokens = Lexer(expr).tokenize()
+        t = best_time(lambda: Parser(tokens).parse(), number) / 1000
+        print(f"{name:<24}{len(tokens):>10}{t:>10.2f}{t * 1000 / len(tokens):>18.2f}")
+
+def bench_traversal(number=3):
+    """深层语法树上的求值、求导与打印（毫秒）"""
+    print(f"\n{'='*60}")
+    print("显式栈遍历：深层语法树（毫秒）")
+    print(f"{'输入':<24}{'节点数':>10}{'求值':>10}{'求导':>10}{'打印':>10}")
+    cases = [
+        ("嵌套 sin x 5000", "sin(" * 5000 + "x" + ")" * 5000),
+        ("^ 链 x 2000", "x^" * 2000 + "x"),
+        ("宽表达式 x 1000 项", generated_expression(1000)),
+    ]
+    for name, expr in cases:
+        ast = parse(expr)
+        t_eval = best_time(lambda: Evaluator(0.5).evaluate(ast), number) / 1000
+        t_diff = best_time(lambda: Derivative.differentiate(ast), number) / 1000
+        t_print = best_time(lambda: ast_to_string(ast), number) / 1000
+        print(f"{name:<24}{count_nodes(ast):>10}{t_eval:>10.2f}{t_diff:>10.2f}{t_print:>10.2f}")
+
+def bench_compiler(number=20000):
+    """树遍历求值器 vs 闭包编译器"""
+    print(f"\n{'='*60}")
+    print("标量求值：Evaluator vs compile_ast（单次调用，微秒）")
+    print(f"{'表达式':<28}{'Evaluator':>12}{'编译后':>12}{'加速比':>10}")
+    for expr, x_value in EXPRESSIONS:
+        ast = parse(expr)
+        func = compile_ast(ast)
+        assert math.isclose(func(x_value), Evaluator(x_value=x_value).evaluate(ast))
+        
+        t_tree = best_time(lambda: Evaluator(x_value=x_value).evaluate(ast), number)
+        t_compiled = best_time(lambda: func(x_value), number)
+        print(f"{expr:<30}{t_tree:>12.3f}{t_compiled:>12.3f}{t_tree / t_compiled:>9.1f}x")
+
+def _vector_postorder(ast, xs):
+    """不做部分求值的向量化求值"""
+    with np.errstate(all='ignore'):
+        return postorder(ast, VectorEvaluator(xs)._visit)
+
+def bench_partial_evaluation(number=2000):
+    """部分求值：常数子树折叠与 log(a, f) 底数外提（微秒）"""
+    print(f"\n{'='*60}")
+    print("部分求值：原始语法树 vs 折叠后（微秒）")
+    print(f"{'表达式':<32}{'求值方式':<12}{'原始':>10}{'折叠后':>10}{'加速比':>10}")
+    xs = np.linspace(-10, 10, 1000)
+    for expr in ["sin(x) * log(2, 10) + cos(pi/3)", "log(2, x) + (pi/4)^2 * x", generated_expression(20)]:
+        ast = parse(expr)
+        folded = partial_evaluate(ast)
+        raw_func = Compiler.compile(ast)
+        func = compile_ast(ast)
+        cases = [
+            ("Evaluator", lambda: postorder(ast, Evaluator(1.5)._visit),
+             lambda: Evaluator(1.5).evaluate(ast)),
+            ("编译后", lambda: raw_func(1.5), lambda: func(1.5)),
+            ("向量化 1000", lambda: _vector_postorder(ast, xs), lambda: VectorEvaluator(xs).evaluate(ast)),
+        ]
+        name = expr if len(expr) <= 32 else f"{count_nodes(ast)} 节点 → {count_nodes(folded)} 节点"
+        for label, raw, optimized in cases:
+            t_raw = best_time(raw, number)
+            t_folded = best_time(optimized, number)
+            print(f"{name:<32}{label:<12}{t_raw:>10.2f}{t_folded:>10.2f}{t_raw / t_folded:>9.1f}x")
+            name = ""
+
+def bench_polynomial(number=2000):
+    """多项式：秦九韶法（标量）与 Estrin 法（数组）求值（微秒）"""
+    print(f"\n{'='*60}")
+    print("多项式求值：原始语法树 vs 系数形式（微秒）")
+    print(f"{'表达式':<32}{'求值方式':<12}{'原始':>10}{'系数形式':>10}{'加速比':>10}")
+    xs = np.linspace(-2, 2, 1000)
+    degree_ten = " + ".join(f"{k + 1}*x^{k}" for k in range(11))
+    for expr in ["x^3 + 2*x^2 - 5*x + 1", "sin(x)^2 + x^4", degree_ten]:
+        ast = parse(expr)
+        raw_func = Compiler.compile(ast)
+        func = compile_ast(ast)
+        cases = [
+            ("编译后", lambda: raw_func(1.5), lambda: func(1.5)),
+            ("向量化 1000", lambda: _vector_postorder(ast, xs), lambda: VectorEvaluator(xs).evaluate(ast)),
+        ]
+        name = expr if len(expr) <= 32 else f"{len(expr)} 字符的 10 次多项式"
+        for label, raw, optimized in cases:
+            t_raw = best_time(raw, number)
+            t_poly = best_time(optimized, number)
+            print(f"{name:<32}{label:<12}{t_raw:>10.2f}{t_poly:>10.2f}{t_raw / t_poly:>9.1f}x")
+            name = ""
+
+def bench_simplifier(max_order=5):
+    """各阶导数化简前后的节点数"""
+    print(f"\n{'='*60}")
+    print("高阶导数节点数：直接求导 vs 每阶化简")
+    for expr, _ in EXPRESSIONS:
+        raw = simplified = parse(expr)
+        counts = []
+        for order in range(1, max_order + 1):
+            raw = Derivative.differentiate(raw)
+            simplified = simplify(Derivative.differentiate(simplified))
+            counts.append(f"{count_nodes(raw)}→{count_nodes(simplified)}")
+        print(f"{expr:<28}" + "  ".join(counts))
+
+def symbolic_derivatives(ast, x_value, order, simplified):
+    """逐阶符号求导并求值，得到 0..N 阶导数"""
+    values = [Evaluator(x_value=x_value).evaluate(ast)]
+    for _ in range(order):
+        ast = Derivative.differentiate(ast)
+        if simplified:
+            ast = simplify(ast)
+        values.append(Evaluator(x_value=x_value).evaluate(ast))
+    return values
+
+def bench_taylor(max_order=10, raw_max_order=5):
+    """x0 处 0..N 阶导数：重复符号求导 vs 泰勒级数单遍求值（毫秒）"""
+    print(f"\n{'='*60}")
+    print("0..N 阶导数：符号求导（不化简 / 每阶化简） vs 泰勒级数（毫秒）")
+    for expr in ["sin(x^2)", "x^x", "log(x) * cos(x)"]:
+        ast = parse(expr)
+        x0 = 1.3
+        print(f"{expr}")
+        print(f"{'N':>4}{'不化简':>12}{'每阶化简':>12}{'泰勒':>10}")
+        for order in range(1, max_order + 1):
+            taylor = derivatives_at(ast, x0, order)
+            t_taylor = best_time(lambda: derivatives_at(ast, x0, order), 20) / 1000
+            simplified = symbolic_derivatives(ast, x0, order, simplified=True)
+            assert all(math.isclose(a, b, rel_tol=1e-6) for a, b in zip(simplified, taylor))
+            t_simplified = best_time(lambda: symbolic_derivatives(ast, x0, order, True), 1) / 1000
+            if order <= raw_max_order:
+                t_raw = best_time(lambda: symbolic_derivatives(ast, x0, order, False), 1) / 1000
+                raw = f"{t_raw:.3f}"
+            else:
+                raw = "-"
+            print(f"{order:>4}{raw:>12}{t_simplified:>12.3f}{t_taylor:>10.3f}")
+
+def bench_printer(max_order=5):
+    """未化简的高阶导数：完全展开输出 vs 重复子式以中间变量输出（字符数与毫秒）"""
+    print(f"\n{'='*60}")
+    print("未化简高阶导数的打印：展开 vs 中间变量")
+    print(f"{'表达式':<16}{'阶':>4}{'展开字符数':>14}{'毫秒':>10}{'中间变量字符数':>16}{'毫秒':>10}")
+    for expr in ["x^x", "sin(x^2)", "log(2, x) * x^3"]:
+        derivative = parse(expr)
+        name = expr
+        for order in range(1, max_order + 1):
+            derivative = Derivative.differentiate(derivative)
+            t_full = best_time(lambda: ast_to_string(derivative), 3) / 1000
+            t_let = best_time(lambda: format_with_bindings(derivative, "f(x)"), 3) / 1000
+            full = len(ast_to_string(derivative))
+            let = len(format_with_bindings(derivative, "f(x)"))
+            print(f"{name:<16}{order:>4}{full:>14}{t_full:>10.2f}{let:>16}{t_let:>10.2f}")
+            name = ""
+
+def bench_format(rows=100000):
+    """函数值表整列格式化：逐个 format_result vs 向量化 format_results（毫秒）"""
+    print(f"\n{'='*60}")
+    print(f"{rows} 个值的格式化（毫秒）")
+    xs = np.linspace(-10, 10, rows)
+    for expr in ["x^2 / 4", "sin(x)", "x * pi / 6"]:
+        values = VectorEvaluator(xs).evaluate(parse(expr))
+        t_scalar = best_time(lambda: [format_result(v) for v in values.tolist()], 1) / 1000
+        t_vector = best_time(lambda: format_results(values), 1) / 1000
+        print(f"{expr:<16}逐个 {t_scalar:>8.1f}  向量化 {t_vector:>8.1f}  加速比 {t_scalar / t_vector:.1f}x")
+
+def bench_solver():
+    """求根：网格变号扫描 + 批量牛顿迭代（毫秒）"""
+    print(f"\n{'='*60}")
+    print("求根与特征点（毫秒）")
+    for expr, interval in [("sin(x^2)", (-30, 30)), ("sin(x^2)", (-60, 60)), ("x * sin(1/x)", (0.01, 1)),
+                           ("x^3 - 3*x", (-10, 10))]:
+        ast = parse(expr)
+        func = dual_function(ast)
+        analyze(ast, interval)  # 预先求出并缓存导函数
+        t_roots = best_time(lambda: find_zeros(func, interval), 3) / 1000
+        t_all = best_time(lambda: analyze(ast, interval), 3) / 1000
+        features = analyze(ast, interval)
+        print(f"{expr:<14}{str(interval):<14}根 {len(features.roots):>5} 个 {t_roots:>7.1f}    "
+              f"根+极值+拐点 {t_all:>7.1f}")
+
+def bench_interval():
+    """区间求值剪枝：求根网格与绘图采样中实际求值的点数，以及求根耗时（毫秒）"""
+    print(f"\n{'='*60}")
+    print("区间剪枝（求值点数：不剪枝 → 剪枝）")
+    print(f"{'表达式':<16}{'区间':<16}{'求根网格':>18}{'求根耗时':>16}{'绘图采样':>16}")
+    for expr, interval in [("log(x) + 1/x", (-1000, 1000)), ("log(x - 500)", (-1000, 1000)),
+                           ("e^x - 2", (-50, 50)), ("sin(x^2)", (0, 30))]:
+        ast = parse(expr)
+        bounds = interval_function(ast)
+        dual = dual_function(ast)
+        curve = lambda x: evaluate_vectorized(ast, x)
+        counts = []
+        def counting(func):
+            counts.append(0)
+            def wrapped(x):
+                counts[-1] += len(x)
+                return func(x)
+            return wrapped
+
+        for b in (None, bounds):
+            find_zeros(counting(dual), interval, bounds=b)
+        for b in (None, bounds):
+            TileCache().sample(ast, counting(curve), interval, 2000, bounds=b)
+        grid, samples = counts[:2], counts[2:]
+        t_plain = best_time(lambda: find_zeros(dual, interval), 3) / 1000
+        t_pruned = best_time(lambda: find_zeros(dual, interval, bounds=bounds), 3) / 1000
+        print(f"{expr:<16}{str(interval):<16}{grid[0]:>8} → {grid[1]:<7}{t_plain:>7.2f} → {t_pruned:<6.2f}"
+              f"{samples[0]:>7} → {samples[1]}")
+
+def bench_integration(tolerance=1e-10):
+    """定积分：逐点 Evaluator 循环 vs 整批向量化求值（同一算法，毫秒）"""
+    print(f"\n{'='*60}")
+    print(f"定积分（容差 {tolerance:g}，毫秒）")
+    print(f"{'被积函数':<22}{'区间':<12}{'求值点数':>10}{'逐点循环':>12}{'向量化':>10}{'加速比':>10}")
+    for expr, a, b in [("x^2 + sin(x)", 0, math.pi), ("log(x)", 0, 1), ("sin(x^2)", 0, 30),
+                       ("x * log(x) * cos(x)", 0, 2)]:
+        ast = parse(expr)
+        scalar = lambda xs: np.array([Evaluator(x_value=x).evaluate(ast) for x in xs.tolist()])
+        result = integrate(ast, a, b, tolerance)
+        t_loop = best_time(lambda: integrate_function(scalar, a, b, tolerance), 1) / 1000
+        t_vector = best_time(lambda: integrate(ast, a, b, tolerance), 3) / 1000
+        interval = f"[{a:g}, {b:.4g}]"
+        print(f"{expr:<22}{interval:<12}{result.evaluations:>10}{t_loop:>12.1f}{t_vector:>10.2f}"
+              f"{t_loop / t_vector:>9.0f}x")
+
+def bench_disk_cache(terms=20, order=3):
+    """磁盘缓存：冷启动（解析、求导、采样并写入磁盘）vs 重新启动后从磁盘读取（毫秒）"""
+    print(f"\n{'='*60}")
+    print("磁盘缓存（毫秒）")
+    text = generated_expression(terms)
+    directory = tempfile.mkdtemp()
+    try:
+        def session():
+            # 新的缓存对象模拟重新启动：内存缓存为空，只有磁盘上的文件
+            store = DiskCache(directory)
+            ast = ExpressionCache(store=store).parse(text)
+            DerivativeCache(store=store).derivative(ast, order=order)
+            TileCache(store=store).sample(ast, lambda x: evaluate_vectorized(ast, x), (-10, 10), 2000)
+        cold = timeit.timeit(session, number=1) * 1000
+        warm = best_time(session, 1) / 1000
+        store = DiskCache(directory)
+        print(f"{terms} 项表达式，{order} 阶导函数 + 绘图采样：冷启动 {cold:.1f}，从磁盘读取 {warm:.1f}"
+              f"（{cold / warm:.0f}x，{len(store)} 个文件 {store.size() / 1024:.0f} KB）")
+    finally:
+        shutil.rmtree(directory)
+
+def bench_bytecode(number=2000, order=4):
+    """字节码：栈式虚拟机 vs 树遍历求值与闭包编译器（微秒），二进制格式 vs pickle"""
+    print(f"\n{'='*60}")
+    print("标量求值：Evaluator vs 字节码虚拟机 vs compile_ast（单次调用，微秒）")
+    print(f"{'表达式':<28}{'Evaluator':>12}{'虚拟机':>10}{'编译后':>10}{'加速比':>10}")
+    derivative = parse("x*log(x)*cos(x)")
+    for _ in range(order):
+        derivative = simplify(Derivative.differentiate(derivative))
+    cases = [(expr, parse(expr), x_value) for expr, x_value in EXPRESSIONS]
+    cases.append((f"x*log(x)*cos(x) 的 {order} 阶导数", derivative, 1.5))
+    for expr, ast, x_value in cases:
+        code = compile_bytecode(ast)
+        func = compile_ast(ast)
+        assert math.isclose(code.evaluate(x_value), Evaluator(x_value=x_value).evaluate(ast))
+        t_tree = best_time(lambda: Evaluator(x_value=x_value).evaluate(ast), number)
+        t_vm = best_time(lambda: code.evaluate(x_value), number)
+        t_compiled = best_time(lambda: func(x_value), number)
+        print(f"{expr:<30}{t_tree:>12.2f}{t_vm:>10.2f}{t_compiled:>10.2f}{t_tree / t_vm:>9.1f}x")
+
+    print("\n序列化：pickle（逐节点）vs 字节码二进制格式")
+    print(f"{'表达式':<28}{'pickle 字节':>12}{'字节码':>10}{'pickle μs':>12}{'字节码 μs':>12}")
+    for terms in (5, 50):
+        ast = parse(generated_expression(terms))
+        ast = simplify(Derivative.differentiate(ast))
+        data = pickle.dumps(ast, protocol=pickle.HIGHEST_PROTOCOL)
+        code = Bytecode.from_ast(ast).to_bytes()
+        assert pickle.loads(data) is ast and Bytecode.from_bytes(code).to_ast() is ast
+        t_pickle = best_time(lambda: pickle.loads(pickle.dumps(ast, protocol=pickle.HIGHEST_PROTOCOL)), 20)
+        t_code = best_time(lambda: Bytecode.from_bytes(Bytecode.from_ast(ast).to_bytes()).to_ast(), 20)
+        label = f"{terms} 项表达式的导数"
+        print(f"{label:<28}{len(data):>12}{len(code):>10}{t_pickle:>12.0f}{t_code:>12.0f}")
+
+def main():
+    """运行全部基准"""
+    print("数学函数计算器 - 性能基准")
+    bench_lexer()
+    bench_parser()
+    bench_traversal()
+    bench_compiler()
+    bench_bytecode()
+    bench_partial_evaluation()
+    bench_polynomial()
+    bench_simplifier()
+    bench_printer()
+    bench_format()
+    bench_solver()
+    bench_interval()
+    bench_integration()
+    bench_disk_cache()
+    bench_taylor()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+"""
+字节码（Bytecode）
+功能：把 AST 展开为线性的后缀（逆波兰）指令序列，并用栈式虚拟机求值
+- 指令为 32 位无符号整数：低 8 位为操作码，高 24 位为操作数（常数池、变量名表或暂存槽的下标）
+- 浮点常数、整数常数与变量名各有一个常数池（array.array 与字符串列表）
+- 被多个父节点共用的子树只展开一次：求出后 STORE 到暂存槽，之后的引用用 LOAD 读取
+- 与 AST 互相转换（重新经过哈希一致化，得到同一节点对象），并有与平台无关的二进制格式，
+  可用于进程间传递与持久化，比逐节点 pickle 更紧凑，也不受递归深度限制
+- 虚拟机的标量求值与 Evaluator 行为一致（包括错误信息），数组求值与 VectorEvaluator 一致
+"""
+import math
+import struct
+import sys
+from array import array
+import numpy as np
+from parser import *
+from lexer import TokenType
+from evaluator import partial_evaluate
+from polynomial import PolynomialNode, MAX_MULTIPLY_POWER, horner, estrin, multiply_power
+
+# 操作码
+CONST = 0   # 压入浮点常数 floats[arg]
+INT = 1     # 压入整数常数 ints[arg]
+PI = 2      # 压入 π（保留符号）
+E = 3       # 压入 e（保留符号）
+VAR = 4     # 压入变量 names[arg]
+ADD = 5
+SUB = 6
+MUL = 7
+DIV = 8
+POW = 9
+NEG = 10
+SIN = 11
+COS = 12
+LN = 13     # log(u)
+LOG = 14    # log(a, u)
+CALL = 15   # 参数个数不合法的函数：arg = 函数类型码 | 参数个数 << 8，求值时报错
+POLY = 16   # 多项式：arg 为 floats 中的起始下标，依次为项数、(次数, 系数)…
+STORE = 17  # 栈顶存入暂存槽 arg（不弹出）
+LOAD = 18   # 压入暂存槽 arg
+
+OPCODE_NAMES = ['CONST', 'INT', 'PI', 'E', 'VAR', 'ADD', 'SUB', 'MUL', 'DIV', 'POW', 'NEG',
+                'SIN', 'COS', 'LN', 'LOG', 'CALL', 'POLY', 'STORE', 'LOAD']
+
+_BINARY = {TokenType.PLUS: ADD, TokenType.MINUS: SUB, TokenType.MULTIPLY: MUL,
+           TokenType.DIVIDE: DIV, TokenType.POWER: POW}
+_BINARY_OPS = {code: op for op, code in _BINARY.items()}
+_TOKEN_TYPES = {t.value: t for t in TokenType}
+
+MAX_OPERAND = (1 << 24) - 1
+MAGIC = b'MFBC'
+FORMAT_VERSION = 2
+# 文件头：魔数、格式版本、暂存槽数、指令数、浮点常数个数、整数常数个数、变量名字节数（小端）
+_HEADER = struct.Struct('<4sHIIIII')
+_UINT32 = 'I' if array('I').itemsize == 4 else 'L'
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+class Bytecode:
+    """
+    字节码：code 为指令数组，floats、ints 为常数池，names 为变量名表，slots 为暂存槽数
+    """
+    __slots__ = ('code', 'floats', 'ints', 'names', 'slots', '_program')
+
+    def __init__(self, code, floats, ints, names, slots):
+        self.code = code
+        self.floats = floats
+        self.ints = ints
+        self.names = names
+        self.slots = slots
+        self._program = None  # 解码后的 (操作码, 操作数) 列表，首次求值时生成
+
+    def __len__(self):
+        return len(self.code)
+
+    def __eq__(self, other):
+        return isinstance(other, Bytecode) and self.to_bytes() == other.to_bytes()
+
+    def __hash__(self):
+        return hash(self.to_bytes())
+
+    def __reduce__(self):
+        # pickle 时使用二进制格式
+        return (Bytecode.from_bytes, (self.to_bytes(),))
+
+    def __repr__(self):
+        return f"Bytecode({len(self.code)} 条指令, {self.slots} 个暂存槽)"
+
+    # ========== AST ↔ 字节码 ==========
+
+    @classmethod
+    def from_ast(cls, root):
+        """把 AST 展开为后缀指令序列（显式栈，不受递归深度限制）"""
+        return _Encoder().encode(root)
+
+    def to_ast(self):
+        """还原为 AST"""
+        stack = []
+        push, pop = stack.append, stack.pop
+        slots = [None] * self.slots
+        floats, ints, names = self.floats, self.ints, self.names
+        for word in self.code:
+            op, arg = word & 0xFF, word >> 8
+            if op == CONST:
+                push(NumberNode(floats[arg]))
+            elif op == INT:
+                push(NumberNode(ints[arg]))
+            elif op == PI:
+                push(NumberNode('π'))
+            elif op == E:
+                push(NumberNode('e'))
+            elif op == VAR:
+                push(VariableNode(names[arg]))
+            elif op in _BINARY_OPS:
+                right = pop()
+                push(BinaryOpNode(pop(), _BINARY_OPS[op], right))
+            elif op == NEG:
+                push(UnaryOpNode(TokenType.MINUS, pop()))
+            elif op == SIN:
+                push(FunctionNode(TokenType.SIN, [pop()]))
+            elif op == COS:
+                push(FunctionNode(TokenType.COS, [pop()]))
+            elif op == LN:
+                push(FunctionNode(TokenType.LOG, [pop()]))
+            elif op == LOG:
+                arg_node = pop()
+                push(FunctionNode(TokenType.LOG, [pop(), arg_node]))
+            elif op == CALL:
+                count = arg >> 8
+                args = stack[len(stack) - count:]
+                del stack[len(stack) - count:]
+                push(FunctionNode(_TOKEN_TYPES[arg & 0xFF], args))
+            elif op == POLY:
+                push(PolynomialNode(_poly_terms(floats, arg), pop()))
+            elif op == STORE:
+                slots[arg] = stack[-1]
+            elif op == LOAD:
+                push(slots[arg])
+            else:
+                raise Exception(f"未知操作码: {op}")
+        if len(stack) != 1:
+            raise Exception("字节码格式错误")
+        return stack[0]
+
+    # ========== 二进制格式 ==========
+
+    def to_bytes(self):
+        """二进制格式：文件头后依次为指令、浮点常数、整数常数（均为小端）与 UTF-8 变量名（以 \\0 分隔）"""
+        names = '\0'.join(self.names).encode('utf-8')
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, self.slots, len(self.code),
+                              len(self.floats), len(self.ints), len(names))
+        parts = [header]
+        for data in (self.code, self.floats, self.ints):
+            if _BIG_ENDIAN:
+                data = array(data.typecode, data)
+                data.byteswap()
+            parts.append(data.tobytes())
+        parts.append(names)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """从二进制格式读取"""
+        data = bytes(data)
+        if len(data) < _HEADER.size:
+            raise Exception("字节码格式错误")
+        magic, version, slots, n_code, n_floats, n_ints, n_names = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise Exception("字节码格式错误")
+        if version != FORMAT_VERSION:
+            raise Exception(f"不支持的字节码版本: {version}")
+        if len(data) != _HEADER.size + 4 * n_code + 8 * n_floats + 8 * n_ints + n_names:
+            raise Exception("字节码格式错误")
+        offset = _HEADER.size
+        arrays = []
+        for typecode, count, size in ((_UINT32, n_code, 4), ('d', n_floats, 8), ('q', n_ints, 8)):
+            values = array(typecode)
+            values.frombytes(data[offset:offset + count * size])
+            if _BIG_ENDIAN:
+                values.byteswap()
+            arrays.append(values)
+            offset += count * size
+        names = data[offset:].decode('utf-8').split('\0') if n_names else []
+        return cls(*arrays, names, slots)
+
+    # ========== 虚拟机 ==========
+
+    def _decode(self):
+        """解码指令：常数直接放入操作数，求值循环中不再查常数池"""
+        if self._program is None:
+            program = []
+            for word in self.code:
+                op, arg = word & 0xFF, word >> 8
+                if op == CONST:
+                    arg = self.floats[arg]
+                elif op == INT:
+                    arg = self.ints[arg]
+                elif op == PI:
+                    op, arg = CONST, math.pi
+                elif op == E:
+                    op, arg = CONST, math.e
+                elif op == VAR:
+                    arg = self.names[arg]
+                elif op == POLY:
+                    arg = _poly_terms(self.floats, arg)
+                elif op == CALL:
+                    arg = (_TOKEN_TYPES[arg & 0xFF], arg >> 8)
+                program.append((CONST if op == INT else op, arg))
+            self._program = program
+        return self._program
+
+    def evaluate(self, x=None):
+        """标量求值，结果与错误信息与 Evaluator(x_value=x).evaluate 一致"""
+        stack = []
+        push, pop = stack.append, stack.pop
+        slots = [None] * self.slots
+        for op, arg in self._decode():
+            if op == CONST:
+                push(arg)
+            elif op == VAR:
+                if x is None:
+                    raise Exception("变量 x 未赋值")
+                push(x)
+            elif op == LOAD:
+                push(slots[arg])
+            elif op == STORE:
+                slots[arg] = stack[-1]
+            elif op == ADD:
+                right = pop()
+                stack[-1] = stack[-1] + right
+            elif op == SUB:
+                right = pop()
+                stack[-1] = stack[-1] - right
+            elif op == MUL:
+                right = pop()
+                stack[-1] = stack[-1] * right
+            elif op == DIV:
+                right = pop()
+                if right == 0:
+                    raise Exception("除数不能为零")
+                stack[-1] = stack[-1] / right
+            elif op == POW:
+                right = pop()
+                stack[-1] = stack[-1] ** right
+            elif op == NEG:
+                stack[-1] = -stack[-1]
+            elif op == SIN:
+                stack[-1] = math.sin(stack[-1])
+            elif op == COS:
+                stack[-1] = math.cos(stack[-1])
+            elif op == LN:
+                if stack[-1] <= 0:
+                    raise Exception("对数函数参数必须大于 0")
+                stack[-1] = math.log(stack[-1])
+            elif op == LOG:
+                value = pop()
+                base = stack[-1]
+                if base <= 0 or base == 1:
+                    raise Exception("对数底数必须大于 0 且不等于 1")
+                if value <= 0:
+                    raise Exception("对数函数参数必须大于 0")
+                stack[-1] = math.log(value, base)
+            elif op == POLY:
+                stack[-1] = horner(arg, stack[-1])
+            else:
+                _call_error(op, arg)
+        return stack[0]
+
+    def evaluate_vector(self, x_values):
+        """
+        对一组 x 值整体求值，与 evaluate_vectorized 一致：
+        返回与 x_values 形状相同的浮点数组，无定义或溢出的点为 NaN
+        """
+        x_values = np.asarray(x_values, dtype=float)
+        stack = []
+        push, pop = stack.append, stack.pop
+        slots = [None] * self.slots
+        with np.errstate(all='ignore'):
+            for op, arg in self._decode():
+                if op == CONST:
+                    push(arg)
+                elif op == VAR:
+                    push(x_values)
+                elif op == LOAD:
+                    push(slots[arg])
+                elif op == STORE:
+                    slots[arg] = stack[-1]
+                elif op == ADD:
+                    right = pop()
+                    stack[-1] = np.add(stack[-1], right)
+                elif op == SUB:
+                    right = pop()
+                    stack[-1] = np.subtract(stack[-1], right)
+                elif op == MUL:
+                    right = pop()
+                    stack[-1] = np.multiply(stack[-1], right)
+                elif op == DIV:
+                    right = pop()
+                    stack[-1] = np.where(right == 0, np.nan, np.divide(stack[-1], right))
+                elif op == POW:
+                    right = pop()
+                    left = np.asarray(stack[-1], dtype=float)
+                    if isinstance(right, float) and right.is_integer() and 2 <= right <= MAX_MULTIPLY_POWER:
+                        stack[-1] = multiply_power(left, int(right))
+                    else:
+                        # pow(1, nan) 与 pow(nan, 0) 为 1：NaN 处仍记为 NaN
+                        stack[-1] = np.where(np.isnan(left) | np.isnan(right), np.nan, np.power(left, right))
+                elif op == NEG:
+                    stack[-1] = np.negative(stack[-1])
+                elif op == SIN:
+                    stack[-1] = np.sin(stack[-1])
+                elif op == COS:
+                    stack[-1] = np.cos(stack[-1])
+                elif op == LN:
+                    value = stack[-1]
+                    stack[-1] = np.where(value > 0, np.log(value), np.nan)
+                elif op == LOG:
+                    value = pop()
+                    base = stack[-1]
+                    valid = (base > 0) & (base != 1) & (value > 0)
+                    stack[-1] = np.where(valid, np.log(value) / np.log(base), np.nan)
+                elif op == POLY:
+                    stack[-1] = estrin(arg, stack[-1])
+                else:
+                    _call_error(op, arg)
+        y_values = np.array(np.broadcast_to(stack[0], x_values.shape), dtype=float)
+        y_values[~np.isfinite(y_values)] = np.nan
+        return y_values
+
+    def disassemble(self):
+        """可读的指令列表（调试用）"""
+        lines = []
+        for i, word in enumerate(self.code):
+            op, arg = word & 0xFF, word >> 8
+            text = f"{i:>4}  {OPCODE_NAMES[op]:<6}"
+            if op == CONST:
+                text += f" {self.floats[arg]!r}"
+            elif op == INT:
+                text += f" {self.ints[arg]!r}"
+            elif op == VAR:
+                text += f" {self.names[arg]}"
+            elif op in (STORE, LOAD, POLY):
+                text += f" {arg}"
+            elif op == CALL:
+                text += f" {_TOKEN_TYPES[arg & 0xFF].name}/{arg >> 8}"
+            lines.append(text)
+        return "\n".join(lines)
+
+def _poly_terms(floats, start):
+    """从浮点常数池中读出多项式的 (次数, 系数) 元组"""
+    count = int(floats[start])
+    return tuple((int(floats[start + 1 + 2 * i]), floats[start + 2 + 2 * i]) for i in range(count))
+
+def _call_error(op, arg):
+    """参数个数不合法的函数调用：给出与 Evaluator 相同的错误信息"""
+    if op != CALL:
+        raise Exception(f"未知操作码: {op}")
+    name, count = arg
+    if name in (TokenType.SIN, TokenType.COS):
+        raise Exception(f"{name.name.lower()} 函数需要 1 个参数")
+    elif name == TokenType.LOG:
+        raise Exception("log 函数需要 1 或 2 个参数")
+    raise Exception(f"未知函数: {name}")
+
+class _Encoder:
+    """AST → 字节码：后序展开，被多个父节点引用的内部节点存入暂存槽"""
+    def __init__(self):
+        self.code = array(_UINT32)
+        self.floats = array('d')
+        self.ints = array('q')
+        self.names = []
+        self._float_index = {}
+        self._int_index = {}
+        self._name_index = {}
+
+    def encode(self, root):
+        shared = _shared_nodes(root)
+        slots = {}
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                self._emit_node(node)
+                if node in shared:
+                    slots[node] = len(slots)
+                    self._emit(STORE, slots[node])
+                continue
+            if node in slots:
+                self._emit(LOAD, slots[node])
+                continue
+            stack.append((node, True))
+            for child in reversed(node.children()):
+                stack.append((child, False))
+        return Bytecode(self.code, self.floats, self.ints, self.names, len(slots))
+
+    def _emit(self, op, arg=0):
+        if arg > MAX_OPERAND:
+            raise Exception("表达式过大，无法编码为字节码")
+        self.code.append(op | arg << 8)
+
+    def _emit_node(self, node):
+        """发出节点自身的指令（子节点的指令已发出）"""
+        if isinstance(node, NumberNode):
+            value = node.value
+            if value == 'π':
+                self._emit(PI)
+            elif value == 'e':
+                self._emit(E)
+            elif isinstance(value, int):
+                if not -2 ** 63 <= value < 2 ** 63:
+                    raise Exception("整数常数超出范围，无法编码为字节码")
+                self._emit(INT, self._pool(self.ints, self._int_index, value))
+            else:
+                self._emit(CONST, self._float(float(value)))
+        elif isinstance(node, VariableNode):
+            index = self._name_index.get(node.name)
+            if index is None:
+                index = self._name_index[node.name] = len(self.names)
+                self.names.append(node.name)
+            self._emit(VAR, index)
+        elif isinstance(node, BinaryOpNode):
+            if node.op not in _BINARY:
+                raise Exception(f"未知运算符: {node.op}")
+            self._emit(_BINARY[node.op])
+        elif isinstance(node, UnaryOpNode):
+            if node.op != TokenType.MINUS:
+                raise Exception(f"未知一元运算符: {node.op}")
+            self._emit(NEG)
+        elif isinstance(node, FunctionNode):
+            count = len(node.args)
+            if node.name == TokenType.SIN and count == 1:
+                self._emit(SIN)
+            elif node.name == TokenType.COS and count == 1:
+                self._emit(COS)
+            elif node.name == TokenType.LOG and count == 1:
+                self._emit(LN)
+            elif node.name == TokenType.LOG and count == 2:
+                self._emit(LOG)
+            else:
+                self._emit(CALL, node.name.value | count << 8)
+        elif isinstance(node, PolynomialNode):
+            start = len(self.floats)
+            self.floats.append(len(node.terms))
+            for n, c in node.terms:
+                self.floats.append(n)
+                self.floats.append(float(c))
+            self._emit(POLY, start)
+        else:
+            raise Exception(f"未知节点类型: {type(node)}")
+
+    def _float(self, value):
+        """浮点常数的下标（按位模式去重，区分 0.0 与 -0.0）"""
+        key = struct.pack('<d', value)
+        return self._pool(self.floats, self._float_index, value, key)
+
+    @staticmethod
+    def _pool(values, index, value, key=None):
+        key = value if key is None else key
+        position = index.get(key)
+        if position is None:
+            position = index[key] = len(values)
+            values.append(value)
+        return position
+
+def _shared_nodes(root):
+    """被多个父节点（或同一父节点多次）引用的内部节点"""
+    counts = {}
+    seen = {root}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for child in node.children():
+            counts[child] = counts.get(child, 0) + 1
+            if child not in seen:
+                seen.add(child)
+                stack.append(child)
+    return {node for node, count in counts.items() if count > 1 and node.children()}
+
+def compile_bytecode(node):
+    """编译为求值用的字节码（先做部分求值，常数子树折叠、多项式子树化为 POLY 指令）"""
+    return Bytecode.from_ast(partial_evaluate(node))
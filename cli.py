@@ -0,0 +1,279 @@
+"""
+命令行批处理（CLI）
+功能：不启动图形界面，从标准输入或文件逐行读取表达式，分批求值、求导、
+生成函数值表或绘图采样点，结果以 CSV 或 JSON Lines 流式输出
+本模块不导入 PyQt5 与 Matplotlib，可在没有图形环境的服务器或脚本中使用
+
+用法示例：
+    python main.py eval -x 1 -x pi/2 expressions.txt
+    python main.py diff < expressions.txt
+    python main.py diff --order 2 expressions.txt
+    python main.py table --start -5 --stop 5 --step 0.5 --derivative
+    python main.py table --start 0 --stop 3.1416 --points 9 --exact
+    python main.py plot --range -10 10 --points 500 --format json
+解析结果、导函数与绘图采样保存在磁盘缓存中，再次运行时直接读取（--no-disk-cache 关闭）
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+from itertools import islice
+import numpy as np
+from evaluator import evaluate_vectorized, format_results
+from derivative import Derivative, ast_to_string
+from expression_cache import ExpressionCache, use_disk_cache
+from disk_cache import open_disk_cache
+from autodiff import evaluate_dual_vectorized
+from sampler import adaptive_sample
+from value_table import x_range, parse_x_value
+
+COMMANDS = ('eval', 'diff', 'table', 'plot')
+
+# 各子命令输出的列
+COLUMNS = {
+    'eval': ['expr', 'x', 'value', 'error'],
+    'diff': ['expr', 'derivative', 'error'],
+    'table': ['expr', 'x', 'value', 'error'],
+    'plot': ['expr', 'x', 'y', 'error'],
+}
+
+def read_expressions(paths):
+    """逐行读取表达式（- 表示标准输入），跳过空行与 # 开头的注释行"""
+    for path in paths or ['-']:
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            for line in stream:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+def batches(iterable, size):
+    """按固定大小分批"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def read_x_values(args):
+    """收集 -x 与 --x-file 给出的 x 值"""
+    texts = list(args.x or [])
+    if args.x_file:
+        with open(args.x_file, encoding='utf-8') as f:
+            texts.extend(line.strip() for line in f if line.strip())
+    return [parse_x_value(text) for text in texts]
+
+def table_x_values(args):
+    """函数值表的 x 序列：起点、终点与步长，或等分点数"""
+    if args.points:
+        return np.linspace(args.start, args.stop, args.points)
+    return x_range(args.start, args.stop, args.step)
+
+def _number(value):
+    """输出用的数值：NaN 与无穷记为空"""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+# ========== 子命令：每个表达式产生若干行 ==========
+
+def eval_rows(expr, entry, args):
+    """逐点求值，出错时给出与界面相同的错误信息"""
+    func = entry.compiled
+    for x in args.x_values or [None]:
+        try:
+            value = func(x)
+        except Exception as e:
+            yield {'expr': expr, 'x': x, 'value': None, 'error': str(e)}
+        else:
+            yield {'expr': expr, 'x': x, 'value': _number(value), 'error': None}
+
+def diff_rows(expr, entry, args):
+    """符号求导并化简（高阶导数逐阶求出，各阶结果都有缓存）"""
+    if not args.no_simplify:
+        derivative = entry.nth_derivative(args.order)
+    else:
+        derivative = entry.raw_derivative if args.order >= 1 else entry.ast
+        for _ in range(args.order - 1):
+            derivative = Derivative.differentiate(derivative)
+    yield {'expr': expr, 'derivative': ast_to_string(derivative), 'error': None}
+
+def table_rows(expr, entry, args):
+    """在整个 x 序列上向量化求值（可同时求导数）"""
+    xs, ast = args.x_values, entry.ast
+    if args.derivative:
+        ys, dys = evaluate_dual_vectorized(ast, xs)
+    else:
+        ys, dys = evaluate_vectorized(ast, xs), None
+    if args.exact:
+        # 整列一次格式化为分数、π 的倍数等精确形式
+        exact = format_results(ys)
+        exact_dys = format_results(dys) if dys is not None else None
+    for i, x in enumerate(xs.tolist()):
+        row = {'expr': expr, 'x': x, 'value': _number(ys[i])}
+        if args.exact and row['value'] is not None:
+            row['exact'] = exact[i]
+        if dys is not None:
+            row['derivative'] = _number(dys[i])
+            if args.exact and row['derivative'] is not None:
+                row['exact_derivative'] = exact_dys[i]
+        row['error'] = None if row['value'] is not None else "无定义"
+        yield row
+
+def plot_rows(expr, entry, args):
+    """自适应采样的曲线点；y 为空的行表示曲线在此断开（有磁盘缓存时直接读取上次的采样）"""
+    ast = entry.ast
+    key = (ast, tuple(args.range), args.points)
+    stored = None
+    if args.store is not None:
+        stored = args.store.load_array('curves', key)
+    if stored is not None:
+        xs, ys = stored
+    else:
+        xs, ys = adaptive_sample(lambda x: evaluate_vectorized(ast, x), args.range, args.points)
+        if args.store is not None:
+            args.store.save_array('curves', key, np.stack([xs, ys]))
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        yield {'expr': expr, 'x': x, 'y': _number(y), 'error': None}
+
+ROWS = {
+    'eval': eval_rows,
+    'diff': diff_rows,
+    'table': table_rows,
+    'plot': plot_rows,
+}
+
+# ========== 输出 ==========
+
+class CsvWriter:
+    """CSV 输出（带表头，空值写为空字符串）"""
+    def __init__(self, stream, columns):
+        self.columns = columns
+        self.writer = csv.writer(stream, lineterminator='\n')
+        self.writer.writerow(columns)
+
+    def write(self, row):
+        self.writer.writerow(['' if row.get(c) is None else row[c] for c in self.columns])
+
+class JsonWriter:
+    """JSON Lines 输出（每行一个对象，空值为 null）"""
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.columns = columns
+
+    def write(self, row):
+        self.stream.write(json.dumps({c: row.get(c) for c in self.columns}, ensure_ascii=False))
+        self.stream.write('\n')
+
+WRITERS = {'csv': CsvWriter, 'json': JsonWriter}
+
+def process(args, out, cache=None):
+    """分批解析并处理表达式，逐批写出结果；重复出现的表达式从缓存中取出"""
+    columns = list(COLUMNS[args.command])
+    if args.command == 'table':
+        extra = []
+        if args.exact:
+            extra.append('exact')
+        if args.derivative:
+            extra.append('derivative')
+            if args.exact:
+                extra.append('exact_derivative')
+        columns[-1:-1] = extra
+    writer = WRITERS[args.format](out, columns)
+    rows = ROWS[args.command]
+    if cache is None:
+        cache = ExpressionCache(args.cache_size)
+
+    for batch in batches(read_expressions(args.files), args.batch_size):
+        for expr in batch:
+            try:
+                entry = cache.entry(expr)
+            except Exception as e:
+                writer.write({'expr': expr, 'error': f"解析错误: {e}"})
+                continue
+            try:
+                for row in rows(expr, entry, args):
+                    writer.write(row)
+            except Exception as e:
+                writer.write({'expr': expr, 'error': str(e)})
+        out.flush()
+
+def build_parser():
+    """命令行参数"""
+    parser = argparse.ArgumentParser(prog='main.py', description="数学函数计算器 - 命令行批处理模式")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('files', nargs='*', help="表达式文件，每行一个（默认或 - 为标准输入）")
+    common.add_argument('--format', choices=sorted(WRITERS), default='csv', help="输出格式（默认 csv）")
+    common.add_argument('-o', '--output', help="输出文件（默认标准输出）")
+    common.add_argument('--batch-size', type=int, default=1000, help="每批处理的表达式数（默认 1000）")
+    common.add_argument('--cache-size', type=int, default=4096, help="表达式缓存容量（默认 4096）")
+    common.add_argument('--stats', action='store_true', help="结束时在标准错误输出缓存命中统计")
+    common.add_argument('--cache-dir', help="磁盘缓存的上级目录（缓存放在其中的 math-function-calculator 子目录，默认为用户缓存目录）")
+    common.add_argument('--no-disk-cache', action='store_true', help="不读写磁盘缓存")
+    common.set_defaults(store=None)
+
+    eval_cmd = commands.add_parser('eval', parents=[common], help="在给定的 x 值处求值")
+    eval_cmd.add_argument('-x', action='append', help="x 的值，可重复，可为常数表达式（如 pi/2）")
+    eval_cmd.add_argument('--x-file', help="x 值文件，每行一个")
+
+    diff_cmd = commands.add_parser('diff', parents=[common], help="求导函数")
+    diff_cmd.add_argument('--no-simplify', action='store_true', help="不化简导函数")
+    diff_cmd.add_argument('--order', type=int, default=1, help="求导阶数（默认 1）")
+
+    table_cmd = commands.add_parser('table', parents=[common], help="生成函数值表")
+    table_cmd.add_argument('--start', type=float, default=-10.0, help="起点（默认 -10）")
+    table_cmd.add_argument('--stop', type=float, default=10.0, help="终点（默认 10）")
+    table_cmd.add_argument('--step', type=float, default=1.0, help="步长（默认 1）")
+    table_cmd.add_argument('--points', type=int, help="等分点数（指定时忽略步长）")
+    table_cmd.add_argument('--derivative', action='store_true', help="同时输出导数值")
+    table_cmd.add_argument('--exact', action='store_true', help="增加精确形式列（分数、π 的倍数、平方根等）")
+
+    plot_cmd = commands.add_parser('plot', parents=[common], help="输出绘图采样点")
+    plot_cmd.add_argument('--range', type=float, nargs=2, default=(-10.0, 10.0), metavar=('XMIN', 'XMAX'),
+                          help="x 范围（默认 -10 10）")
+    plot_cmd.add_argument('--points', type=int, default=1000, help="采样点数上限（默认 1000）")
+    return parser
+
+def run(argv=None):
+    """命令行入口，返回退出码"""
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == 'eval':
+            args.x_values = read_x_values(args)
+        elif args.command == 'table':
+            args.x_values = table_x_values(args)
+        elif args.command == 'diff' and args.order < 0:
+            raise Exception("求导阶数不能为负数")
+    except Exception as e:
+        print(f"参数错误: {e}", file=sys.stderr)
+        return 2
+
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    # 解析结果、导函数与采样曲线保存在磁盘上，再次运行同一批表达式时直接读取
+    if not args.no_disk_cache:
+        args.store = open_disk_cache(args.cache_dir)
+        use_disk_cache(args.store)
+    cache = ExpressionCache(args.cache_size, store=args.store)
+    try:
+        process(args, out, cache)
+    except BrokenPipeError:
+        # 输出被管道截断（如 | head），静默退出
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.stats:
+        print("缓存: {entries} 条, 命中 {hits}, 未命中 {misses}, 命中率 {hit_rate:.1%}".format(**cache.stats()),
+              file=sys.stderr)
+        if args.store is not None:
+            print("磁盘缓存: {entries} 个文件, {bytes} 字节, 命中 {hits}, 未命中 {misses}".format(
+                **args.store.stats()), file=sys.stderr)
+    return 0
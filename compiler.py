@@ -0,0 +1,217 @@
+"""
+表达式编译器（Compiler）
+功能：将 AST 一次性编译为嵌套的 Python 闭包 f(x)
+常数在编译时解析，运算符在编译时绑定，重复求值时无需再遍历语法树
+嵌套过深的树（调用闭包会超出递归深度）改为编译成字节码，由栈式虚拟机求值
+"""
+import math
+from parser import *
+from lexer import TokenType
+from evaluator import partial_evaluate
+from polynomial import PolynomialNode
+from traversal import postorder, height
+from bytecode import Bytecode
+
+MAX_CLOSURE_DEPTH = 200  # 闭包的最大嵌套层数（每层调用占一个栈帧）
+
+class Compiler:
+    """AST → 闭包编译器"""
+
+    @staticmethod
+    def compile(node):
+        """
+        编译 AST 节点
+        参数：
+            node: AST 节点
+        返回：函数 f(x)，行为与 Evaluator(x_value=x).evaluate(node) 一致
+        显式栈后序遍历，编译本身不受递归深度限制；共享的子树只编译一次
+        """
+        return postorder(node, Compiler._visit)
+
+    @staticmethod
+    def _visit(node, children):
+        """编译单个节点（children 为已编译的子节点）"""
+        if isinstance(node, NumberNode):
+            return Compiler._compile_number(node)
+        elif isinstance(node, VariableNode):
+            return Compiler._compile_variable(node)
+        elif isinstance(node, BinaryOpNode):
+            return Compiler._compile_binary_op(node, *children)
+        elif isinstance(node, UnaryOpNode):
+            return Compiler._compile_unary_op(node, *children)
+        elif isinstance(node, FunctionNode):
+            return Compiler._compile_function(node, children)
+        elif isinstance(node, PolynomialNode):
+            return Compiler._compile_polynomial(node, *children)
+        else:
+            raise Exception(f"未知节点类型: {type(node)}")
+
+    @staticmethod
+    def _constant_value(node):
+        """数字节点的数值（π、e 在编译时解析）"""
+        if node.value == 'π':
+            return math.pi
+        elif node.value == 'e':
+            return math.e
+        return node.value
+
+    @staticmethod
+    def _compile_number(node):
+        """编译数字节点"""
+        value = Compiler._constant_value(node)
+        return lambda x: value
+
+    @staticmethod
+    def _compile_variable(node):
+        """编译变量节点"""
+        def variable(x):
+            if x is None:
+                raise Exception("变量 x 未赋值")
+            return x
+        return variable
+
+    @staticmethod
+    def _compile_binary_op(node, left, right):
+        """编译二元运算节点（右操作数为数字时直接内联常数）"""
+        op = node.op
+
+        if isinstance(node.right, NumberNode):
+            c = Compiler._constant_value(node.right)
+            if op == TokenType.PLUS:
+                return lambda x: left(x) + c
+            elif op == TokenType.MINUS:
+                return lambda x: left(x) - c
+            elif op == TokenType.MULTIPLY:
+                return lambda x: left(x) * c
+            elif op == TokenType.DIVIDE:
+                if c == 0:
+                    def divide_by_zero(x):
+                        left(x)
+                        raise Exception("除数不能为零")
+                    return divide_by_zero
+                return lambda x: left(x) / c
+            elif op == TokenType.POWER:
+                # 平方与立方化为乘法
+                if c == 2:
+                    def square(x):
+                        t = left(x)
+                        return t * t
+                    return square
+                if c == 3:
+                    def cube(x):
+                        t = left(x)
+                        return t * t * t
+                    return cube
+                return lambda x: left(x) ** c
+            raise Exception(f"未知运算符: {op}")
+
+        if op == TokenType.PLUS:
+            return lambda x: left(x) + right(x)
+        elif op == TokenType.MINUS:
+            return lambda x: left(x) - right(x)
+        elif op == TokenType.MULTIPLY:
+            return lambda x: left(x) * right(x)
+        elif op == TokenType.DIVIDE:
+            def divide(x):
+                a = left(x)
+                b = right(x)
+                if b == 0:
+                    raise Exception("除数不能为零")
+                return a / b
+            return divide
+        elif op == TokenType.POWER:
+            return lambda x: left(x) ** right(x)
+        raise Exception(f"未知运算符: {op}")
+
+    @staticmethod
+    def _compile_unary_op(node, operand):
+        """编译一元运算节点"""
+        if node.op == TokenType.MINUS:
+            return lambda x: -operand(x)
+        raise Exception(f"未知一元运算符: {node.op}")
+
+    @staticmethod
+    def _compile_function(node, args):
+        """编译函数节点"""
+        if node.name == TokenType.SIN:
+            if len(node.args) != 1:
+                raise Exception("sin 函数需要 1 个参数")
+            arg = args[0]
+            sin = math.sin
+            return lambda x: sin(arg(x))
+
+        elif node.name == TokenType.COS:
+            if len(node.args) != 1:
+                raise Exception("cos 函数需要 1 个参数")
+            arg = args[0]
+            cos = math.cos
+            return lambda x: cos(arg(x))
+
+        elif node.name == TokenType.LOG:
+            log = math.log
+            if len(node.args) == 1:
+                arg = args[0]
+                def natural_log(x):
+                    a = arg(x)
+                    if a <= 0:
+                        raise Exception("对数函数参数必须大于 0")
+                    return log(a)
+                return natural_log
+            elif len(node.args) == 2:
+                base, arg = args
+                def base_log(x):
+                    b = base(x)
+                    a = arg(x)
+                    if b <= 0 or b == 1:
+                        raise Exception("对数底数必须大于 0 且不等于 1")
+                    if a <= 0:
+                        raise Exception("对数函数参数必须大于 0")
+                    return log(a, b)
+                return base_log
+            else:
+                raise Exception("log 函数需要 1 或 2 个参数")
+
+        else:
+            raise Exception(f"未知函数: {node.name}")
+
+    @staticmethod
+    def _compile_polynomial(node, variable):
+        """编译多项式节点（秦九韶法，系数在编译时绑定）"""
+        terms = node.terms
+        if terms and [n for n, c in terms] == list(range(len(terms) - 1, -1, -1)):
+            # 稠密多项式：逐项 result * x + c
+            leading, rest = terms[0][1], [c for n, c in terms[1:]]
+            def dense(x):
+                t = variable(x)
+                result = leading
+                for c in rest:
+                    result = result * t + c
+                return result
+            return dense
+        if len(terms) == 1 and terms[0][0] > 0:
+            # 单项式 c·x^n
+            (n, c), = terms
+            if n == 1:
+                return lambda x: variable(x) * c
+            return lambda x: variable(x) ** n * c
+        # 稀疏多项式：相邻两项的次数差用 ** 计算
+        leading = terms[0][1] if terms else 0.0
+        steps = [(n - m, c) for (n, _), (m, c) in zip(terms, terms[1:])]
+        last = terms[-1][0] if terms else 0
+        def sparse(x):
+            t = variable(x)
+            result = leading
+            for gap, c in steps:
+                result = result * t ** gap + c
+            return result * t ** last if last else result
+        return sparse
+
+def compile_ast(node):
+    """
+    将 AST 编译为可重复调用的函数 f(x)（先做部分求值，常数子树在编译前折叠）
+    树高超过 MAX_CLOSURE_DEPTH 时返回字节码虚拟机的求值函数（结果与错误信息相同）
+    """
+    node = partial_evaluate(node)
+    if height(node) > MAX_CLOSURE_DEPTH:
+        return Bytecode.from_ast(node).evaluate
+    return Compiler.compile(node)
@@ -6,6 +6,8 @@
 import math
 from parser import *
 from lexer import TokenType
+from traversal import postorder, depends_on
+from polynomial import polynomials
 
 class Derivative:
     """符号求导器"""
@@ -18,7 +20,19 @@ class Derivative:
             node: AST 节点
             var: 求导变量（默认为 'x'）
         返回：导数的 AST 节点
+        （显式栈后序遍历，子节点的导数先求出；相同的子树只求导一次；
+        多项式子树直接由系数求导，得到 3 * x^2 + 4 * x - 5 这样的结果）
         """
+        known = polynomials(node, var)
+        return postorder(node, lambda n, primes: Derivative._diff_node(n, primes, var, known))
+    
+    @staticmethod
+    def _diff_node(node, primes, var, known=None):
+        """对单个节点求导，primes 为各子节点的导数，known 为已识别的多项式子树"""
+        polynomial = known.get(node) if known else None
+        if polynomial is not None and primes:
+            return polynomial.derivative().to_ast(var)
+        
         if isinstance(node, NumberNode):
             # 常数的导数为 0
             return NumberNode(0)
@@ -33,25 +47,22 @@ class Derivative:
         elif isinstance(node, UnaryOpNode):
             # 一元运算：-(f) 的导数为 -(f')
             if node.op == TokenType.MINUS:
-                return UnaryOpNode(TokenType.MINUS, 
-                                 Derivative.differentiate(node.operand, var))
+                return UnaryOpNode(TokenType.MINUS, primes[0])
         
         elif isinstance(node, BinaryOpNode):
-            return Derivative._diff_binary_op(node, var)
+            return Derivative._diff_binary_op(node, primes[0], primes[1], var)
         
         elif isinstance(node, FunctionNode):
-            return Derivative._diff_function(node, var)
+            return Derivative._diff_function(node, primes)
         
         else:
             raise Exception(f"无法对节点类型 {type(node)} 求导")
     
     @staticmethod
-    def _diff_binary_op(node, var):
+    def _diff_binary_op(node, left_prime, right_prime, var):
         """二元运算求导"""
         left = node.left
         right = node.right
-        left_prime = Derivative.differentiate(left, var)
-        right_prime = Derivative.differentiate(right, var)
         
         if node.op == TokenType.PLUS:
             # (f + g)' = f' + g'
@@ -77,10 +88,10 @@ class Derivative:
         
         elif node.op == TokenType.POWER:
             # 幂函数求导需要分情况
-            return Derivative._diff_power(left, right, var)
+            return Derivative._diff_power(left, right, left_prime, right_prime, var)
     
     @staticmethod
-    def _diff_power(base, exponent, var):
+    def _diff_power(base, exponent, base_prime, exp_prime, var):
         """
         幂函数求导：f(x)^g(x)
         使用公式：(f^g)' = f^g * (g' * ln(f) + g * f'/f)
@@ -88,9 +99,6 @@ class Derivative:
         - x^n: n * x^(n-1)
         - a^x: a^x * ln(a)
         """
-        base_prime = Derivative.differentiate(base, var)
-        exp_prime = Derivative.differentiate(exponent, var)
-        
         # 检查是否为常数幂：x^n
         if Derivative._is_constant(exponent, var):
             # (f^n)' = n * f^(n-1) * f'
@@ -122,19 +130,19 @@ class Derivative:
             return BinaryOpNode(power_part, TokenType.MULTIPLY, bracket)
     
     @staticmethod
-    def _diff_function(node, var):
-        """函数求导"""
+    def _diff_function(node, primes):
+        """函数求导，primes 为各参数的导数"""
         if node.name == TokenType.SIN:
             # sin(f)' = cos(f) * f'
             arg = node.args[0]
-            arg_prime = Derivative.differentiate(arg, var)
+            arg_prime = primes[0]
             cos_node = FunctionNode(TokenType.COS, [arg])
             return BinaryOpNode(cos_node, TokenType.MULTIPLY, arg_prime)
         
         elif node.name == TokenType.COS:
             # cos(f)' = -sin(f) * f'
             arg = node.args[0]
-            arg_prime = Derivative.differentiate(arg, var)
+            arg_prime = primes[0]
             sin_node = FunctionNode(TokenType.SIN, [arg])
             neg_sin = UnaryOpNode(TokenType.MINUS, sin_node)
             return BinaryOpNode(neg_sin, TokenType.MULTIPLY, arg_prime)
@@ -143,14 +151,14 @@ class Derivative:
             if len(node.args) == 1:
                 # ln(f)' = f' / f
                 arg = node.args[0]
-                arg_prime = Derivative.differentiate(arg, var)
+                arg_prime = primes[0]
                 return BinaryOpNode(arg_prime, TokenType.DIVIDE, arg)
             
             elif len(node.args) == 2:
                 # log_a(f)' = f' / (f * ln(a))
                 base = node.args[0]
                 arg = node.args[1]
-                arg_prime = Derivative.differentiate(arg, var)
+                arg_prime = primes[1]
                 
                 ln_base = FunctionNode(TokenType.LOG, [base])
                 denominator = BinaryOpNode(arg, TokenType.MULTIPLY, ln_base)
@@ -158,85 +166,140 @@ class Derivative:
     
     @staticmethod
     def _is_constant(node, var):
-        """判断节点是否为常数（不含变量 var）"""
-        if isinstance(node, NumberNode):
-            return True
-        elif isinstance(node, VariableNode):
-            return node.name != var
-        elif isinstance(node, UnaryOpNode):
-            return Derivative._is_constant(node.operand, var)
-        elif isinstance(node, BinaryOpNode):
-            return (Derivative._is_constant(node.left, var) and 
-                   Derivative._is_constant(node.right, var))
-        elif isinstance(node, FunctionNode):
-            return all(Derivative._is_constant(arg, var) for arg in node.args)
-        return False
+        """判断节点是否为常数（不含变量 var；变量集合缓存在节点上，O(1)）"""
+        return not depends_on(node, var)
+
+def ast_to_string(node, max_length=None):
+    """
+    将 AST 转换为可读的字符串表达式
+    显式栈逐个输出片段，最后一次性拼接，耗时与输出长度成正比，不受嵌套深度限制；
+    max_length 给定时只输出前 max_length 个字符，其余省略为 …
+    """
+    pieces = []
+    if not _emit(node, pieces, {}, max_length):
+        pieces.append("…")
+    return ''.join(pieces)
+
+def shared_subexpressions(root, min_size=4):
+    """
+    输出时会重复出现的子树：被多处引用（共享子树）且展开后不少于 min_size 个节点
+    返回按依赖顺序排列的节点列表（子式在前）
+    """
+    order = []
+    def visit(node, sizes):
+        order.append(node)
+        return 1 + sum(sizes)
+    sizes = {}
+    postorder(root, visit, sizes)
+
+    references = {}
+    for node in order:
+        for child in node.children():
+            references[child] = references.get(child, 0) + 1
+    return [node for node in order if references.get(node, 0) >= 2 and sizes[node] >= min_size]
+
+def format_with_bindings(node, lhs, min_size=4, max_length=None):
+    """
+    带中间变量的多行输出：重复出现的子树只输出一次，命名为 u1、u2……
+        u1 = ...
+        f'(x) = ...u1...u1...
+    没有重复子树时即为 "lhs = 表达式"；max_length 限制总字符数，超出部分省略
+    """
+    shared = shared_subexpressions(node, min_size)
+    names = {sub: f"u{i}" for i, sub in enumerate(shared, 1)}
+    lines = [(names[sub], sub) for sub in shared] + [(lhs, node)]
+
+    pieces = []
+    remaining = max_length
+    for name, sub in lines:
+        start = len(pieces)
+        pieces.append(f"{name} = ")
+        complete = _emit(sub, pieces, names, remaining)
+        if remaining is not None:
+            remaining -= sum(len(piece) for piece in pieces[start:])
+        if not complete or (remaining is not None and remaining <= 0 and sub is not node):
+            pieces.append("…（输出过长，已省略）")
+            break
+        pieces.append("\n")
+    return ''.join(pieces).rstrip("\n")
+
+def _emit(root, pieces, names, limit=None):
+    """
+    把 root 的输出片段追加到 pieces（names 中的子树输出为名字）
+    输出将超过 limit 个字符时截断到 limit 个字符并返回 False
+    """
+    atom = lambda child: child in names
+    length = 0
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            if limit is not None and length + len(item) > limit:
+                pieces.append(item[:limit - length])
+                return False
+            pieces.append(item)
+            length += len(item)
+        elif item is not root and item in names:
+            stack.append(names[item])
+        else:
+            stack.extend(reversed(_layout(item, atom)))
+    return True
+
+def _layout(node, atom):
+    """单个节点的输出片段：字符串与子节点；atom(child) 为真的子节点输出为名字，不加括号"""
+    def wrap(child, parenthesize):
+        return ["(", child, ")"] if parenthesize and not atom(child) else [child]
 
-def ast_to_string(node):
-    """将 AST 转换为可读的字符串表达式"""
     if isinstance(node, NumberNode):
         if node.value == 'π':
-            return 'π'
+            return ['π']
         elif node.value == 'e':
-            return 'e'
+            return ['e']
         elif isinstance(node.value, float):
             if node.value == int(node.value):
-                return str(int(node.value))
-            return str(node.value)
-        return str(node.value)
+                return [str(int(node.value))]
+            return [str(node.value)]
+        return [str(node.value)]
     
     elif isinstance(node, VariableNode):
-        return node.name
+        return [node.name]
     
     elif isinstance(node, UnaryOpNode):
-        operand_str = ast_to_string(node.operand)
         if node.op == TokenType.MINUS:
             # 如果操作数是复杂表达式，加括号
-            if isinstance(node.operand, (BinaryOpNode, FunctionNode)):
-                return f"-({operand_str})"
-            return f"-{operand_str}"
+            return ["-"] + wrap(node.operand, isinstance(node.operand, (BinaryOpNode, FunctionNode)))
     
     elif isinstance(node, BinaryOpNode):
-        left_str = ast_to_string(node.left)
-        right_str = ast_to_string(node.right)
+        left, right = node.left, node.right
         
         # 根据优先级决定是否加括号
         if node.op == TokenType.PLUS:
-            return f"{left_str} + {right_str}"
+            return [left, " + ", right]
         elif node.op == TokenType.MINUS:
             # 右侧如果是加减法，需要括号
-            if isinstance(node.right, BinaryOpNode) and node.right.op in (TokenType.PLUS, TokenType.MINUS):
-                return f"{left_str} - ({right_str})"
-            return f"{left_str} - {right_str}"
+            return [left, " - "] + wrap(right, _is_sum(right))
         elif node.op == TokenType.MULTIPLY:
             # 左右如果是加减法，需要括号
-            if isinstance(node.left, BinaryOpNode) and node.left.op in (TokenType.PLUS, TokenType.MINUS):
-                left_str = f"({left_str})"
-            if isinstance(node.right, BinaryOpNode) and node.right.op in (TokenType.PLUS, TokenType.MINUS):
-                right_str = f"({right_str})"
-            return f"{left_str} * {right_str}"
+            return wrap(left, _is_sum(left)) + [" * "] + wrap(right, _is_sum(right))
         elif node.op == TokenType.DIVIDE:
-            if isinstance(node.left, BinaryOpNode) and node.left.op in (TokenType.PLUS, TokenType.MINUS):
-                left_str = f"({left_str})"
-            if isinstance(node.right, BinaryOpNode):
-                right_str = f"({right_str})"
-            return f"{left_str} / {right_str}"
+            return wrap(left, _is_sum(left)) + [" / "] + wrap(right, isinstance(right, BinaryOpNode))
         elif node.op == TokenType.POWER:
-            if isinstance(node.left, BinaryOpNode):
-                left_str = f"({left_str})"
-            if isinstance(node.right, BinaryOpNode):
-                right_str = f"({right_str})"
-            return f"{left_str}^{right_str}"
+            return (wrap(left, isinstance(left, BinaryOpNode)) + ["^"]
+                    + wrap(right, isinstance(right, BinaryOpNode)))
     
     elif isinstance(node, FunctionNode):
         if node.name == TokenType.SIN:
-            return f"sin({ast_to_string(node.args[0])})"
+            return ["sin(", node.args[0], ")"]
         elif node.name == TokenType.COS:
-            return f"cos({ast_to_string(node.args[0])})"
+            return ["cos(", node.args[0], ")"]
         elif node.name == TokenType.LOG:
             if len(node.args) == 1:
-                return f"ln({ast_to_string(node.args[0])})"
+                return ["ln(", node.args[0], ")"]
             else:
-                return f"log({ast_to_string(node.args[0])}, {ast_to_string(node.args[1])})"
+                return ["log(", node.args[0], ", ", node.args[1], ")"]
     
-    return str(node)
+    return [str(node)]
+
+def _is_sum(node):
+    """是否为加减运算节点"""
+    return isinstance(node, BinaryOpNode) and node.op in (TokenType.PLUS, TokenType.MINUS)
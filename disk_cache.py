@@ -0,0 +1,272 @@
+"""
+磁盘缓存（Disk Cache）
+功能：把解析出的 AST、化简后的导函数与绘图采样数组保存在用户缓存目录中，
+程序重新启动或再次运行批处理时直接读取，无需重新解析、求导和求值
+
+- 语法树保存为字节码的二进制格式（后缀指令与常数池，共享的子树只展开一次）
+- 数组保存为 .npy 文件，读取时以内存映射方式打开，只有用到的页才会读入内存
+- 缓存键可以含 AST 节点，按结构摘要计算文件名，与进程无关
+- 总大小超过上限时按最近使用时间（文件修改时间）淘汰最旧的文件
+- 缓存放在指定目录下本程序专用的子目录中（<目录>/math-function-calculator/v3），按格式版本区分；
+  格式变化时提高 CACHE_VERSION，旧版本的目录在打开时删除（只删除带有本程序标记文件的目录）
+"""
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+import numpy as np
+from parser import ASTNode
+from bytecode import Bytecode
+
+CACHE_VERSION = 3                 # 缓存格式版本（字节码格式、采样算法变化时提高）
+MAX_BYTES = 256 * 1024 * 1024     # 默认容量上限（字节）
+APP_DIR = 'math-function-calculator'
+ENV_DIR = 'CALCULATOR_CACHE_DIR'  # 指定缓存目录的环境变量
+MARKER = '.math-function-calculator-cache'  # 版本目录中的标记文件（只有带标记的目录才会被删除）
+
+def default_directory():
+    """缓存的上级目录：环境变量 CALCULATOR_CACHE_DIR，否则按平台惯例（Windows 为 LOCALAPPDATA）"""
+    directory = os.environ.get(ENV_DIR)
+    if directory:
+        return directory
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return base
+
+_DIGESTS = weakref.WeakKeyDictionary()  # AST → 结构摘要
+_DIGESTS_LOCK = threading.Lock()
+
+def ast_digest(node):
+    """AST 的结构摘要（SHA-1 十六进制），结构相同的树在任何进程中都相同"""
+    with _DIGESTS_LOCK:
+        digest = _DIGESTS.get(node)
+    if digest is None:
+        digest = hashlib.sha1(Bytecode.from_ast(node).to_bytes()).hexdigest()
+        with _DIGESTS_LOCK:
+            _DIGESTS[node] = digest
+    return digest
+
+def key_digest(key):
+    """缓存键（可含 AST 节点的元组）的摘要，用作文件名"""
+    def canonical(value):
+        if isinstance(value, ASTNode):
+            return ('ast', ast_digest(value))
+        if isinstance(value, tuple):
+            return tuple(canonical(v) for v in value)
+        return value
+    return hashlib.sha1(repr(canonical(key)).encode('utf-8')).hexdigest()
+
+# ========== 磁盘缓存 ==========
+
+class DiskCache:
+    """
+    磁盘缓存：kind 区分条目种类（子目录），key 为可含 AST 的元组
+    多个进程可以共用同一目录：写入先写临时文件再原子替换，读到损坏或已被删除的文件时视为未命中
+    directory 为上级目录，文件都在其中的 math-function-calculator 子目录里，不会改动目录中的其他内容
+    """
+    def __init__(self, directory=None, max_bytes=MAX_BYTES):
+        base = os.path.join(directory or default_directory(), APP_DIR)
+        self.directory = os.path.join(base, f'v{CACHE_VERSION}')
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, MARKER), 'a'):
+            pass
+        self._remove_old_versions(base)
+        self._files = OrderedDict()  # 路径 → 字节数，按最近使用排序（最旧的在前）
+        self._size = 0
+        self._scan()
+
+    def _remove_old_versions(self, base):
+        """删除其他格式版本的缓存目录（只删除带有标记文件、确为本程序创建的目录）"""
+        current = os.path.basename(self.directory)
+        for entry in os.scandir(base):
+            if (entry.is_dir(follow_symlinks=False) and entry.name[:1] == 'v' and entry.name[1:].isdigit()
+                    and entry.name != current and os.path.isfile(os.path.join(entry.path, MARKER))):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _scan(self):
+        """按修改时间登记已有的缓存文件"""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name == MARKER:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(files):
+            self._files[path] = size
+            self._size += size
+
+    def _path(self, kind, key, suffix):
+        return os.path.join(self.directory, kind, key_digest(key) + suffix)
+
+    # ---------- 语法树 ----------
+
+    def load_ast(self, kind, key):
+        """读取 AST，未命中时返回 None"""
+        path = self._path(kind, key, '.ast')
+        try:
+            with open(path, 'rb') as f:
+                node = Bytecode.from_bytes(f.read()).to_ast()
+        except FileNotFoundError:
+            return self._miss(path)
+        except Exception:
+            # 文件损坏或字节码格式已变化
+            self._discard(path)
+            return self._miss(path)
+        self._touch(path)
+        return node
+
+    def save_ast(self, kind, key, node):
+        """保存 AST"""
+        data = Bytecode.from_ast(node).to_bytes()
+        self._write(self._path(kind, key, '.ast'), lambda f: f.write(data))
+
+    # ---------- 数组 ----------
+
+    def load_array(self, kind, key):
+        """以内存映射方式（只读）打开数组，未命中时返回 None"""
+        path = self._path(kind, key, '.npy')
+        try:
+            array = np.load(path, mmap_mode='r', allow_pickle=False)
+        except FileNotFoundError:
+            return self._miss(path)
+        except Exception:
+            self._discard(path)
+            return self._miss(path)
+        self._touch(path)
+        return array
+
+    def save_array(self, kind, key, array):
+        """保存数组（.npy 格式）"""
+        array = np.ascontiguousarray(array)
+        self._write(self._path(kind, key, '.npy'), lambda f: np.save(f, array, allow_pickle=False))
+
+    # ---------- 文件管理 ----------
+
+    def _miss(self, path):
+        with self._lock:
+            self.misses += 1
+            self._forget(path)
+        return None
+
+    def _touch(self, path):
+        """命中：更新修改时间（其他进程据此判断最近使用），移到最近使用的一端"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            if path in self._files:
+                self._files.move_to_end(path)
+                return
+        # 其他进程写入的文件：登记到最近使用的一端
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            self._forget(path)
+            self._files[path] = size
+            self._size += size
+
+    def _write(self, path, write):
+        """写入临时文件后原子替换，然后按容量上限淘汰最旧的文件"""
+        temp = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(temp, path)
+            size = os.path.getsize(path)
+        except OSError:
+            # 磁盘已满、目录不可写或目标文件正被映射（Windows）：放弃写入
+            if temp is not None:
+                self._discard(temp)
+            return
+        with self._lock:
+            self._forget(path)
+            self._files[path] = size
+            self._size += size
+            self._evict()
+
+    def _evict(self):
+        """删除最久未使用的文件直到总大小不超过上限（调用时须持有锁）"""
+        while self._size > self.max_bytes and len(self._files) > 1:
+            path, size = self._files.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(path)
+            except OSError:
+                # 已被其他进程删除，或正被内存映射（Windows）
+                pass
+
+    def _forget(self, path):
+        """从登记表中移除（调用时须持有锁）"""
+        size = self._files.pop(path, None)
+        if size is not None:
+            self._size -= size
+
+    def _discard(self, path):
+        """删除损坏的文件"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """删除全部缓存文件并重置命中计数"""
+        with self._lock:
+            for path in self._files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._files.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def size(self):
+        """缓存文件的总字节数"""
+        with self._lock:
+            return self._size
+
+    def __len__(self):
+        with self._lock:
+            return len(self._files)
+
+    def stats(self):
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'bytes': self.size(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+def open_disk_cache(directory=None, max_bytes=MAX_BYTES):
+    """打开磁盘缓存；目录无法创建时返回 None（不使用磁盘缓存）"""
+    try:
+        return DiskCache(directory, max_bytes)
+    except OSError:
+        return None
@@ -3,8 +3,12 @@
 功能：遍历 AST 并计算数值结果
 """
 import math
+import numpy as np
 from parser import *
 from lexer import TokenType
+from traversal import postorder
+from polynomial import (PolynomialNode, MAX_MULTIPLY_POWER, combine, leaf_polynomial,
+                        horner, estrin, multiply_power)
 
 class Evaluator:
     """表达式求值器"""
@@ -13,17 +17,27 @@ class Evaluator:
         self.symbolic_mode = (x_value is None)  # 是否为符号模式
     
     def evaluate(self, node):
-        """递归求值 AST 节点"""
+        """
+        求值 AST 节点
+        先做部分求值（不含 x 的子树折叠为常数，结果缓存在节点上），
+        再显式栈后序遍历：子节点的值求出后传给 eval_*，不受递归深度限制，共享的子树只求值一次
+        """
+        return postorder(partial_evaluate(node), self._visit)
+    
+    def _visit(self, node, child_values):
+        """求值单个节点（child_values 为子节点的值）"""
         if isinstance(node, NumberNode):
             return self.eval_number(node)
         elif isinstance(node, VariableNode):
             return self.eval_variable(node)
         elif isinstance(node, BinaryOpNode):
-            return self.eval_binary_op(node)
+            return self.eval_binary_op(node, *child_values)
         elif isinstance(node, UnaryOpNode):
-            return self.eval_unary_op(node)
+            return self.eval_unary_op(node, *child_values)
         elif isinstance(node, FunctionNode):
-            return self.eval_function(node)
+            return self.eval_function(node, child_values)
+        elif isinstance(node, PolynomialNode):
+            return self.eval_polynomial(node, *child_values)
         else:
             raise Exception(f"未知节点类型: {type(node)}")
     
@@ -42,11 +56,8 @@ class Evaluator:
             raise Exception("变量 x 未赋值")
         return self.x_value
     
-    def eval_binary_op(self, node):
-        """求值二元运算节点"""
-        left = self.evaluate(node.left)
-        right = self.evaluate(node.right)
-        
+    def eval_binary_op(self, node, left, right):
+        """求值二元运算节点（left、right 为子节点的值）"""
         if node.op == TokenType.PLUS:
             return left + right
         elif node.op == TokenType.MINUS:
@@ -62,40 +73,38 @@ class Evaluator:
         else:
             raise Exception(f"未知运算符: {node.op}")
     
-    def eval_unary_op(self, node):
+    def eval_unary_op(self, node, operand):
         """求值一元运算节点"""
-        operand = self.evaluate(node.operand)
-        
         if node.op == TokenType.MINUS:
             return -operand
         else:
             raise Exception(f"未知一元运算符: {node.op}")
     
-    def eval_function(self, node):
+    def eval_function(self, node, args):
         """求值函数节点"""
         if node.name == TokenType.SIN:
             if len(node.args) != 1:
                 raise Exception("sin 函数需要 1 个参数")
-            arg = self.evaluate(node.args[0])
+            arg = args[0]
             return math.sin(arg)
         
         elif node.name == TokenType.COS:
             if len(node.args) != 1:
                 raise Exception("cos 函数需要 1 个参数")
-            arg = self.evaluate(node.args[0])
+            arg = args[0]
             return math.cos(arg)
         
         elif node.name == TokenType.LOG:
             if len(node.args) == 1:
                 # log(x) 默认为自然对数
-                arg = self.evaluate(node.args[0])
+                arg = args[0]
                 if arg <= 0:
                     raise Exception("对数函数参数必须大于 0")
                 return math.log(arg)
             elif len(node.args) == 2:
                 # log(a, x) 表示以 a 为底 x 的对数
-                base = self.evaluate(node.args[0])
-                arg = self.evaluate(node.args[1])
+                base = args[0]
+                arg = args[1]
                 if base <= 0 or base == 1:
                     raise Exception("对数底数必须大于 0 且不等于 1")
                 if arg <= 0:
@@ -107,50 +116,310 @@ class Evaluator:
         else:
             raise Exception(f"未知函数: {node.name}")
 
-def format_result(value, precision=4):
+    def eval_polynomial(self, node, x):
+        """求值多项式节点（秦九韶法）"""
+        return horner(node.terms, x)
+
+class VectorEvaluator(Evaluator):
     """
-    格式化输出结果
-    优先级：整数 > 分数 > π/e 的倍数 > 小数
+    向量化求值器
+    x 为 NumPy 数组，每个节点只求值一次（逐元素 ufunc 运算），
+    定义域错误（除以零、对数参数非正等）不抛异常，而是在对应位置置为 NaN
     """
-    # 检查是否接近整数
-    if abs(value - round(value)) < 1e-10:
-        return str(int(round(value)))
+    def __init__(self, x_values):
+        super().__init__(x_value=np.asarray(x_values, dtype=float))
+    
+    def evaluate(self, node):
+        """求值 AST 节点，忽略浮点警告（无效结果记为 NaN）"""
+        with np.errstate(all='ignore'):
+            return super().evaluate(node)
     
-    # 检查是否为 π 的倍数
-    pi_ratio = value / math.pi
-    if abs(pi_ratio - round(pi_ratio)) < 1e-10:
-        coef = int(round(pi_ratio))
-        if coef == 1:
-            return "π"
-        elif coef == -1:
-            return "-π"
+    def eval_binary_op(self, node, left, right):
+        """求值二元运算节点（逐元素）"""
+        if node.op == TokenType.PLUS:
+            return np.add(left, right)
+        elif node.op == TokenType.MINUS:
+            return np.subtract(left, right)
+        elif node.op == TokenType.MULTIPLY:
+            return np.multiply(left, right)
+        elif node.op == TokenType.DIVIDE:
+            # 除数为零处置为 NaN
+            return np.where(right == 0, np.nan, np.divide(left, right))
+        elif node.op == TokenType.POWER:
+            if isinstance(right, float) and right.is_integer() and 2 <= right <= MAX_MULTIPLY_POWER:
+                # 小整数次幂化为连乘
+                return multiply_power(np.asarray(left, dtype=float), int(right))
+            # 负数的非整数次幂在实数域无定义，np.power 返回 NaN
+            left = np.asarray(left, dtype=float)
+            # pow(1, nan) 与 pow(nan, 0) 为 1：底数或指数无定义处仍记为 NaN
+            return np.where(np.isnan(left) | np.isnan(right), np.nan, np.power(left, right))
         else:
-            return f"{coef}π"
+            raise Exception(f"未知运算符: {node.op}")
     
-    # 检查是否为 e 的倍数
-    e_ratio = value / math.e
-    if abs(e_ratio - round(e_ratio)) < 1e-10:
-        coef = int(round(e_ratio))
-        if coef == 1:
-            return "e"
-        elif coef == -1:
-            return "-e"
+    def eval_unary_op(self, node, operand):
+        """求值一元运算节点（逐元素）"""
+        if node.op == TokenType.MINUS:
+            return np.negative(operand)
         else:
-            return f"{coef}e"
+            raise Exception(f"未知一元运算符: {node.op}")
     
-    # 尝试简单分数表示（分母 <= 100）
-    for denom in range(2, 101):
-        numer = value * denom
-        if abs(numer - round(numer)) < 1e-10:
-            numer = int(round(numer))
-            # 简化分数
-            from math import gcd
-            g = gcd(abs(numer), denom)
-            numer //= g
-            denom //= g
-            if denom == 1:
-                return str(numer)
-            return f"{numer}/{denom}"
+    def eval_function(self, node, args):
+        """求值函数节点（逐元素）"""
+        if node.name == TokenType.SIN:
+            if len(node.args) != 1:
+                raise Exception("sin 函数需要 1 个参数")
+            return np.sin(args[0])
+        
+        elif node.name == TokenType.COS:
+            if len(node.args) != 1:
+                raise Exception("cos 函数需要 1 个参数")
+            return np.cos(args[0])
+        
+        elif node.name == TokenType.LOG:
+            if len(node.args) == 1:
+                arg = args[0]
+                return np.where(arg > 0, np.log(arg), np.nan)
+            elif len(node.args) == 2:
+                base = args[0]
+                arg = args[1]
+                valid = (base > 0) & (base != 1) & (arg > 0)
+                return np.where(valid, np.log(arg) / np.log(base), np.nan)
+            else:
+                raise Exception("log 函数需要 1 或 2 个参数")
+        
+        else:
+            raise Exception(f"未知函数: {node.name}")
+
+    def eval_polynomial(self, node, x):
+        """求值多项式节点（Estrin 法，逐层在整个数组上运算）"""
+        return estrin(node.terms, x)
+
+def evaluate_vectorized(node, x_values):
+    """
+    对一组 x 值整体求值
+    返回与 x_values 形状相同的浮点数组，无定义或溢出的点为 NaN
+    """
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = VectorEvaluator(x_values).evaluate(node)
+    # 常数表达式得到标量，广播为完整数组
+    y_values = np.array(np.broadcast_to(y_values, x_values.shape), dtype=float)
+    y_values[~np.isfinite(y_values)] = np.nan
+    return y_values
+
+# ========== 部分求值 ==========
+
+class _FoldedMemo:
+    """以节点自身的 _folded 槽作为备忘表（折叠结果为节点自身时记为 True，避免自引用）"""
+    def __contains__(self, node):
+        return getattr(node, '_folded', None) is not None
+    
+    def __getitem__(self, node):
+        folded = node._folded
+        return node if folded is True else folded
     
+    def __setitem__(self, node, folded):
+        if isinstance(node, ASTNode):
+            object.__setattr__(node, '_folded', True if folded is node else folded)
+
+_FOLDED_MEMO = _FoldedMemo()
+_CONSTANT_EVALUATOR = Evaluator()  # 只对常数子树调用，不涉及 x
+
+def partial_evaluate(node):
+    """
+    部分求值：自底向上把不含变量的子树折叠为数字节点，
+    把底数为常数的 log(a, f) 改写为 ln(f) * (1/ln a)，使 1/ln a 只计算一次，
+    并把多项式子树折叠为多项式节点（按系数求值）
+    结果缓存在节点上，同一表达式之后的求值、编译与绘图采样直接取用；
+    求值会出错的常数子树（如 1/0、log(-1)）保持原样，错误仍在求值时报告
+    """
+    return postorder(node, _fold_node, _FOLDED_MEMO)
+
+def _fold_node(node, children):
+    """折叠单个节点（children 为已折叠的子节点）"""
+    if not children:
+        return node
+    node = node.with_children(children)
+    if all(isinstance(child, NumberNode) for child in children):
+        # 子节点都是数字（不含变量）：用求值器算出常数
+        try:
+            value = _CONSTANT_EVALUATOR._visit(
+                node, [_CONSTANT_EVALUATOR.eval_number(child) for child in children])
+        except Exception:
+            return node
+        if isinstance(value, float) and math.isfinite(value):
+            return NumberNode(value)
+        return node
+    if (isinstance(node, FunctionNode) and node.name == TokenType.LOG
+            and len(children) == 2 and isinstance(children[0], NumberNode)):
+        # log(a, f) = ln(f) * (1/ln a)，底数无效时保持原样（求值时报错）
+        base = _CONSTANT_EVALUATOR.eval_number(children[0])
+        if base > 0 and base != 1:
+            scale = NumberNode(1 / math.log(base))
+            return BinaryOpNode(FunctionNode(TokenType.LOG, [children[1]]), TokenType.MULTIPLY, scale)
+    if isinstance(node, (BinaryOpNode, UnaryOpNode)):
+        # 子节点都是 x 的多项式时合并为多项式节点
+        polynomial = combine(node, [leaf_polynomial(child) for child in children])
+        if polynomial is not None:
+            return PolynomialNode(polynomial.coefficients(), VariableNode('x'))
+    return node
+
+# ========== 结果格式化 ==========
+
+MAX_DENOMINATOR = 100  # 识别的分数的最大分母
+TOLERANCE = 1e-10      # 识别整数、分数与常数倍数的容差（|value·q - p| < TOLERANCE）
+
+# 依次尝试的倍数：普通分数、π 的分数倍、e 的分数倍
+_SYMBOLS = (('', 1.0), ('π', math.pi), ('e', math.e))
+
+def best_rational(value, max_denominator=MAX_DENOMINATOR, tolerance=TOLERANCE):
+    """
+    连分数展开求 value 的最佳有理逼近 p/q（各渐近分数即 Stern–Brocot 树上的路径）
+    返回满足 |value·q - p| < tolerance 且 q ≤ max_denominator 的分母最小的 (p, q)，没有时返回 None
+    满足容差的分数必为渐近分数，分母按斐波那契数列以上的速度增长，步数为 O(log q)
+    """
+    p_prev, q_prev, p, q = 0, 1, 1, 0
+    x = value
+    while True:
+        a = math.floor(x)
+        p_prev, q_prev, p, q = p, q, a * p + p_prev, a * q + q_prev
+        if q > max_denominator:
+            return None
+        if abs(value * q - p) < tolerance:
+            return p, q
+        x -= a
+        if x == 0 or 1 / x >= max_denominator + 1:
+            # 下一个部分商会使分母超出上限
+            return None
+        x = 1 / x
+
+def best_rationals(values, max_denominator=MAX_DENOMINATOR, tolerance=TOLERANCE):
+    """
+    best_rational 的向量化版本：对整个数组同时做连分数展开
+    返回 (分子, 分母, 是否找到) 三个数组，未找到处的分子分母无意义
+    """
+    values = np.asarray(values, dtype=float)
+    p_prev, q_prev = np.zeros_like(values), np.ones_like(values)
+    p, q = np.ones_like(values), np.zeros_like(values)
+    numerators, denominators = np.zeros_like(values), np.ones_like(values)
+    found = np.zeros(values.shape, dtype=bool)
+    active = np.isfinite(values)
+    x = np.where(active, values, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        while active.any():
+            a = np.floor(x)
+            p_prev, q_prev, p, q = p, q, a * p + p_prev, a * q + q_prev
+            active &= q <= max_denominator
+            hit = active & (np.abs(values * q - p) < tolerance)
+            numerators[hit], denominators[hit] = p[hit], q[hit]
+            found |= hit
+            x -= a
+            active &= ~hit & (x != 0)
+            x = np.where(active, 1 / x, 0.0)
+    return numerators, denominators, found
+
+def format_result(value, precision=4):
+    """
+    格式化输出结果
+    优先级：整数 > 分数 > π/e 的分数倍（如 3π/4） > 小有理数的平方根（如 √2/2） > 小数
+    """
+    exact = exact_form(value)
+    if exact is not None:
+        return exact
     # 默认返回小数
     return f"{value:.{precision}f}"
+
+def exact_form(value):
+    """value 的精确形式（整数、分数、π/e 的分数倍或平方根），不是这些形式时返回 None"""
+    if not math.isfinite(value):
+        return None
+
+    # 检查是否接近整数
+    if abs(value - round(value)) < TOLERANCE:
+        return str(int(round(value)))
+
+    # 分数，π 与 e 的分数倍
+    for symbol, scale in _SYMBOLS:
+        fraction = best_rational(value / scale)
+        if fraction is not None:
+            return _format_fraction(*fraction, symbol)
+
+    # 小有理数的平方根
+    fraction = best_rational(value * value)
+    if fraction is not None:
+        return _format_square_root(value, *fraction)
+    return None
+
+def format_results(values, precision=4):
+    """
+    format_result 的向量化版本（用于函数值表的整列格式化）
+    整数判断与连分数展开在整个数组上进行，只有识别出的分数逐个拼接字符串；
+    返回字符串列表，与逐个调用 format_result 的结果相同
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    result = np.empty(values.shape, dtype=object)
+    remaining = np.isfinite(values)
+
+    # 整数
+    rounded = np.round(values)
+    with np.errstate(invalid='ignore'):
+        integer = remaining & (np.abs(values - rounded) < TOLERANCE)
+    result[integer] = [str(int(v)) for v in rounded[integer].tolist()]
+    remaining &= ~integer
+
+    # 分数，π 与 e 的分数倍
+    for symbol, scale in _SYMBOLS:
+        index = np.flatnonzero(remaining)
+        p, q, found = best_rationals(values[index] / scale)
+        index = index[found]
+        result[index] = [_format_fraction(int(a), int(b), symbol)
+                         for a, b in zip(p[found].tolist(), q[found].tolist())]
+        remaining[index] = False
+
+    # 小有理数的平方根
+    index = np.flatnonzero(remaining)
+    p, q, found = best_rationals(values[index] ** 2)
+    for i, a, b in zip(index[found].tolist(), p[found].tolist(), q[found].tolist()):
+        root = _format_square_root(values[i], int(a), int(b))
+        if root is not None:
+            result[i] = root
+            remaining[i] = False
+
+    # 其余为小数（NaN 与无穷同 format_result）
+    rest = remaining | ~np.isfinite(values)
+    result[rest] = np.char.mod(f"%.{precision}f", values[rest]).tolist()
+    return result.tolist()
+
+def _format_fraction(p, q, symbol=''):
+    """p/q 倍的 symbol：3/4、3π/4、-π/2、2e"""
+    sign = '-' if p < 0 else ''
+    p = abs(p)
+    if symbol:
+        numerator = symbol if p == 1 else f"{p}{symbol}"
+    else:
+        numerator = str(p)
+    return f"{sign}{numerator}" if q == 1 else f"{sign}{numerator}/{q}"
+
+def _format_square_root(value, p, q):
+    """
+    value² ≈ p/q 时写成 k√m/d（m 无平方因子）；分子分母超出 MAX_DENOMINATOR、
+    p/q 为完全平方或代回后误差超出容差时返回 None
+    """
+    if not 0 < p <= MAX_DENOMINATOR:
+        return None
+    # √(p/q) = √(p·q)/q，再从 p·q 中提出平方因子
+    k, m = 1, p * q
+    f = 2
+    while f * f <= m:
+        while m % (f * f) == 0:
+            k *= f
+            m //= f * f
+        f += 1
+    if m == 1:
+        return None
+    g = math.gcd(k, q)
+    k, d = k // g, q // g
+    if abs(abs(value) - k * math.sqrt(m) / d) >= TOLERANCE:
+        return None
+    sign = '-' if value < 0 else ''
+    coefficient = '' if k == 1 else str(k)
+    return f"{sign}{coefficient}√{m}" if d == 1 else f"{sign}{coefficient}√{m}/{d}"
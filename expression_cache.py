@@ -0,0 +1,241 @@
+"""
+表达式缓存（Expression Cache）
+功能：按规范化后的表达式文本缓存解析结果（AST），并按需缓存编译后的求值函数与导函数，
+同一表达式反复计算、绘图、求导或在批处理中重复出现时无需重新词法分析和语法分析
+
+失效规则：
+- AST 节点不可修改，缓存条目不会过期；容量满时淘汰最久未使用的条目
+- 解析失败也会缓存（再次查询时抛出相同的异常）
+- invalidate(text) 删除单个条目，clear() 清空缓存并重置计数
+
+导函数另有按 (AST, 变量, 阶数) 缓存的 DerivativeCache，与表达式文本无关：
+同一函数的 f'、f''、f''' 逐阶复用，不同写法解析出同一 AST 时也能命中
+
+两种缓存都可以挂接磁盘缓存（store，见 disk_cache.DiskCache）：内存未命中时先从磁盘读取，
+新解析的 AST 与新求出的导函数写入磁盘，程序重新启动后仍可命中
+"""
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from lexer import Lexer
+from parser import Parser
+from compiler import compile_ast
+from derivative import Derivative
+from simplifier import simplify
+
+_PI_AFTER_WORD = re.compile(r'(?<=\w)π')   # 紧跟在字母、数字之后的 π
+_PI_BEFORE_WORD = re.compile(r'π(?=\w)')  # 后面紧跟字母、数字的 π
+
+def normalize(expr_text):
+    """
+    规范化表达式文本：与词法分析器一样删除空格，π 统一为 pi；
+    π 与相邻的字母、数字之间补上乘号（xπ 为 x*pi，而不是标识符 xpi）
+    """
+    text = expr_text.strip().replace(' ', '')
+    text = _PI_AFTER_WORD.sub('*π', text)
+    text = _PI_BEFORE_WORD.sub('π*', text)
+    return text.replace('π', 'pi')
+
+class CachedExpression:
+    """
+    缓存条目：AST 及按需计算的编译函数与导函数
+    （并发访问时可能重复计算，但由于节点哈希共享，结果相同）
+    """
+    __slots__ = ('text', 'ast', '_compiled', '_raw_derivative', '_derivative')
+
+    def __init__(self, text, ast):
+        self.text = text
+        self.ast = ast
+        self._compiled = None
+        self._raw_derivative = None
+        self._derivative = None
+
+    @property
+    def compiled(self):
+        """编译后的求值函数 f(x)"""
+        if self._compiled is None:
+            self._compiled = compile_ast(self.ast)
+        return self._compiled
+
+    @property
+    def raw_derivative(self):
+        """未化简的导函数 AST"""
+        if self._raw_derivative is None:
+            self._raw_derivative = Derivative.differentiate(self.ast)
+        return self._raw_derivative
+
+    @property
+    def derivative(self):
+        """化简后的导函数 AST"""
+        if self._derivative is None:
+            self._derivative = derivative_cache.derivative(self.ast)
+        return self._derivative
+
+    def nth_derivative(self, order):
+        """化简后的 order 阶导函数 AST（0 阶为原函数）"""
+        return derivative_cache.derivative(self.ast, order=order)
+
+class DerivativeCache:
+    """
+    (AST, 变量, 阶数) → 化简后的导函数 的 LRU 缓存
+    n 阶导数从缓存中已有的最高阶逐阶求出，每一阶都写入缓存；
+    键以弱引用持有原函数的 AST，AST 被回收后条目在下次访问时清除
+    （导函数中含有原函数本身时，条目只会被 LRU 淘汰）
+    """
+    def __init__(self, max_entries=256, store=None):
+        self.max_entries = max_entries
+        self.store = store  # 磁盘缓存，None 为不使用
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (AST 的弱引用, 变量, 阶数) → 导函数，按最近使用排序
+        self._dead = []                # 已失效的弱引用（回调中只追加，访问时清除）
+        self._lock = threading.Lock()
+
+    def derivative(self, node, var='x', order=1):
+        """node 对 var 的 order 阶导函数（化简后）"""
+        if order < 0:
+            raise Exception("求导阶数不能为负数")
+        ref = weakref.ref(node)
+        result, known = node, 0
+        with self._lock:
+            self._purge()
+            for k in range(order, 0, -1):
+                cached = self._entries.get((ref, var, k))
+                if cached is not None:
+                    self._entries.move_to_end((ref, var, k))
+                    result, known = cached, k
+                    break
+            if order > 0:
+                if known == order:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        for k in range(known + 1, order + 1):
+            cached = None
+            if self.store is not None:
+                cached = self.store.load_ast('derivatives', (node, var, k))
+            if cached is not None:
+                result = cached
+            else:
+                result = simplify(Derivative.differentiate(result, var))
+                if self.store is not None:
+                    self.store.save_ast('derivatives', (node, var, k), result)
+            with self._lock:
+                self._entries[(weakref.ref(node, self._dead.append), var, k)] = result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def _purge(self):
+        """删除原函数已被回收的条目（调用时须持有锁）"""
+        if self._dead:
+            dead = set(self._dead)
+            self._dead.clear()
+            for key in [key for key in self._entries if key[0] in dead]:
+                del self._entries[key]
+
+    def clear(self):
+        """清空缓存并重置命中计数"""
+        with self._lock:
+            self._entries.clear()
+            self._dead.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            self._purge()
+            return len(self._entries)
+
+    def stats(self):
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+class ExpressionCache:
+    """规范化表达式文本 → CachedExpression 的 LRU 缓存"""
+    def __init__(self, max_entries=1024, store=None):
+        self.max_entries = max_entries
+        self.store = store  # 磁盘缓存，None 为不使用
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # 规范化文本 → 条目或解析异常，按最近使用排序
+        self._lock = threading.Lock()
+
+    def entry(self, expr_text):
+        """取出表达式的缓存条目（未命中时解析）；表达式有误时抛出解析异常"""
+        key = normalize(expr_text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is None:
+            try:
+                entry = CachedExpression(key, self._parse(key))
+            except Exception as e:
+                entry = e
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        if isinstance(entry, Exception):
+            raise entry.with_traceback(None)
+        return entry
+
+    def _parse(self, key):
+        """解析规范化后的表达式（先查磁盘缓存，解析成功后写入磁盘）"""
+        ast = None
+        if self.store is not None:
+            ast = self.store.load_ast('expressions', (key,))
+        if ast is None:
+            ast = Parser(Lexer(key).tokenize()).parse()
+            if self.store is not None:
+                self.store.save_ast('expressions', (key,), ast)
+        return ast
+
+    def parse(self, expr_text):
+        """解析表达式为 AST（使用缓存）"""
+        return self.entry(expr_text).ast
+
+    def invalidate(self, expr_text):
+        """删除一个表达式的缓存条目"""
+        with self._lock:
+            self._entries.pop(normalize(expr_text), None)
+
+    def clear(self):
+        """清空缓存并重置命中计数"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+# 界面与命令行共用的缓存
+expression_cache = ExpressionCache()
+derivative_cache = DerivativeCache()
+
+def use_disk_cache(store):
+    """共用的表达式缓存与导函数缓存挂接磁盘缓存（None 为取消）"""
+    expression_cache.store = store
+    derivative_cache.store = store
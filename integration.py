@@ -0,0 +1,205 @@
+"""
+数值积分（Integration）
+功能：求定积分并给出误差估计，每一步的全部节点合成一个数组一次向量化求值
+- tanh-sinh（双指数）求积：节点向端点指数加密，端点处的可积奇点（如 ln(x)、1/√x 在 0 处）
+  与光滑函数都只需几层（每层一次求值）
+- 自适应 Gauss–Kronrod（7 点 Gauss / 15 点 Kronrod）：tanh-sinh 不收敛时（振荡、区间内部的尖点等）
+  把误差大的区间批量二分
+两种方法的节点都在区间内部，端点本身不会被求值
+"""
+import math
+import numpy as np
+from evaluator import evaluate_vectorized
+from value_table import parse_x_value
+
+TOLERANCE = 1e-10     # 默认容差（绝对与相对）
+MAX_INTERVALS = 20000 # 子区间个数上限，超出时停止细分（积分可能发散）
+TANH_SINH_LEVELS = 6  # tanh-sinh 的最大层数（步长 2^-6）
+TANH_SINH_RANGE = 4.0 # tanh-sinh 的 t 取值范围 [-4, 4]（节点到端点的距离小到 1e-37）
+
+# Kronrod 节点（[-1, 1] 上的正半轴，降序，最后为 0）与权重；奇数下标的节点同时是 7 点 Gauss 节点
+_XK = [0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+       0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+       0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+       0.207784955007898467600689403773245, 0.0]
+_WK = [0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+       0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+       0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+       0.204432940075298892414161999234649, 0.209482141084727828012999174891714]
+_WG = [0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+       0.381830050505118944950369775488975, 0.417959183673469387755102040816327]
+
+# 展开为 15 个节点的数组（从 -1 到 1）
+NODES = np.array([-x for x in _XK[:-1]] + _XK[::-1])
+KRONROD_WEIGHTS = np.array(_WK[:-1] + _WK[::-1])
+GAUSS_WEIGHTS = np.zeros(15)
+GAUSS_WEIGHTS[[1, 3, 5, 7, 9, 11, 13]] = _WG[:-1] + [_WG[-1]] + _WG[-2::-1]
+
+_EPSILON = np.finfo(float).eps
+
+class Integral:
+    """定积分的结果：value 为积分值，error 为误差估计，evaluations 为被积函数的求值点数"""
+    __slots__ = ('value', 'error', 'evaluations', 'converged')
+
+    def __init__(self, value, error, evaluations, converged):
+        self.value = value
+        self.error = error
+        self.evaluations = evaluations
+        self.converged = converged
+
+    def __repr__(self):
+        return f"Integral({self.value!r}, error={self.error:.3g}, evaluations={self.evaluations})"
+
+def gauss_kronrod(func, a, b):
+    """
+    一组区间 [a, b] 上的 15 点 Kronrod 积分与误差估计（QUADPACK 的 qk15 公式）
+    func 在全部 15·n 个节点上只调用一次
+    返回：(积分, 误差估计)；被积函数在某个节点上无定义时抛出异常
+    """
+    center = (a + b) / 2
+    half = (b - a) / 2
+    x = center[:, None] + half[:, None] * NODES
+    y = np.asarray(func(x.ravel()), dtype=float)
+    y = np.broadcast_to(y, x.size).reshape(x.shape)
+    if not np.all(np.isfinite(y)):
+        raise Exception("被积函数在积分区间内无定义或趋于无穷（积分可能发散）")
+
+    kronrod = y @ KRONROD_WEIGHTS
+    gauss = y @ GAUSS_WEIGHTS
+    mean = kronrod / 2
+    resasc = np.abs(half) * (np.abs(y - mean[:, None]) @ KRONROD_WEIGHTS)
+    resabs = np.abs(half) * (np.abs(y) @ KRONROD_WEIGHTS)
+    error = np.abs((kronrod - gauss) * half)
+    # 用 (200·|K - G| / resasc)^1.5 缩放误差估计：光滑函数上 K15 远比 G7 精确
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = resasc * np.minimum(1.0, (200 * error / resasc) ** 1.5)
+    error = np.where(resasc > 0, scaled, error)
+    # 舍入误差的下限
+    error = np.maximum(error, 50 * _EPSILON * resabs)
+    return kronrod * half, error
+
+def quad(func, a, b, tolerance=TOLERANCE, max_intervals=MAX_INTERVALS, callback=None):
+    """
+    自适应积分：func 为向量化的被积函数（x 数组 → y 数组）
+    每轮把误差超过平均份额（容差 / 区间数）的区间全部二分，新区间一起求值，
+    直到总误差不超过 tolerance·max(1, |积分|)、区间数达到上限或区间已无法再分
+    callback(fraction) 每轮之后报告进度（误差从初始值降到容差的对数比例），可抛出异常以中止计算
+    """
+    a, b = float(a), float(b)
+    if a == b:
+        return Integral(0.0, 0.0, 0, True)
+    if a > b:
+        result = quad(func, b, a, tolerance, max_intervals, callback)
+        return Integral(-result.value, result.error, result.evaluations, result.converged)
+
+    lo, hi = np.array([a]), np.array([b])
+    values, errors = gauss_kronrod(func, lo, hi)
+    evaluations = len(NODES)
+    first_error = errors.sum()
+    while True:
+        total = values.sum()
+        target = tolerance * max(1.0, abs(total))
+        if callback:
+            callback(_progress(errors.sum(), first_error, target))
+        if errors.sum() <= target:
+            return Integral(float(total), float(errors.sum()), evaluations, True)
+
+        # 误差超过平均份额、且还能再分（中点与端点可区分）的区间
+        mid = (lo + hi) / 2
+        split = (errors > target / len(errors)) & (mid > lo) & (mid < hi)
+        if not split.any() or len(errors) + split.sum() > max_intervals:
+            return Integral(float(total), float(errors.sum()), evaluations, False)
+
+        new_lo = np.concatenate([lo[split], mid[split]])
+        new_hi = np.concatenate([mid[split], hi[split]])
+        new_values, new_errors = gauss_kronrod(func, new_lo, new_hi)
+        evaluations += len(new_lo) * len(NODES)
+
+        keep = ~split
+        lo = np.concatenate([lo[keep], new_lo])
+        hi = np.concatenate([hi[keep], new_hi])
+        values = np.concatenate([values[keep], new_values])
+        errors = np.concatenate([errors[keep], new_errors])
+
+def tanh_sinh(func, a, b, tolerance=TOLERANCE, max_level=TANH_SINH_LEVELS, callback=None):
+    """
+    tanh-sinh 求积：x = c + h·tanh(π/2·sinh t)，对 t 用梯形公式，每层步长减半、只求新增的节点
+    到端点的距离用 2/(e^(2u)+1) 直接计算，避免 1 - tanh(u) 的相消；与端点重合的节点舍去
+    相邻两层之差不超过容差（且上一层之差已经很小）时返回结果，否则返回 None
+    callback(fraction) 每层之后报告进度，可抛出异常以中止计算
+    """
+    a, b = float(a), float(b)
+    if a > b:
+        result = tanh_sinh(func, b, a, tolerance, max_level, callback)
+        if result is None:
+            return None
+        return Integral(-result.value, result.error, result.evaluations, result.converged)
+    center, half = (a + b) / 2, (b - a) / 2
+    evaluations = 0
+    result = difference = None
+    total = 0.0  # Σ w·f（不含步长）
+    for level in range(max_level + 1):
+        step = 2.0 ** -level
+        count = int(TANH_SINH_RANGE / step)
+        # 第 0 层取全部整数点，之后只取新增的奇数倍点
+        j = np.arange(-count, count + 1) if level == 0 else np.arange(-count + 1, count + 1, 2)
+        t = j * step
+        u = np.pi / 2 * np.sinh(np.abs(t))
+        distance = half * 2 / (np.exp(2 * u) + 1)  # 到较近端点的距离
+        x = np.where(t < 0, a + distance, np.where(t > 0, b - distance, center))
+        inside = (x > a) & (x < b) | (t == 0)
+        weight = half * (np.pi / 2) * np.cosh(t) / np.cosh(u) ** 2
+        x, weight = x[inside], weight[inside]
+        y = np.asarray(func(x), dtype=float)
+        y = np.broadcast_to(y, x.shape)
+        evaluations += len(x)
+        if not np.all(np.isfinite(y)):
+            return None
+        total += y @ weight
+        estimate = total * step
+        if callback:
+            callback((level + 1) / (max_level + 1))
+        if level > 0:
+            last, difference = difference, abs(estimate - result)
+            target = tolerance * max(1.0, abs(estimate))
+            if level >= 3 and difference <= target and last <= math.sqrt(target):
+                return Integral(float(estimate), float(difference), evaluations, True)
+        result = estimate
+    return None
+
+def integrate_function(func, a, b, tolerance=TOLERANCE, callback=None):
+    """
+    ∫[a, b] func(x) dx：先用 tanh-sinh，不收敛时改用自适应 Gauss–Kronrod
+    callback(fraction) 报告进度（两种方法各占一半），可抛出异常以中止计算
+    """
+    if a > b:
+        result = integrate_function(func, b, a, tolerance, callback)
+        return Integral(-result.value, result.error, result.evaluations, result.converged)
+    first = second = None
+    if callback:
+        first = lambda fraction: callback(fraction / 2)
+        second = lambda fraction: callback(0.5 + fraction / 2)
+    result = tanh_sinh(func, a, b, tolerance, callback=first) if a != b else None
+    if result is not None:
+        return result
+    return quad(func, a, b, tolerance, callback=second)
+
+def integrate(ast, a, b, tolerance=TOLERANCE, callback=None):
+    """∫[a, b] f(x) dx，f 为表达式的 AST（向量化求值）；callback 见 integrate_function"""
+    return integrate_function(lambda x: evaluate_vectorized(ast, x), a, b, tolerance, callback)
+
+def _progress(error, first, target):
+    """误差从 first 降到 target 的对数比例（0~1）"""
+    if error <= target or first <= target:
+        return 1.0
+    return min(max(math.log(first / error) / math.log(first / target), 0.0), 1.0)
+
+def parse_interval(text):
+    """解析积分区间 "a:b"（上下限可以是常数表达式，如 0:pi/2）"""
+    parts = text.split(':')
+    if len(parts) != 2:
+        raise Exception("积分区间格式应为 下限:上限")
+    a, b = (parse_x_value(part) for part in parts)
+    if not (math.isfinite(a) and math.isfinite(b)):
+        raise Exception("积分上下限必须是有限数")
+    return a, b
@@ -0,0 +1,264 @@
+"""
+区间求值（Interval Arithmetic）
+功能：对一组 x 区间 [lo, hi] 整体求值，得到包含区间内全部函数值的 y 区间，
+并标记区间内可能无定义的点（对数参数非正、除数为零等）
+每步运算的上下界向外舍入一个单位，保证包含性；区间运算会高估范围（依赖性问题），
+但从不遗漏，可用于剪枝：y 区间不含 0 的 x 区间内没有根，处处无定义的区间不必采样
+"""
+import math
+import numpy as np
+from parser import *
+from lexer import TokenType
+from evaluator import Evaluator
+
+TAU = 2 * math.pi
+_SLACK = 1e-15  # sin、cos 的额外放宽（极值点判断的舍入误差）
+
+class Interval:
+    """
+    区间：lo、hi 为上下界（标量或 NumPy 数组），undefined 标记区间内可能有无定义的点
+    处处无定义的区间上下界为 NaN
+    """
+    __slots__ = ('lo', 'hi', 'undefined')
+
+    def __init__(self, lo, hi, undefined=False):
+        self.lo = lo
+        self.hi = hi
+        self.undefined = undefined
+
+    def __repr__(self):
+        return f"Interval({self.lo}, {self.hi}, undefined={self.undefined})"
+
+    def __add__(self, other):
+        other = _interval(other)
+        return _outward(self.lo + other.lo, self.hi + other.hi, self.undefined | other.undefined)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        other = _interval(other)
+        return _outward(self.lo - other.hi, self.hi - other.lo, self.undefined | other.undefined)
+
+    def __rsub__(self, other):
+        return _interval(other) - self
+
+    def __mul__(self, other):
+        other = _interval(other)
+        # 0·∞ 取 0（有界区间与无界区间之积）；NaN 只来自处处无定义的区间，最后再恢复
+        products = [self.lo * other.lo, self.lo * other.hi, self.hi * other.lo, self.hi * other.hi]
+        products = [np.where(np.isnan(p), 0.0, p) for p in products]
+        nowhere = np.isnan(self.lo) | np.isnan(other.lo)
+        lo = np.where(nowhere, np.nan, np.minimum.reduce(products))
+        hi = np.where(nowhere, np.nan, np.maximum.reduce(products))
+        return _outward(lo, hi, self.undefined | other.undefined)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        return self * _interval(other).reciprocal()
+
+    def __rtruediv__(self, other):
+        return _interval(other) * self.reciprocal()
+
+    def __neg__(self):
+        return Interval(-self.hi, -self.lo, self.undefined)
+
+    def reciprocal(self):
+        """1/u：区间含 0 时可能无定义，结果向含 0 的一侧无界"""
+        lo, hi = self.lo, self.hi
+        positive, negative = lo > 0, hi < 0
+        undefined = self.undefined | ~(positive | negative)
+        # 各种情形：不含 0、下界为 0、上界为 0、跨过 0；[0, 0] 处处无定义
+        # np.divide：上下界为 Python 浮点数 0.0 时同样得到 ±∞，而不是抛出 ZeroDivisionError
+        new_lo = np.where(positive | negative, np.divide(1.0, hi),
+                          np.where(lo == 0, np.divide(1.0, hi), -np.inf))
+        new_hi = np.where(positive | negative, np.divide(1.0, lo),
+                          np.where(hi == 0, np.divide(1.0, lo), np.inf))
+        nowhere = (lo == 0) & (hi == 0) | np.isnan(lo)
+        new_lo = np.where(nowhere, np.nan, new_lo)
+        new_hi = np.where(nowhere, np.nan, new_hi)
+        return _outward(new_lo, new_hi, undefined)
+
+    def contains(self, value):
+        """区间是否可能取到 value（处处无定义时为 False）"""
+        return (self.lo <= value) & (value <= self.hi)
+
+    def defined_nowhere(self):
+        """区间内处处无定义：上下界为 NaN，或全部函数值都超出浮点范围（求值时记为 NaN）"""
+        return np.isnan(self.lo) | (self.lo == np.inf) | (self.hi == -np.inf)
+
+def _interval(u):
+    """常数化为单点区间"""
+    if isinstance(u, Interval):
+        return u
+    u = np.float64(u)
+    return Interval(u, u)
+
+def _outward(lo, hi, undefined):
+    """上下界各向外舍入一个单位"""
+    return Interval(np.nextafter(lo, -np.inf), np.nextafter(hi, np.inf), undefined)
+
+def _monotone(func, u, increasing=True):
+    """单调函数作用于区间"""
+    if increasing:
+        return _outward(func(u.lo), func(u.hi), u.undefined)
+    return _outward(func(u.hi), func(u.lo), u.undefined)
+
+def _periodic(func, u, peak):
+    """
+    sin、cos：端点处的值，区间内含极大值点 peak + 2kπ 时上界取 1，
+    含极小值点 peak + π + 2kπ 时下界取 -1，区间长度不小于 2π 时为 [-1, 1]
+    """
+    lo, hi = u.lo, u.hi
+    at_lo, at_hi = func(lo), func(hi)
+    wide = hi - lo >= TAU
+    has_max = wide | (peak + np.ceil((lo - peak) / TAU) * TAU <= hi)
+    has_min = wide | (peak + math.pi + np.ceil((lo - peak - math.pi) / TAU) * TAU <= hi)
+    new_lo = np.where(has_min, -1.0, np.maximum(np.minimum(at_lo, at_hi) - _SLACK, -1.0))
+    new_hi = np.where(has_max, 1.0, np.minimum(np.maximum(at_lo, at_hi) + _SLACK, 1.0))
+    nowhere = np.isnan(lo)
+    return Interval(np.where(nowhere, np.nan, new_lo), np.where(nowhere, np.nan, new_hi),
+                    u.undefined)
+
+def _log(u):
+    """ln(u)：参数非正处无定义，下界为 0 时结果向下无界"""
+    lo, hi = u.lo, u.hi
+    new_lo = np.where(lo > 0, np.log(np.maximum(lo, 0.0)), -np.inf)
+    new_hi = np.where(hi > 0, np.log(np.maximum(hi, 0.0)), np.nan)
+    new_lo = np.where(np.isnan(new_hi), np.nan, new_lo)
+    return _outward(new_lo, new_hi, u.undefined | ~(lo > 0))
+
+def _integer_power(u, n):
+    """u^n（n 为整数）"""
+    if n == 0:
+        one = np.where(np.isnan(u.lo), np.nan, 1.0)
+        return Interval(one, one, u.undefined)
+    if n < 0:
+        return _integer_power(u, -n).reciprocal()
+    at_lo, at_hi = np.power(u.lo, float(n)), np.power(u.hi, float(n))
+    if n % 2:
+        return _outward(at_lo, at_hi, u.undefined)
+    # 偶次幂：区间跨过 0 时下界为 0
+    straddles = (u.lo < 0) & (u.hi > 0)
+    lo = np.where(straddles, 0.0, np.minimum(at_lo, at_hi))
+    return _outward(lo, np.maximum(at_lo, at_hi), u.undefined)
+
+def _real_power(u, p):
+    """u^p（p 为非整数常数）：底数为负时无定义，p < 0 时底数为 0 也无定义"""
+    lo, hi = u.lo, u.hi
+    valid_lo = np.maximum(lo, 0.0)
+    if p > 0:
+        nowhere = hi < 0
+        undefined = lo < 0
+        new_lo, new_hi = np.power(valid_lo, p), np.power(hi, p)
+    else:
+        nowhere = hi <= 0
+        undefined = lo <= 0
+        new_lo, new_hi = np.power(hi, p), np.power(valid_lo, p)
+    new_lo = np.where(nowhere, np.nan, new_lo)
+    new_hi = np.where(nowhere, np.nan, new_hi)
+    return _outward(new_lo, new_hi, u.undefined | undefined)
+
+def _general_power(base, exponent):
+    """
+    指数含 x 的幂：底数为正时 u^v = e^(v·ln u)；
+    底数可能非正时（负数的整数次幂有定义、非整数次幂无定义）只能给出 (-∞, ∞)
+    """
+    base, exponent = _interval(base), _interval(exponent)
+    positive = Interval(np.maximum(base.lo, np.nextafter(0.0, 1.0)), base.hi, base.undefined)
+    result = _monotone(np.exp, exponent * _log(positive))
+    unknown = ~(base.lo > 0) & ~np.isnan(base.lo)
+    lo = np.where(unknown, -np.inf, result.lo)
+    hi = np.where(unknown, np.inf, result.hi)
+    return Interval(lo, hi, result.undefined | unknown | exponent.undefined)
+
+class IntervalEvaluator(Evaluator):
+    """
+    区间求值器
+    x 为一组区间，与 VectorEvaluator 相同的遍历；定义域错误不抛异常，而是记入区间的 undefined 标记
+    """
+    def __init__(self, lo, hi):
+        super().__init__(x_value=Interval(np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)))
+
+    def evaluate(self, node):
+        """求值 AST 节点，忽略浮点警告"""
+        with np.errstate(all='ignore'):
+            return super().evaluate(node)
+
+    def eval_binary_op(self, node, left, right):
+        """求值二元运算节点（常数运算数化为单点区间）"""
+        if node.op == TokenType.POWER:
+            if isinstance(right, Interval):
+                return _general_power(left, right)
+            left = _interval(left)
+            if float(right).is_integer():
+                return _integer_power(left, int(right))
+            return _real_power(left, float(right))
+        left, right = _interval(left), _interval(right)
+        if node.op == TokenType.PLUS:
+            return left + right
+        elif node.op == TokenType.MINUS:
+            return left - right
+        elif node.op == TokenType.MULTIPLY:
+            return left * right
+        elif node.op == TokenType.DIVIDE:
+            return left / right
+        else:
+            raise Exception(f"未知运算符: {node.op}")
+
+    def eval_unary_op(self, node, operand):
+        """求值一元运算节点"""
+        if node.op == TokenType.MINUS:
+            return -_interval(operand)
+        else:
+            raise Exception(f"未知一元运算符: {node.op}")
+
+    def eval_function(self, node, args):
+        """求值函数节点"""
+        args = [_interval(arg) for arg in args]
+        if node.name == TokenType.SIN:
+            if len(node.args) != 1:
+                raise Exception("sin 函数需要 1 个参数")
+            return _periodic(np.sin, args[0], math.pi / 2)
+
+        elif node.name == TokenType.COS:
+            if len(node.args) != 1:
+                raise Exception("cos 函数需要 1 个参数")
+            return _periodic(np.cos, args[0], 0.0)
+
+        elif node.name == TokenType.LOG:
+            if len(node.args) == 1:
+                return _log(args[0])
+            elif len(node.args) == 2:
+                # 底数为 1 时 ln(底数) 为 [0, 0]，除法给出处处无定义
+                return _log(args[1]) / _log(args[0])
+            else:
+                raise Exception("log 函数需要 1 或 2 个参数")
+
+        else:
+            raise Exception(f"未知函数: {node.name}")
+
+    def eval_polynomial(self, node, x):
+        """求值多项式节点：逐项 c·x^n 相加（偶次幂的下界为 0 等，比秦九韶法的区间更紧）"""
+        result = _interval(0.0)
+        for n, c in node.terms:
+            result = result + _integer_power(x, n) * c
+        return result
+
+def evaluate_interval(node, lo, hi):
+    """
+    对一组 x 区间 [lo, hi] 整体求值
+    返回：Interval，上下界为与 lo 形状相同的数组，undefined 为布尔数组
+    （上下界无穷时函数值可能溢出，求值时同样记为无定义）
+    """
+    lo = np.asarray(lo, dtype=float)
+    hi = np.asarray(hi, dtype=float)
+    result = _interval(IntervalEvaluator(lo, hi).evaluate(node))
+    result_lo = np.array(np.broadcast_to(result.lo, lo.shape), dtype=float)
+    result_hi = np.array(np.broadcast_to(result.hi, lo.shape), dtype=float)
+    undefined = np.broadcast_to(result.undefined, lo.shape) | np.isinf(result_lo) | np.isinf(result_hi)
+    return Interval(result_lo, result_hi, undefined)
+
+def interval_function(ast):
+    """ast 的区间求值函数：(lo 数组, hi 数组) → Interval"""
+    return lambda lo, hi: evaluate_interval(ast, lo, hi)
@@ -3,7 +3,9 @@
 功能：将输入的数学表达式字符串转换为 Token 序列
 """
 import re
+from array import array
 from enum import Enum, auto
+from itertools import accumulate, chain, repeat
 
 class TokenType(Enum):
     """Token 类型枚举"""
@@ -25,114 +27,122 @@ class TokenType(Enum):
     EOF = auto()         # 结束符
 
 class Token:
-    """Token 类：表示一个词法单元"""
-    def __init__(self, type_, value=None):
+    """Token 类：表示一个词法单元（pos 为在去掉空格后的文本中的位置）"""
+    __slots__ = ('type', 'value', 'pos')
+    
+    def __init__(self, type_, value=None, pos=None):
         self.type = type_
         self.value = value
+        self.pos = pos
     
     def __repr__(self):
         return f"Token({self.type}, {self.value})"
 
+# 单遍扫描：运算符、标识符、数字，其余每个字符单独成为一段（无效字符）
+# 常见的 ASCII 情形放在前面，避免对每个字符都做 Unicode 字母判断
+_TOKEN_PATTERN = re.compile(r'[-+*/^(),]|[a-zA-Z]+(?![^\W\d_])|[\d.]+|[^\W\d_]+|.', re.S)
+
+# 标识符与运算符 → Token 类型
+_KEYWORDS = {
+    'x': TokenType.VARIABLE,
+    'sin': TokenType.SIN,
+    'cos': TokenType.COS,
+    'log': TokenType.LOG,
+    'pi': TokenType.PI,
+    'π': TokenType.PI,
+    'e': TokenType.E,
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.MULTIPLY,
+    '/': TokenType.DIVIDE,
+    '^': TokenType.POWER,
+    '(': TokenType.LPAREN,
+    ')': TokenType.RPAREN,
+    ',': TokenType.COMMA,
+}
+_CODES = {text: type_.value for text, type_ in _KEYWORDS.items()}  # 类型码（0 表示需要进一步识别）
+_TYPES = {type_.value: type_ for type_ in TokenType}                # 类型码 → TokenType
+_NUMBER = TokenType.NUMBER.value
+_VARIABLE = TokenType.VARIABLE.value
+
+class TokenList:
+    """
+    紧凑的 Token 序列
+    类型码、值与位置分别存放在并行数组中，按下标或迭代访问时才生成 Token 对象；
+    最后一项为 EOF
+    """
+    __slots__ = ('types', 'values', 'offsets')
+    
+    def __init__(self, types, values, offsets):
+        self.types = types      # bytearray：TokenType 的值
+        self.values = values    # list：数字的值、变量名，其余为 None
+        self.offsets = offsets  # array('I')：在去掉空格后的文本中的起始位置
+    
+    def __len__(self):
+        return len(self.types)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return Token(_TYPES[self.types[index]], self.values[index], self.offsets[index])
+    
+    def __iter__(self):
+        for code, value, pos in zip(self.types, self.values, self.offsets):
+            yield Token(_TYPES[code], value, pos)
+    
+    def __repr__(self):
+        return f"TokenList({list(self)})"
+
 class Lexer:
-    """词法分析器"""
+    """词法分析器（正则表达式单遍扫描 + 查表）"""
     def __init__(self, text):
         self.text = text.replace(' ', '')  # 移除空格
-        self.pos = 0
-        self.current_char = self.text[0] if self.text else None
     
-    def error(self, msg="词法分析错误"):
+    def error(self, msg="词法分析错误", pos=0):
         """抛出错误"""
-        raise Exception(f"{msg} at position {self.pos}")
-    
-    def advance(self):
-        """移动到下一个字符"""
-        self.pos += 1
-        if self.pos >= len(self.text):
-            self.current_char = None
-        else:
-            self.current_char = self.text[self.pos]
-    
-    def peek(self, offset=1):
-        """向前查看字符，不移动位置"""
-        peek_pos = self.pos + offset
-        if peek_pos >= len(self.text):
-            return None
-        return self.text[peek_pos]
+        raise Exception(f"{msg} at position {pos}")
     
-    def read_number(self):
-        """读取数字（支持小数）"""
-        num_str = ''
-        while self.current_char is not None and (self.current_char.isdigit() or self.current_char == '.'):
-            num_str += self.current_char
-            self.advance()
-        return float(num_str)
-    
-    def read_identifier(self):
-        """读取标识符（函数名或变量名）"""
-        result = ''
-        while self.current_char is not None and self.current_char.isalpha():
-            result += self.current_char
-            self.advance()
-        return result
+    def literal(self, text, pos):
+        """识别不在关键字表中的一段文本：只能是数字，否则报错"""
+        if text[0].isdigit() or text[0] == '.':
+            try:
+                return float(text)
+            except ValueError:
+                self.error(f"无效数字: {text}", pos)
+        if text[0].isalpha():
+            self.error(f"未知标识符: {text}", pos + len(text))
+        self.error(f"无效字符: {text}", pos)
     
     def tokenize(self):
-        """将输入文本转换为 Token 列表"""
-        tokens = []
+        """将输入文本转换为紧凑的 Token 序列（TokenList）"""
+        pieces = _TOKEN_PATTERN.findall(self.text)
+        types = bytearray(map(_CODES.get, pieces, repeat(0)))
+        # 各段首尾相接，位置即长度的前缀和；最后一个位置留给 EOF
+        offsets = array('I', list(accumulate(chain((0,), map(len, pieces)))))
+        values = [None] * len(pieces)
         
-        while self.current_char is not None:
-            # 数字
-            if self.current_char.isdigit() or self.current_char == '.':
-                tokens.append(Token(TokenType.NUMBER, self.read_number()))
-            
-            # 标识符（函数名、变量、常数）
-            elif self.current_char.isalpha():
-                identifier = self.read_identifier()
-                
-                if identifier == 'x':
-                    tokens.append(Token(TokenType.VARIABLE, 'x'))
-                elif identifier == 'sin':
-                    tokens.append(Token(TokenType.SIN))
-                elif identifier == 'cos':
-                    tokens.append(Token(TokenType.COS))
-                elif identifier == 'log':
-                    tokens.append(Token(TokenType.LOG))
-                elif identifier == 'pi':
-                    tokens.append(Token(TokenType.PI))
-                elif identifier == 'e':
-                    tokens.append(Token(TokenType.E))
-                else:
-                    self.error(f"未知标识符: {identifier}")
-            
-            # 运算符和括号
-            elif self.current_char == '+':
-                tokens.append(Token(TokenType.PLUS))
-                self.advance()
-            elif self.current_char == '-':
-                tokens.append(Token(TokenType.MINUS))
-                self.advance()
-            elif self.current_char == '*':
-                tokens.append(Token(TokenType.MULTIPLY))
-                self.advance()
-            elif self.current_char == '/':
-                tokens.append(Token(TokenType.DIVIDE))
-                self.advance()
-            elif self.current_char == '^':
-                tokens.append(Token(TokenType.POWER))
-                self.advance()
-            elif self.current_char == '(':
-                tokens.append(Token(TokenType.LPAREN))
-                self.advance()
-            elif self.current_char == ')':
-                tokens.append(Token(TokenType.RPAREN))
-                self.advance()
-            elif self.current_char == ',':
-                tokens.append(Token(TokenType.COMMA))
-                self.advance()
-            elif self.current_char == 'π':
-                tokens.append(Token(TokenType.PI))
-                self.advance()
-            else:
-                self.error(f"无效字符: {self.current_char}")
+        # 只有数字（类型码 0）和变量需要逐个填值
+        i = types.find(0)
+        while i >= 0:
+            values[i] = self.literal(pieces[i], offsets[i])
+            types[i] = _NUMBER
+            i = types.find(0, i + 1)
+        i = types.find(_VARIABLE)
+        while i >= 0:
+            values[i] = 'x'
+            i = types.find(_VARIABLE, i + 1)
         
-        tokens.append(Token(TokenType.EOF))
-        return tokens
+        types.append(TokenType.EOF.value)
+        values.append(None)
+        return TokenList(types, values, offsets)
+    
+    def iter_tokens(self):
+        """惰性模式：边扫描边逐个产生 Token，以 EOF 结束"""
+        for match in _TOKEN_PATTERN.finditer(self.text):
+            text, pos = match.group(), match.start()
+            type_ = _KEYWORDS.get(text)
+            if type_ is None:
+                yield Token(TokenType.NUMBER, self.literal(text, pos), pos)
+            else:
+                yield Token(type_, 'x' if type_ is TokenType.VARIABLE else None, pos)
+        yield Token(TokenType.EOF, None, len(self.text))
@@ -1,14 +1,25 @@
 """
 函数计算器主程序入口
 作者：数学教学工具开发组
-功能：启动 PyQt5 应用程序
+功能：启动 PyQt5 应用程序；带子命令（eval/diff/table/plot）时以命令行批处理模式运行
 """
 import sys
-from PyQt5.QtWidgets import QApplication
-from ui import CalculatorWindow
+import cli
 
 def main():
     """主函数：创建并运行应用程序"""
+    # 命令行模式不加载 PyQt5 与 Matplotlib
+    if len(sys.argv) > 1 and sys.argv[1] in cli.COMMANDS + ('-h', '--help'):
+        sys.exit(cli.run(sys.argv[1:]))
+    
+    from PyQt5.QtWidgets import QApplication
+    from ui import CalculatorWindow
+    from disk_cache import open_disk_cache
+    from expression_cache import use_disk_cache
+    
+    # 解析结果、导函数与绘图采样保存在用户缓存目录中，再次启动时直接读取
+    use_disk_cache(open_disk_cache())
+    
     app = QApplication(sys.argv)
     app.setApplicationName("数学函数计算器")
     
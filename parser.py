@@ -1,183 +1,307 @@
 """
 语法分析器（Parser）
 功能：将 Token 序列转换为抽象语法树（AST）
-使用递归下降解析法，遵循运算优先级
+使用运算符优先级分析（显式栈，无递归），遵循运算优先级
 """
-from lexer import Token, TokenType
+import math
+import threading
+import weakref
+from lexer import Token, TokenList, TokenType
 
 class ASTNode:
-    """抽象语法树节点基类"""
-    pass
+    """
+    抽象语法树节点基类
+    节点不可变且经过哈希一致化（hash-consing）：结构相同的节点是同一个对象，
+    因此结构相等即 `is` 相等，可以直接用节点作为缓存的键
+    """
+    __slots__ = ('_hash', '_variables', '_folded', '__weakref__')
+    _fields = ()
+    # 结构键 → 节点（弱引用），节点回收后对应的项自动删除
+    _table = weakref.WeakValueDictionary()
+    _lock = threading.Lock()
+    
+    def __new__(cls, *values):
+        key = cls._intern_key(values)
+        table = ASTNode._table
+        node = table.get(key)
+        if node is not None:
+            return node
+        with ASTNode._lock:
+            node = table.get(key)
+            if node is None:
+                node = object.__new__(cls)
+                for field, value in zip(cls._fields, values):
+                    object.__setattr__(node, field, value)
+                object.__setattr__(node, '_hash', hash(key))
+                object.__setattr__(node, '_variables', None)  # 所含变量名，遍历时按需计算
+                object.__setattr__(node, '_folded', None)     # 部分求值的结果，按需计算
+                table[key] = node
+        return node
+    
+    @classmethod
+    def _intern_key(cls, values):
+        """结构键：子节点已一致化，按身份比较即可"""
+        return (cls,) + values
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} 节点不可修改")
+    
+    def __hash__(self):
+        return self._hash
+    
+    def __eq__(self, other):
+        # 已一致化：结构相同即同一对象
+        return self is other
+    
+    def __reduce__(self):
+        # 复制和反序列化时重新经过一致化
+        return (type(self), tuple(getattr(self, field) for field in self._fields))
+    
+    def children(self):
+        """子节点（按求值顺序）"""
+        return ()
+    
+    def with_children(self, children):
+        """替换子节点后的节点（子节点不变时即为自身）"""
+        return self
 
 class NumberNode(ASTNode):
     """数字节点"""
-    def __init__(self, value):
-        self.value = value
+    __slots__ = ('value',)
+    _fields = ('value',)
+    
+    def __new__(cls, value):
+        return super().__new__(cls, value)
+    
+    @classmethod
+    def _intern_key(cls, values):
+        # 区分 2 与 2.0，避免改变求值结果的类型；区分 0.0 与 -0.0（两者相等，但 1/(-0.0) 为 -∞）
+        value = values[0]
+        if isinstance(value, float):
+            return (cls, type(value), math.copysign(1.0, value)) + values
+        return (cls, type(value)) + values
     
     def __repr__(self):
         return f"Number({self.value})"
 
 class VariableNode(ASTNode):
     """变量节点"""
-    def __init__(self, name):
-        self.name = name
+    __slots__ = ('name',)
+    _fields = ('name',)
+    
+    def __new__(cls, name):
+        return super().__new__(cls, name)
     
     def __repr__(self):
         return f"Var({self.name})"
 
 class BinaryOpNode(ASTNode):
     """二元运算节点"""
-    def __init__(self, left, op, right):
-        self.left = left
-        self.op = op
-        self.right = right
+    __slots__ = ('left', 'op', 'right')
+    _fields = ('left', 'op', 'right')
+    
+    def __new__(cls, left, op, right):
+        return super().__new__(cls, left, op, right)
+    
+    def children(self):
+        return (self.left, self.right)
+    
+    def with_children(self, children):
+        return BinaryOpNode(children[0], self.op, children[1])
     
     def __repr__(self):
         return f"BinOp({self.left} {self.op} {self.right})"
 
 class UnaryOpNode(ASTNode):
     """一元运算节点（如负号）"""
-    def __init__(self, op, operand):
-        self.op = op
-        self.operand = operand
+    __slots__ = ('op', 'operand')
+    _fields = ('op', 'operand')
+    
+    def __new__(cls, op, operand):
+        return super().__new__(cls, op, operand)
+    
+    def children(self):
+        return (self.operand,)
+    
+    def with_children(self, children):
+        return UnaryOpNode(self.op, children[0])
     
     def __repr__(self):
         return f"UnaryOp({self.op} {self.operand})"
 
 class FunctionNode(ASTNode):
     """函数节点"""
-    def __init__(self, name, args):
-        self.name = name
-        self.args = args  # 参数列表
+    __slots__ = ('name', 'args')
+    _fields = ('name', 'args')
+    
+    def __new__(cls, name, args):
+        # 参数列表以元组保存（不可变）
+        return super().__new__(cls, name, tuple(args))
+    
+    def children(self):
+        return self.args
+    
+    def with_children(self, children):
+        return FunctionNode(self.name, children)
     
     def __repr__(self):
-        return f"Func({self.name}, {self.args})"
+        return f"Func({self.name}, {list(self.args)})"
+
+# 解析时直接使用 Token 类型码（整数），避免逐个比较和哈希枚举成员
+_TYPES = [None] * (max(t.value for t in TokenType) + 1)  # 类型码 → TokenType
+for _type in TokenType:
+    _TYPES[_type.value] = _type
+_NUMBER = TokenType.NUMBER.value
+_VARIABLE = TokenType.VARIABLE.value
+_PI = TokenType.PI.value
+_E = TokenType.E.value
+_PLUS = TokenType.PLUS.value
+_MINUS = TokenType.MINUS.value
+_LPAREN = TokenType.LPAREN.value
+_RPAREN = TokenType.RPAREN.value
+_COMMA = TokenType.COMMA.value
+_FUNCTIONS = {TokenType.SIN.value, TokenType.COS.value, TokenType.LOG.value}
+
+# 二元运算符的优先级（数值越大结合越紧，0 表示不是二元运算符）
+_PRECEDENCE = [0] * len(_TYPES)
+_PRECEDENCE[_PLUS] = _PRECEDENCE[_MINUS] = 1
+_PRECEDENCE[TokenType.MULTIPLY.value] = _PRECEDENCE[TokenType.DIVIDE.value] = 2
+_PRECEDENCE[TokenType.POWER.value] = 3
+# 遇到该运算符时需要先归约的最低优先级：左结合运算符归约同级运算，右结合（^）只归约更高级的运算
+_REDUCE_FROM = list(_PRECEDENCE)
+_REDUCE_FROM[TokenType.POWER.value] += 1
+
+# 运算符栈中的项：(优先级, 运算符或函数名, 参数在操作数栈中的起始位置)
+# 括号与函数调用的优先级为 0，归约到此为止；一元负号不参与二元归约
+_UNARY_MINUS = (-1, TokenType.MINUS, 0)
+
+def _triples(tokens):
+    """Token 序列 → (类型码, 值, 位置) 迭代器；TokenList 直接读取并行数组"""
+    if isinstance(tokens, TokenList):
+        return zip(tokens.types, tokens.values, tokens.offsets)
+    return ((token.type.value, token.value, token.pos) for token in tokens)
 
 class Parser:
-    """语法分析器"""
+    """
+    语法分析器
+    运算符优先级分析（precedence climbing）：用显式的操作数栈与运算符栈代替递归，
+    线性时间，嵌套深度不受 Python 递归深度限制
+    一元负号只作用于紧随其后的因子（-x^2 即 (-x)^2），与原递归下降文法一致
+    """
     def __init__(self, tokens):
-        self.tokens = tokens
-        self.pos = 0
-        self.current_token = self.tokens[0]
+        """tokens：Token 列表、TokenList 或惰性产生 Token 的迭代器（以 EOF 结束）"""
+        self.tokens = _triples(tokens)
+        self.current = next(self.tokens)
+    
+    @property
+    def current_token(self):
+        """当前 Token"""
+        code, value, pos = self.current
+        return Token(_TYPES[code], value, pos)
     
     def error(self, msg="语法分析错误"):
         """抛出错误"""
-        raise Exception(f"{msg} at token {self.current_token}")
+        token = self.current_token
+        if token.pos is None:
+            raise Exception(f"{msg} at token {token}")
+        raise Exception(f"{msg} at token {token}, position {token.pos}")
     
     def advance(self):
-        """移动到下一个 Token"""
-        self.pos += 1
-        if self.pos < len(self.tokens):
-            self.current_token = self.tokens[self.pos]
+        """移动到下一个 Token（到达 EOF 后停留在 EOF）"""
+        self.current = next(self.tokens, self.current)
     
     def parse(self):
-        """解析入口"""
-        return self.expression()
-    
-    def expression(self):
-        """表达式：处理加减法（最低优先级）"""
-        node = self.term()
-        
-        while self.current_token.type in (TokenType.PLUS, TokenType.MINUS):
-            op = self.current_token.type
-            self.advance()
-            node = BinaryOpNode(node, op, self.term())
+        """
+        解析入口
+        交替处于两种状态：期待因子（前缀）与因子之后（二元运算符、逗号、右括号或结束）
+        """
+        values = []  # 操作数栈
+        ops = []     # 运算符栈
+        # 循环中用局部变量保存当前 Token（类型码, 值, 位置），报错前写回 self.current
+        tokens = self.tokens
+        current = self.current
         
-        return node
-    
-    def term(self):
-        """项：处理乘除法"""
-        node = self.power()
-        
-        while self.current_token.type in (TokenType.MULTIPLY, TokenType.DIVIDE):
-            op = self.current_token.type
-            self.advance()
-            node = BinaryOpNode(node, op, self.power())
-        
-        return node
-    
-    def power(self):
-        """幂运算：处理 ^ 运算符（右结合）"""
-        node = self.factor()
-        
-        if self.current_token.type == TokenType.POWER:
-            self.advance()
-            # 右结合：a^b^c = a^(b^c)
-            node = BinaryOpNode(node, TokenType.POWER, self.power())
-        
-        return node
-    
-    def factor(self):
-        """因子：处理数字、变量、函数、括号、一元运算符"""
-        token = self.current_token
-        
-        # 一元负号
-        if token.type == TokenType.MINUS:
-            self.advance()
-            return UnaryOpNode(TokenType.MINUS, self.factor())
-        
-        # 一元正号
-        if token.type == TokenType.PLUS:
-            self.advance()
-            return self.factor()
-        
-        # 数字
-        if token.type == TokenType.NUMBER:
-            self.advance()
-            return NumberNode(token.value)
-        
-        # 变量 x
-        if token.type == TokenType.VARIABLE:
-            self.advance()
-            return VariableNode(token.value)
-        
-        # 常数 π
-        if token.type == TokenType.PI:
-            self.advance()
-            return NumberNode('π')
-        
-        # 常数 e
-        if token.type == TokenType.E:
-            self.advance()
-            return NumberNode('e')
-        
-        # 括号表达式
-        if token.type == TokenType.LPAREN:
-            self.advance()
-            node = self.expression()
-            if self.current_token.type != TokenType.RPAREN:
-                self.error("缺少右括号")
-            self.advance()
-            return node
-        
-        # 函数调用
-        if token.type in (TokenType.SIN, TokenType.COS, TokenType.LOG):
-            return self.function_call()
-        
-        self.error(f"无效的因子: {token}")
-    
-    def function_call(self):
-        """函数调用：sin(x), cos(x), log(a, x)"""
-        func_name = self.current_token.type
-        self.advance()
-        
-        if self.current_token.type != TokenType.LPAREN:
-            self.error("函数调用缺少左括号")
-        self.advance()
-        
-        args = []
-        
-        # 解析参数
-        if self.current_token.type != TokenType.RPAREN:
-            args.append(self.expression())
+        while True:
+            # ---------- 期待因子 ----------
+            code, value, _ = current
             
-            # log 函数需要两个参数：log(a, x)
-            while self.current_token.type == TokenType.COMMA:
-                self.advance()
-                args.append(self.expression())
-        
-        if self.current_token.type != TokenType.RPAREN:
-            self.error("函数调用缺少右括号")
-        self.advance()
-        
-        return FunctionNode(func_name, args)
+            if code == _MINUS:
+                ops.append(_UNARY_MINUS)
+                current = next(tokens, current)
+                continue
+            if code == _PLUS:
+                current = next(tokens, current)
+                continue
+            if code == _LPAREN:
+                ops.append((0, None, len(values)))
+                current = next(tokens, current)
+                continue
+            
+            if code == _NUMBER:
+                node = NumberNode(value)
+            elif code == _VARIABLE:
+                node = VariableNode(value)
+            elif code == _PI:
+                node = NumberNode('π')
+            elif code == _E:
+                node = NumberNode('e')
+            elif code in _FUNCTIONS:
+                current = next(tokens, current)
+                if current[0] != _LPAREN:
+                    self.current = current
+                    self.error("函数调用缺少左括号")
+                current = next(tokens, current)
+                if current[0] != _RPAREN:
+                    ops.append((0, _TYPES[code], len(values)))
+                    continue
+                node = FunctionNode(_TYPES[code], ())
+            else:
+                self.current = current
+                self.error(f"无效的因子: {Token(_TYPES[code], value)}")
+            current = next(tokens, current)
+            
+            # ---------- 因子之后 ----------
+            while True:
+                # 一元负号作用于刚完成的因子
+                while ops and ops[-1] is _UNARY_MINUS:
+                    ops.pop()
+                    node = UnaryOpNode(TokenType.MINUS, node)
+                values.append(node)
+                
+                code = current[0]
+                precedence = _PRECEDENCE[code]
+                if precedence:
+                    self._reduce(values, ops, _REDUCE_FROM[code])
+                    ops.append((precedence, _TYPES[code], 0))
+                    current = next(tokens, current)
+                    break
+                
+                # 当前（括号内、函数参数或整个）表达式结束
+                self._reduce(values, ops, 1)
+                if not ops:
+                    # 其后的 Token 不属于表达式，与递归下降解析一致地忽略
+                    self.current = current
+                    return values.pop()
+                _, func_name, start = ops[-1]
+                if code == _RPAREN:
+                    ops.pop()
+                    current = next(tokens, current)
+                    if func_name is None:
+                        node = values.pop()
+                    else:
+                        node = FunctionNode(func_name, values[start:])
+                        del values[start:]
+                    continue
+                if code == _COMMA and func_name is not None:
+                    current = next(tokens, current)
+                    break
+                self.current = current
+                self.error("缺少右括号" if func_name is None else "函数调用缺少右括号")
+
+    @staticmethod
+    def _reduce(values, ops, min_precedence):
+        """归约栈顶优先级不低于 min_precedence 的二元运算"""
+        while ops and ops[-1][0] >= min_precedence:
+            _, op, _ = ops.pop()
+            right = values.pop()
+            values[-1] = BinaryOpNode(values[-1], op, right)
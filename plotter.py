@@ -6,22 +6,33 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-from evaluator import Evaluator
+from evaluator import evaluate_vectorized
+from autodiff import evaluate_dual_vectorized
+from taylor import evaluate_taylor_polynomial
+from sampler import TileCache
+from interval import interval_function
+
+POINTS_PER_PIXEL = 2  # 视图重采样的密度：每个像素的采样点数
 
 class FunctionPlotter:
     """函数绘图器"""
     
-    def __init__(self, canvas):
+    def __init__(self, canvas, store=None):
         """
         初始化绘图器
         参数：
             canvas: Matplotlib 画布对象
+            store: 磁盘缓存（见 disk_cache.DiskCache），采样分块同时保存到磁盘；None 为只缓存在内存中
         """
         self.canvas = canvas
         self.figure = canvas.figure
         self.ax = self.figure.add_subplot(111)
+        self.tiles = TileCache(store=store)  # 已采样区间的缓存（按 AST 分块）
         self.setup_axes()
         self.plots = []  # 存储绘制的曲线
+        self.resamplers = []  # (曲线, 重采样函数)，平移缩放时按新视图重新采样
+        self.markers = []  # 标出的特征点（根、极值点、拐点）
+        self.areas = []  # 着色的积分区域
     
     def setup_axes(self):
         """设置坐标轴"""
@@ -30,48 +41,148 @@ class FunctionPlotter:
         self.ax.grid(True, alpha=0.3)
         self.ax.set_xlabel('x')
         self.ax.set_ylabel('y')
+        # ax.clear() 会清掉回调，需要重新连接
+        self.ax.callbacks.connect('xlim_changed', self.on_xlim_changed)
+    
+    def view_points(self, num_points):
+        """一屏的采样点数：不少于 num_points，且与画布像素宽度匹配"""
+        return max(num_points, int(self.ax.bbox.width * POINTS_PER_PIXEL))
+    
+    def on_xlim_changed(self, ax):
+        """平移或缩放后只对可视范围重新采样（分块缓存命中的区间无需求值）"""
+        if ax.get_autoscalex_on():
+            # 自动缩放由数据决定范围，不能反过来按范围改数据
+            return
+        x_range = ax.get_xlim()
+        for line, resample in self.resamplers:
+            line.set_data(*resample(x_range))
+        self.canvas.draw_idle()
     
     def plot_function(self, ast, x_range=(-10, 10), num_points=1000, 
-                     label='f(x)', color='blue', linestyle='-'):
+                     label='f(x)', color='blue', linestyle='-', derivative=False):
         """
         绘制函数图像
         参数：
             ast: 函数的抽象语法树
             x_range: x 的取值范围
-            num_points: 采样点数
+            num_points: 采样点数上限（自适应采样，平缓处用点更少）
             label: 曲线标签
             color: 曲线颜色
             linestyle: 线型
+            derivative: 为 True 时绘制 ast 的导函数（自动微分，无需符号求导）
         """
-        x_values = np.linspace(x_range[0], x_range[1], num_points)
-        y_values = []
-        
-        for x in x_values:
-            try:
-                evaluator = Evaluator(x_value=x)
-                y = evaluator.evaluate(ast)
-                # 过滤无效值
-                if np.isnan(y) or np.isinf(y):
-                    y_values.append(None)
-                else:
-                    y_values.append(y)
-            except:
-                y_values.append(None)
+        x_values, y_values = self.sample_curve(ast, x_range, self.view_points(num_points), derivative)
+        self.add_curve(ast, x_values, y_values, num_points, label, color, linestyle, derivative)
+    
+    def sample_curve(self, ast, x_range, max_points, derivative=False, callback=None):
+        """
+        对曲线采样（只读取缓存，不操作画布，可在后台线程中调用）
+        参数：
+            max_points: 采样点数预算（在主线程中由 view_points 得到）
+            callback: 进度回调，见 TileCache.sample
+        返回：(x_values, y_values)
+        """
+        return self.tiles.sample((ast, derivative), self._curve_func(ast, derivative),
+                                 x_range, max_points, callback, self._curve_bounds(ast, derivative))
+    
+    def add_curve(self, ast, x_values, y_values, num_points=1000,
+                  label='f(x)', color='blue', linestyle='-', derivative=False):
+        """把已采样的曲线画到坐标轴上（必须在主线程中调用）"""
+        func = self._curve_func(ast, derivative)
+        bounds = self._curve_bounds(ast, derivative)
+        key = (ast, derivative)
+        resample = lambda r: self.tiles.sample(key, func, r, self.view_points(num_points),
+                                               bounds=bounds)
         
-        # 绘制曲线（自动处理 None 值）
+        # 绘制曲线（NaN 处自动断开）
         line, = self.ax.plot(x_values, y_values, label=label, 
                             color=color, linestyle=linestyle, linewidth=2)
         self.plots.append(line)
+        self.resamplers.append((line, resample))
         
         # 更新图例
         self.ax.legend()
         self.canvas.draw()
     
+    def _curve_func(self, ast, derivative):
+        """曲线的向量化求值函数，无效点为 NaN"""
+        if derivative:
+            return lambda x: evaluate_dual_vectorized(ast, x)[1]
+        return lambda x: evaluate_vectorized(ast, x)
+    
+    def _curve_bounds(self, ast, derivative):
+        """曲线的区间求值函数（跳过处处无定义的区间）；导函数由自动微分求值，没有区间形式"""
+        if derivative:
+            return None
+        return interval_function(ast)
+    
+    def plot_taylor(self, coeffs, x0, x_range=(-10, 10), num_points=1000,
+                    label='P(x)', color='green', linestyle='-.'):
+        """
+        绘制泰勒多项式并标出展开点
+        参数：
+            coeffs: 泰勒系数 c_0..c_N
+            x0: 展开点
+            其余参数同 plot_function
+        """
+        def resample(r):
+            x_values = np.linspace(r[0], r[1], self.view_points(num_points))
+            return x_values, evaluate_taylor_polynomial(coeffs, x0, x_values)
+        x_values, y_values = resample(x_range)
+        
+        # 多项式在远处增长很快，已有曲线时保持原纵轴范围
+        y_limits = self.ax.get_ylim() if self.plots else None
+        
+        line, = self.ax.plot(x_values, y_values, label=label,
+                            color=color, linestyle=linestyle, linewidth=2)
+        self.plots.append(line)
+        self.resamplers.append((line, resample))
+        self.ax.plot([x0], [coeffs[0]], 'o', color=color)
+        
+        if y_limits:
+            self.ax.set_ylim(y_limits)
+        self.ax.legend()
+        self.canvas.draw()
+    
+    def mark_points(self, x_values, y_values, label, color, marker='o'):
+        """
+        在坐标轴上标出一组点（如方程的根、极值点、拐点）
+        参数：
+            x_values, y_values: 点的坐标
+            label: 图例标签
+            color: 颜色
+            marker: 标记形状
+        """
+        if len(x_values) == 0:
+            return
+        points, = self.ax.plot(x_values, y_values, linestyle='none', marker=marker,
+                               color=color, label=label, markersize=6, zorder=3)
+        self.markers.append(points)
+        self.ax.legend()
+        self.canvas.draw()
+    
+    def shade_area(self, x_values, y_values, label, color='orange'):
+        """
+        给曲线与 x 轴之间的区域着色（如定积分的面积）
+        参数：
+            x_values, y_values: 区间上的采样点（无定义处为 NaN，不着色）
+            label: 图例标签
+            color: 颜色
+        """
+        area = self.ax.fill_between(x_values, 0, y_values, where=np.isfinite(y_values),
+                                    color=color, alpha=0.3, label=label)
+        self.areas.append(area)
+        self.ax.legend()
+        self.canvas.draw()
+    
     def clear(self):
         """清除所有图像"""
         self.ax.clear()
         self.setup_axes()
         self.plots = []
+        self.resamplers = []
+        self.markers = []
+        self.areas = []
         self.canvas.draw()
     
     def set_range(self, x_range, y_range=None):
@@ -0,0 +1,256 @@
+"""
+多项式（Polynomial）
+功能：识别语法树中的多项式子树并转换为稀疏系数表示；
+标量用秦九韶（Horner）法求值，数组用 Estrin 法求值，小整数次幂化为连乘，
+多项式的导数直接由系数得到
+"""
+import math
+from fractions import Fraction
+from parser import *
+from lexer import TokenType
+from traversal import postorder
+from simplifier import exact, append_term
+
+MAX_DEGREE = 64        # 识别的最高次数，更高次的幂保持原式
+MAX_MULTIPLY_POWER = 8  # 数组的整数次幂不超过此值时化为连乘（比 np.power 快）
+
+class Polynomial:
+    """
+    稀疏多项式 Σ c·x^n
+    terms 为 次数 → 系数；整数与分数系数用 Fraction 精确表示，其余为 float
+    """
+    __slots__ = ('terms',)
+
+    def __init__(self, terms):
+        self.terms = {n: c for n, c in terms.items() if c != 0}
+
+    @staticmethod
+    def constant(value):
+        """常数多项式"""
+        return Polynomial({0: exact(value)})
+
+    @staticmethod
+    def variable():
+        """一次多项式 x"""
+        return Polynomial({1: exact(1)})
+
+    @property
+    def degree(self):
+        return max(self.terms, default=0)
+
+    def is_constant(self):
+        return self.degree == 0
+
+    def is_monomial(self):
+        """单项式（含常数与零）"""
+        return len(self.terms) <= 1
+
+    def constant_term(self):
+        return self.terms.get(0, Fraction(0))
+
+    def __add__(self, other):
+        terms = dict(self.terms)
+        for n, c in other.terms.items():
+            terms[n] = terms.get(n, 0) + c
+        return Polynomial(terms)
+
+    def __neg__(self):
+        return Polynomial({n: -c for n, c in self.terms.items()})
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __mul__(self, other):
+        terms = {}
+        for n, a in self.terms.items():
+            for m, b in other.terms.items():
+                terms[n + m] = terms.get(n + m, 0) + a * b
+        return Polynomial(terms)
+
+    def power(self, exponent):
+        """单项式的整数次幂"""
+        return Polynomial({n * exponent: c ** exponent for n, c in self.terms.items()})
+
+    def derivative(self):
+        """逐项求导：c·x^n → n·c·x^(n-1)"""
+        return Polynomial({n - 1: n * c for n, c in self.terms.items() if n > 0})
+
+    def coefficients(self):
+        """按次数降序的 (次数, 浮点系数) 元组，用于求值"""
+        return tuple((n, float(self.terms[n])) for n in sorted(self.terms, reverse=True))
+
+    def to_ast(self, var='x'):
+        """转换为语法树：按次数降序排列各项，形式与化简器的输出一致"""
+        x = VariableNode(var)
+        result = None
+        for n in sorted(self.terms, reverse=True):
+            if n == 0:
+                rest = None
+            elif n == 1:
+                rest = x
+            else:
+                rest = BinaryOpNode(x, TokenType.POWER, NumberNode(float(n)))
+            result = append_term(result, self.terms[n], rest)
+        if result is None:
+            return NumberNode(0.0)
+        return result
+
+    def __repr__(self):
+        return f"Polynomial({self.coefficients()})"
+
+class PolynomialNode(ASTNode):
+    """
+    多项式节点：部分求值时由多项式子树折叠而来，只出现在求值用的语法树中
+    terms 为按次数降序的 (次数, 系数) 元组，唯一的子节点是变量
+    """
+    __slots__ = ('terms', 'variable')
+    _fields = ('terms', 'variable')
+
+    def __new__(cls, terms, variable):
+        return super().__new__(cls, tuple(terms), variable)
+
+    def children(self):
+        return (self.variable,)
+
+    def with_children(self, children):
+        return PolynomialNode(self.terms, children[0])
+
+    def polynomial(self):
+        """节点对应的多项式"""
+        return Polynomial({n: exact(c) for n, c in self.terms})
+
+    def __repr__(self):
+        return f"Poly({self.variable.name}, {list(self.terms)})"
+
+# ========== 识别 ==========
+
+def leaf_polynomial(node, var='x', named_constants=True):
+    """
+    叶节点（以及已折叠的多项式节点）对应的多项式，其余节点返回 None
+    named_constants 为 False 时 π、e 不作为系数（求导结果中保留符号）
+    """
+    if isinstance(node, NumberNode):
+        if isinstance(node.value, (int, float)):
+            return Polynomial.constant(node.value)
+        if named_constants:
+            return Polynomial.constant(math.pi if node.value == 'π' else math.e)
+        return None
+    if isinstance(node, VariableNode):
+        return Polynomial.variable() if node.name == var else None
+    if isinstance(node, PolynomialNode):
+        return node.polynomial() if node.variable.name == var else None
+    return None
+
+def combine(node, polynomials):
+    """
+    由子节点的多项式得到运算节点的多项式，不是多项式时返回 None
+    只合并已经展开的形式：乘法至少一侧为单项式，幂的底数为单项式，
+    不展开 (x+1)*(x-1) 或 (x+1)^n（展开会增大表达式并损失精度）
+    """
+    if not polynomials or any(p is None for p in polynomials):
+        return None
+    if isinstance(node, UnaryOpNode) and node.op == TokenType.MINUS:
+        return -polynomials[0]
+    if not isinstance(node, BinaryOpNode):
+        return None
+
+    left, right = polynomials
+    if node.op == TokenType.PLUS:
+        return left + right
+    elif node.op == TokenType.MINUS:
+        return left - right
+    elif node.op == TokenType.MULTIPLY:
+        if (left.is_monomial() or right.is_monomial()) and left.degree + right.degree <= MAX_DEGREE:
+            return left * right
+    elif node.op == TokenType.DIVIDE:
+        # 除以非零常数
+        if right.is_constant() and right.constant_term() != 0:
+            return left * Polynomial({0: exact(1) / right.constant_term()})
+    elif node.op == TokenType.POWER:
+        # 单项式的非负整数次幂
+        exponent = right.constant_term()
+        if (right.is_constant() and left.is_monomial() and isinstance(exponent, Fraction)
+                and exponent.denominator == 1 and 0 <= exponent <= MAX_DEGREE
+                and left.degree * exponent <= MAX_DEGREE):
+            if exponent == 0:
+                return Polynomial.constant(1)  # 与 0^0 = 1 一致
+            try:
+                return left.power(int(exponent))
+            except OverflowError:
+                return None
+    return None
+
+def polynomials(root, var='x', named_constants=False):
+    """
+    识别语法树中的多项式子树
+    返回：节点 → Polynomial（不是 var 的多项式时为 None）的备忘表
+    """
+    def visit(node, child_polynomials):
+        leaf = leaf_polynomial(node, var, named_constants)
+        if leaf is not None or not child_polynomials:
+            return leaf
+        return combine(node, child_polynomials)
+
+    memo = {}
+    postorder(root, visit, memo)
+    return memo
+
+def as_polynomial(node, var='x'):
+    """表达式对应的多项式，不是多项式时返回 None"""
+    return polynomials(node, var)[node]
+
+# ========== 求值 ==========
+
+def multiply_power(x, n):
+    """x^n（n 为正整数）：二进制幂，只用乘法（x 可以是数、数组、对偶数或级数）"""
+    result = None
+    while True:
+        if n & 1:
+            result = x if result is None else result * x
+        n >>= 1
+        if not n:
+            return result
+        x = x * x
+
+def horner(terms, x):
+    """
+    秦九韶（Horner）法求值 Σ c·x^n
+    terms 为按次数降序的 (次数, 系数)，次数间隔大于 1 时用连乘计算 x 的幂
+    """
+    if not terms:
+        return 0.0
+    n, result = terms[0]
+    for m, c in terms[1:]:
+        power = x if n - m == 1 else multiply_power(x, n - m)
+        result = power * result + c
+        n = m
+    if n:
+        result = multiply_power(x, n) * result
+    return result
+
+def estrin(terms, x):
+    """
+    Estrin 法求值 Σ c·x^n（x 为数组）
+    相邻两项先合并为 c0 + c1·x，再以 x²、x⁴… 为变量逐层两两合并，
+    每层都是整个数组上的运算，层数为 log₂(次数)
+    """
+    if not terms:
+        return 0.0
+    values = [None] * (terms[0][0] + 1)  # 按次数升序的系数，None 表示 0
+    for n, c in terms:
+        values[n] = c
+    power = x
+    while len(values) > 1:
+        if len(values) % 2:
+            values.append(None)
+        values = [_add_scaled(values[i], values[i + 1], power) for i in range(0, len(values), 2)]
+        if len(values) > 1:
+            power = power * power
+    return 0.0 if values[0] is None else values[0]
+
+def _add_scaled(a, b, power):
+    """a + b·power，a、b 为 None 时视为 0"""
+    if b is None:
+        return a
+    scaled = power if isinstance(b, float) and b == 1 else power * b
+    return scaled if a is None else scaled + a
@@ -0,0 +1,202 @@
+"""
+自适应采样器（Sampler）
+功能：为绘图选取采样点——从粗网格开始，只在曲线弯曲、跳变或越出定义域的区间内细分，
+并在检测到渐近线处断开曲线，避免画出竖直的连线和被极大值拉伸的纵轴
+给出区间求值函数时，可以证明处处无定义的区间（如 ln(x) 在 x < 0 处）不求值
+"""
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+
+def adaptive_sample(func, x_range, max_points=1000, initial_points=33, tolerance=1e-3,
+                    callback=None, bounds=None):
+    """
+    自适应采样
+    参数：
+        func: 向量化函数，输入 x 数组，返回同形状的 y 数组（无定义处为 NaN）
+        x_range: x 的取值范围
+        max_points: 采样点数上限（求值次数预算）
+        initial_points: 初始均匀网格的点数
+        tolerance: 中点偏离弦的容差（相对于纵轴可视范围）
+        callback: 每轮细分后以已用预算比例（0~1）调用，可抛出异常以中止采样
+        bounds: (lo 数组, hi 数组) → Interval，函数在一组 x 区间上的取值区间（见 interval_function）
+    返回：(x_values, y_values)，y 中的 NaN 表示曲线在此处断开
+    """
+    a, b = float(x_range[0]), float(x_range[1])
+    initial_points = max(2, min(initial_points, max_points))
+    x = np.linspace(a, b, initial_points)
+    if bounds is None:
+        y = np.asarray(func(x), dtype=float)
+    else:
+        if bounds(np.array([a]), np.array([b])).defined_nowhere()[0]:
+            return np.array([a, b]), np.array([np.nan, np.nan])
+        # 只求两侧格子不全是处处无定义的点
+        nowhere = bounds(x[:-1], x[1:]).defined_nowhere()
+        needed = np.ones(len(x), dtype=bool)
+        needed[1:-1] = ~(nowhere[:-1] & nowhere[1:])
+        needed[[0, -1]] = ~nowhere[[0, -1]]
+        y = np.full(len(x), np.nan)
+        y[needed] = np.asarray(func(x[needed]), dtype=float)
+
+    finite = y[np.isfinite(y)]
+    if finite.size == 0:
+        return x, y
+
+    # 纵轴可视范围：用分位数排除渐近线附近的极端值
+    low, high = np.percentile(finite, [2, 98])
+    scale = high - low
+    if scale == 0:
+        scale = max(1.0, abs(high))
+    view = (low - scale, high + scale)
+    min_width = (b - a) * 1e-10
+
+    # pending[i] 表示区间 [x_i, x_{i+1}] 仍需细分
+    pending = np.ones(len(x) - 1, dtype=bool)
+    while len(x) < max_points:
+        candidates = np.flatnonzero(pending & (np.diff(x) > min_width))
+        if candidates.size == 0:
+            break
+        budget = max_points - len(x)
+        if candidates.size > budget:
+            # 预算不足时优先细分跳变最大的区间
+            jump = np.abs(y[candidates + 1] - y[candidates])
+            jump[np.isnan(jump)] = np.inf
+            candidates = np.sort(candidates[np.argsort(-jump)[:budget]])
+
+        y_left = y[candidates]
+        y_right = y[candidates + 1]
+        x_mid = (x[candidates] + x[candidates + 1]) / 2
+        y_mid = np.asarray(func(x_mid), dtype=float)
+
+        refine = _needs_refinement(y_left, y_mid, y_right, tolerance * scale, view)
+        # 区间一分为二：两半继承相同的细分标记
+        pending[candidates] = refine
+        x = np.insert(x, candidates + 1, x_mid)
+        y = np.insert(y, candidates + 1, y_mid)
+        pending = np.insert(pending, candidates + 1, refine)
+        if callback:
+            callback(len(x) / max_points)
+
+    x, y = _break_at_asymptotes(x, y, pending, scale, view)
+    # 远离可视范围的点（渐近线附近的极大值）不参与绘制，避免纵轴被拉伸
+    with np.errstate(invalid='ignore'):
+        y[(y < view[0] - scale) | (y > view[1] + scale)] = np.nan
+    return x, y
+
+def _needs_refinement(y_left, y_mid, y_right, tolerance, view):
+    """判断区间是否需要继续细分"""
+    with np.errstate(invalid='ignore'):
+        deviation = np.abs(y_mid - (y_left + y_right) / 2)
+        bent = deviation > tolerance
+
+    ys = np.stack([y_left, y_mid, y_right])
+    nan = np.isnan(ys)
+    # 部分点无定义：定义域边界
+    boundary = nan.any(axis=0) & ~nan.all(axis=0)
+    # 所有有定义的点都在可视范围之外：不必细分
+    with np.errstate(invalid='ignore'):
+        visible = (ys >= view[0]) & (ys <= view[1])
+    offscreen = ~visible.any(axis=0)
+    return (bent | boundary) & ~offscreen
+
+def _break_at_asymptotes(x, y, pending, scale, view):
+    """
+    在渐近线处插入 NaN 断开曲线：
+    - 相邻两点分别在可视范围的上下两侧（越过竖直渐近线）
+    - 或细分到极限仍未收敛且跳变超过半个可视高度
+    """
+    y_left, y_right = y[:-1], y[1:]
+    with np.errstate(invalid='ignore'):
+        crossing = (((y_left > view[1]) & (y_right < view[0])) |
+                    ((y_left < view[0]) & (y_right > view[1])))
+        jump = pending & (np.abs(y_right - y_left) > scale / 2)
+    breaks = np.flatnonzero(crossing | jump)
+    if breaks.size == 0:
+        return x, y
+    x_gap = (x[breaks] + x[breaks + 1]) / 2
+    return np.insert(x, breaks + 1, x_gap), np.insert(y, breaks + 1, np.nan)
+
+class TileCache:
+    """
+    采样分块缓存
+    把 x 轴按 2 的幂宽度切成分块，每块独立自适应采样并缓存，
+    平移回已看过的区域或回到之前的缩放级别时无需重新求值；
+    挂接磁盘缓存（store）时分块同时写入磁盘，重新启动后以内存映射方式读回
+    """
+    TILES_PER_VIEW = 4  # 一屏大约覆盖的分块数
+
+    def __init__(self, max_tiles=512, store=None):
+        self.max_tiles = max_tiles
+        self.store = store  # 磁盘缓存，None 为不使用
+        self._tiles = OrderedDict()  # (曲线键, 层级, 序号, 点数) → (x, y)，按最近使用排序
+        self._lock = threading.Lock()  # 后台采样与界面重采样可能同时访问
+
+    def sample(self, key, func, x_range, max_points, callback=None, bounds=None):
+        """
+        对可视范围采样
+        参数：
+            key: 曲线的缓存键（如 AST 节点）
+            func: 向量化函数
+            x_range: 可视的 x 范围
+            max_points: 一屏的采样点数预算
+            callback: 以进度比例（0~1）调用，可抛出异常以中止采样
+            bounds: 区间求值函数，见 adaptive_sample
+        返回：(x_values, y_values)，两端各多保留一个可视范围外的点
+        """
+        x_min, x_max = float(x_range[0]), float(x_range[1])
+        width = x_max - x_min
+        if not width > 0:
+            return np.array([]), np.array([])
+
+        level = math.floor(math.log2(width / self.TILES_PER_VIEW))
+        tile_width = 2.0 ** level
+        points = max(16, math.ceil(max_points / self.TILES_PER_VIEW))
+
+        indices = range(math.floor(x_min / tile_width), math.ceil(x_max / tile_width))
+        xs, ys = [], []
+        for i, index in enumerate(indices):
+            tile_callback = None
+            if callback:
+                tile_callback = lambda fraction: callback((i + fraction) / len(indices))
+            x, y = self._tile(key, func, level, index, tile_width, points, tile_callback, bounds)
+            xs.append(x)
+            ys.append(y)
+            if callback:
+                callback((i + 1) / len(indices))
+        x = np.concatenate(xs)
+        y = np.concatenate(ys)
+
+        start = max(np.searchsorted(x, x_min, 'right') - 1, 0)
+        stop = np.searchsorted(x, x_max, 'left') + 1
+        return x[start:stop], y[start:stop]
+
+    def _tile(self, key, func, level, index, tile_width, points, callback=None, bounds=None):
+        """取出或计算一个分块"""
+        tile_key = (key, level, index, points)
+        with self._lock:
+            tile = self._tiles.get(tile_key)
+            if tile is not None:
+                self._tiles.move_to_end(tile_key)
+                return tile
+
+        stored = None
+        if self.store is not None:
+            stored = self.store.load_array('tiles', tile_key)
+        if stored is not None:
+            tile = (stored[0], stored[1])
+        else:
+            tile = adaptive_sample(func, (index * tile_width, (index + 1) * tile_width), points,
+                                   callback=callback, bounds=bounds)
+            if self.store is not None:
+                self.store.save_array('tiles', tile_key, np.stack(tile))
+        with self._lock:
+            self._tiles[tile_key] = tile
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return tile
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._tiles.clear()
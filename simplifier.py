@@ -0,0 +1,417 @@
+"""
+代数化简器（Simplifier）
+功能：对 AST 做代数化简，主要用于压缩求导结果
+支持：常数折叠、恒等元/零元消去、同类项合并、同底幂合并
+"""
+from fractions import Fraction
+from parser import *
+from lexer import TokenType
+from traversal import postorder
+
+class Simplifier:
+    """代数化简器（自底向上单遍重写）"""
+
+    def __init__(self):
+        self._cache = {}  # 节点 → 化简结果（共享子树只化简一次）
+
+    def simplify(self, node):
+        """
+        化简 AST 节点
+        参数：
+            node: AST 节点
+        返回：化简后的 AST 节点（不修改原树）
+        显式栈后序遍历，不受递归深度限制：子节点化简后的结果传给 _simplify_*
+        """
+        return postorder(node, self._visit, self._cache)
+
+    def _visit(self, node, children):
+        """化简单个节点（children 为已化简的子节点）"""
+        if isinstance(node, (NumberNode, VariableNode)):
+            return node
+        elif isinstance(node, UnaryOpNode):
+            return self._simplify_unary_op(node, *children)
+        elif isinstance(node, BinaryOpNode):
+            return self._simplify_binary_op(node, *children)
+        elif isinstance(node, FunctionNode):
+            return self._simplify_function(node, children)
+        else:
+            raise Exception(f"未知节点类型: {type(node)}")
+
+    # ========== 各类节点 ==========
+
+    def _simplify_unary_op(self, node, operand):
+        """一元负号：并入乘积的系数"""
+        return self._build_product(UnaryOpNode(node.op, operand))
+
+    def _simplify_binary_op(self, node, left, right):
+        """二元运算"""
+        rebuilt = BinaryOpNode(left, node.op, right)
+
+        if node.op in (TokenType.PLUS, TokenType.MINUS):
+            return self._build_sum(rebuilt)
+        elif node.op == TokenType.MULTIPLY:
+            return self._build_product(rebuilt)
+        elif node.op == TokenType.DIVIDE:
+            return self._simplify_divide(left, right)
+        elif node.op == TokenType.POWER:
+            return self._simplify_power(left, right)
+        return rebuilt
+
+    def _simplify_divide(self, left, right):
+        """除法：a/1 → a，0/a → 0，a/a → 1，除以常数并入系数"""
+        a = _numeric_value(left)
+        b = _numeric_value(right)
+        if b is not None:
+            if b == 0:
+                return BinaryOpNode(left, TokenType.DIVIDE, right)
+            return self._build_product(BinaryOpNode(left, TokenType.DIVIDE, right))
+        if a == 0:
+            return NumberNode(0.0)
+        if self._key(left) == self._key(right):
+            return NumberNode(1.0)
+        return self._build_product(BinaryOpNode(left, TokenType.DIVIDE, right))
+
+    def _simplify_power(self, base, exponent):
+        """幂运算：常数折叠、a^0 → 1、a^1 → a、1^a → 1、(a^m)^n → a^(m*n)"""
+        b = _numeric_value(base)
+        n = _numeric_value(exponent)
+        if b is not None and n is not None:
+            folded = _fold(lambda p, q: p ** q, b, n)
+            if folded is not None:
+                return _number_node(folded)
+        if n == 0:
+            return NumberNode(1.0)
+        if n == 1:
+            return base
+        if b == 1:
+            return NumberNode(1.0)
+        if b == 0 and n is not None and n > 0:
+            return NumberNode(0.0)
+        # 整数次幂可以安全地合并指数
+        if (n is not None and n == int(n)
+                and isinstance(base, BinaryOpNode) and base.op == TokenType.POWER):
+            m = _numeric_value(base.right)
+            if m is not None:
+                return self._simplify_power(base.left, _number_node(exact(m) * exact(n)))
+        return BinaryOpNode(base, TokenType.POWER, exponent)
+
+    def _simplify_function(self, node, args):
+        """函数：折叠 sin(0)、cos(0)、ln(1)、ln(e)、log(a, a)（args 为化简后的参数）"""
+        if len(args) == 1:
+            value = _numeric_value(args[0])
+            if node.name in (TokenType.SIN, TokenType.COS) and value == 0:
+                return NumberNode(0.0 if node.name == TokenType.SIN else 1.0)
+            if node.name == TokenType.LOG:
+                if value == 1:
+                    return NumberNode(0.0)
+                if isinstance(args[0], NumberNode) and args[0].value == 'e':
+                    return NumberNode(1.0)
+        elif len(args) == 2 and node.name == TokenType.LOG:
+            if _numeric_value(args[1]) == 1:
+                return NumberNode(0.0)
+            if self._key(args[0]) == self._key(args[1]):
+                return NumberNode(1.0)
+        return FunctionNode(node.name, args)
+
+    # ========== 和式：同类项合并 ==========
+
+    def _build_sum(self, node):
+        """展平加减链，合并同类项，常数项放在末尾"""
+        terms = []
+        self._collect_terms(node, 1, terms)
+
+        constant = Fraction(0)
+        combined = {}  # 结构键 → [系数, 代表节点]
+        for coef, rest in terms:
+            if rest is None:
+                constant = _fold(lambda p, q: p + q, constant, coef)
+                continue
+            key = self._term_key(rest)
+            if key in combined:
+                combined[key][0] = _fold(lambda p, q: p + q, combined[key][0], coef)
+            else:
+                combined[key] = [coef, rest]
+
+        result = None
+        for coef, rest in combined.values():
+            if coef != 0:
+                result = append_term(result, coef, rest)
+        if constant != 0 or result is None:
+            result = append_term(result, constant, None)
+        return result
+
+    def _collect_terms(self, node, sign, terms):
+        """收集和式中的各项 (系数, 非常数部分)，按从左到右的顺序（显式栈，长和式不受递归深度限制）"""
+        stack = [(node, sign)]
+        while stack:
+            node, sign = stack.pop()
+            if isinstance(node, BinaryOpNode) and node.op == TokenType.PLUS:
+                stack.append((node.right, sign))
+                stack.append((node.left, sign))
+            elif isinstance(node, BinaryOpNode) and node.op == TokenType.MINUS:
+                stack.append((node.right, -sign))
+                stack.append((node.left, sign))
+            elif isinstance(node, UnaryOpNode) and node.op == TokenType.MINUS:
+                stack.append((node.operand, -sign))
+            else:
+                coef, rest = _split_coefficient(node)
+                terms.append((coef * sign, rest))
+
+    def _term_key(self, term):
+        """同类项的键：与因子顺序无关（x * sin(x) 与 sin(x) * x 视为同类项）"""
+        factors = []
+        coef = self._collect_factors(term, factors, 1)
+        if coef is None:
+            return self._key(term)
+        exponents = {}
+        for base, exponent in factors:
+            key = self._key(base)
+            exponents[key] = exact(exponents.get(key, 0)) + exact(exponent)
+        return coef, frozenset(item for item in exponents.items() if item[1] != 0)
+
+    # ========== 乘积：系数合并与同底幂合并 ==========
+
+    def _build_product(self, node):
+        """
+        展平乘积，合并数值系数与同底幂，系数放在最前，负指数因子移到分母
+        含有和式因子时按分配律展开，以便后续合并同类项
+        """
+        factors = []
+        coef = self._collect_factors(node, factors, 1)
+        if coef is None:
+            return node
+        if coef == 0:
+            return NumberNode(0.0)
+
+        combined = {}  # 结构键 → [底数, 指数]
+        for base, exponent in factors:
+            key = self._key(base)
+            if key in combined:
+                combined[key][1] = exact(combined[key][1]) + exact(exponent)
+            else:
+                combined[key] = [base, exponent]
+        factors = [(base, exponent) for base, exponent in combined.values() if exponent != 0]
+
+        for i, (base, exponent) in enumerate(factors):
+            if exponent == 1 and _is_sum(base):
+                return self._expand(coef, base, factors[:i] + factors[i + 1:])
+
+        numerator = None
+        denominator = None
+        for base, exponent in factors:
+            if exponent > 0:
+                factor = base if exponent == 1 else self._simplify_power(base, _number_node(exponent))
+                numerator = _multiply(numerator, factor)
+            else:
+                factor = base if exponent == -1 else self._simplify_power(base, _number_node(-exponent))
+                denominator = _multiply(denominator, factor)
+
+        if numerator is None and denominator is None:
+            return _number_node(coef)
+        return _signed(coef, _scale(abs(coef), numerator, denominator))
+
+    def _expand(self, coef, total, others):
+        """coef * (a ± b ± ...) * others → coef*a*others ± coef*b*others ± ..."""
+        terms = []
+        self._collect_terms(total, 1, terms)
+        result = None
+        for c, rest in terms:
+            product = _number_node(exact(coef) * exact(c))
+            if rest is not None:
+                product = BinaryOpNode(product, TokenType.MULTIPLY, rest)
+            for base, exponent in others:
+                product = BinaryOpNode(product, TokenType.MULTIPLY,
+                                       BinaryOpNode(base, TokenType.POWER, _number_node(exponent)))
+            product = self._build_product(product)
+            result = product if result is None else BinaryOpNode(result, TokenType.PLUS, product)
+        return self._build_sum(result)
+
+    def _collect_factors(self, node, factors, sign):
+        """
+        收集乘积中的因子 (底数, 数值指数)，返回数值系数
+        sign 为 -1 表示处于分母中（指数取反）；系数无法精确合并时返回 None
+        显式栈：因子按从左到右的顺序收集，系数按原树的结构逐层合并
+        """
+        stack = [(node, sign, False)]
+        coefs = []  # 已处理的子树的系数
+        while stack:
+            node, sign, expanded = stack.pop()
+            if expanded:
+                if isinstance(node, UnaryOpNode):
+                    inner = coefs.pop()
+                    coefs.append(None if inner is None else -inner)
+                    continue
+                right = coefs.pop()
+                left = coefs.pop()
+                if left is None or right is None:
+                    coefs.append(None)
+                elif node.op == TokenType.MULTIPLY:
+                    coefs.append(_fold(lambda p, q: p * q, left, right))
+                else:
+                    coefs.append(None if right == 0 else _fold(lambda p, q: p / q, left, right))
+                continue
+
+            if isinstance(node, BinaryOpNode) and node.op in (TokenType.MULTIPLY, TokenType.DIVIDE):
+                stack.append((node, sign, True))
+                stack.append((node.right, -sign if node.op == TokenType.DIVIDE else sign, False))
+                stack.append((node.left, sign, False))
+            elif isinstance(node, UnaryOpNode) and node.op == TokenType.MINUS:
+                stack.append((node, sign, True))
+                stack.append((node.operand, sign, False))
+            else:
+                coefs.append(self._collect_factor(node, factors, sign))
+        return coefs[0]
+
+    def _collect_factor(self, node, factors, sign):
+        """乘积中的单个因子：数值返回其值，否则记入 factors 并返回 1"""
+        value = _numeric_value(node)
+        if value is not None:
+            return exact(value)
+        if isinstance(node, BinaryOpNode) and node.op == TokenType.POWER:
+            exponent = _numeric_value(node.right)
+            if exponent is not None:
+                factors.append((node.left, exponent * sign))
+                return Fraction(1)
+        factors.append((node, sign))
+        return Fraction(1)
+
+    # ========== 结构键 ==========
+
+    def _key(self, node):
+        """结构键：节点已一致化，结构相同即同一对象；数字 2 与 2.0 视为相同"""
+        if isinstance(node, NumberNode) and isinstance(node.value, int):
+            return NumberNode(float(node.value))
+        return node
+
+# ========== 数值辅助函数 ==========
+
+def exact(value):
+    """整数值与分数转为 Fraction（精确运算），其余保持 float"""
+    if isinstance(value, Fraction):
+        return value
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+        return Fraction(int(value))
+    return value
+
+def _fold(op, a, b):
+    """
+    常数折叠：精确输入得到精确结果时才折叠为分数；
+    输入中已有小数时按浮点折叠；无定义或结果为复数时返回 None
+    """
+    a = exact(a)
+    b = exact(b)
+    try:
+        result = op(a, b)
+    except (ZeroDivisionError, OverflowError):
+        return None
+    if isinstance(result, complex):
+        return None
+    if isinstance(result, Fraction):
+        return result
+    if isinstance(a, Fraction) and isinstance(b, Fraction):
+        # 精确输入得到无理数结果（如 2^0.5 以分数指数给出），保留原式
+        return None
+    return exact(result)
+
+def _numeric_value(node):
+    """数值常数节点（数字、分数 p/q、负数）的值；非数值返回 None"""
+    if isinstance(node, NumberNode):
+        if isinstance(node.value, (int, float)):
+            return exact(node.value)
+        return None
+    if isinstance(node, UnaryOpNode) and node.op == TokenType.MINUS:
+        value = _numeric_value(node.operand)
+        return None if value is None else -value
+    if isinstance(node, BinaryOpNode) and node.op == TokenType.DIVIDE:
+        p = _numeric_value(node.left)
+        q = _numeric_value(node.right)
+        if isinstance(p, Fraction) and isinstance(q, Fraction) and q != 0:
+            return p / q
+    return None
+
+def _number_node(value):
+    """由数值构造节点：整数和小数为 NumberNode，真分数为 p / q"""
+    value = exact(value)
+    if isinstance(value, Fraction) and value.denominator != 1:
+        fraction = BinaryOpNode(NumberNode(float(abs(value.numerator))), TokenType.DIVIDE,
+                                NumberNode(float(value.denominator)))
+        return _signed(value, fraction)
+    return NumberNode(float(value))
+
+def _signed(value, node):
+    """value 为负时在 node 前加负号"""
+    return UnaryOpNode(TokenType.MINUS, node) if value < 0 else node
+
+def _is_sum(node):
+    """是否为加减运算节点"""
+    return isinstance(node, BinaryOpNode) and node.op in (TokenType.PLUS, TokenType.MINUS)
+
+def _multiply(product, factor):
+    """把因子乘到乘积上（product 为 None 表示空乘积）"""
+    return factor if product is None else BinaryOpNode(product, TokenType.MULTIPLY, factor)
+
+def _scale(coef, numerator, denominator=None):
+    """
+    构造 coef * numerator / denominator（coef 非负，numerator、denominator 可为 None）
+    分数系数 p/q 拆开：p 乘到分子，q 乘到分母
+    """
+    coef = exact(coef)
+    if isinstance(coef, Fraction) and coef.denominator != 1:
+        p, q = coef.numerator, coef.denominator
+    else:
+        p, q = coef, 1
+
+    if numerator is None:
+        numerator = _number_node(p)
+    elif p != 1:
+        numerator = BinaryOpNode(_number_node(p), TokenType.MULTIPLY, numerator)
+    if q != 1:
+        denominator = (_number_node(q) if denominator is None else
+                       BinaryOpNode(_number_node(q), TokenType.MULTIPLY, denominator))
+    if denominator is None:
+        return numerator
+    return BinaryOpNode(numerator, TokenType.DIVIDE, denominator)
+
+def _split_coefficient(node):
+    """把一项拆成 (数值系数, 非常数部分)；纯常数的非常数部分为 None"""
+    value = _numeric_value(node)
+    if value is not None:
+        return value, None
+    if isinstance(node, BinaryOpNode) and node.op == TokenType.MULTIPLY:
+        coef = _numeric_value(node.left)
+        if coef is not None:
+            return coef, node.right
+    if isinstance(node, BinaryOpNode) and node.op == TokenType.DIVIDE:
+        top, numerator = _split_coefficient(node.left)
+        bottom, denominator = _split_coefficient(node.right)
+        coef = _fold(lambda p, q: p / q, top, bottom)
+        if coef is not None:
+            if denominator is None:
+                return coef, numerator
+            if numerator is None:
+                numerator = NumberNode(1.0)
+            return coef, BinaryOpNode(numerator, TokenType.DIVIDE, denominator)
+    return Fraction(1), node
+
+def append_term(result, coef, rest):
+    """向和式追加一项 coef * rest（rest 为 None 时为常数项）"""
+    if rest is None:
+        term = _number_node(abs(coef))
+    elif isinstance(rest, BinaryOpNode) and rest.op == TokenType.DIVIDE:
+        numerator = None if _numeric_value(rest.left) == 1 else rest.left
+        term = _scale(abs(coef), numerator, rest.right)
+    else:
+        term = _scale(abs(coef), rest)
+
+    if result is None:
+        return _signed(coef, term)
+    op = TokenType.MINUS if coef < 0 else TokenType.PLUS
+    return BinaryOpNode(result, op, term)
+
+def simplify(node):
+    """化简 AST，返回新的 AST"""
+    return Simplifier().simplify(node)
+
+def count_nodes(node):
+    """统计 AST 节点数（按树计数；共享子树的大小只计算一次）"""
+    return postorder(node, lambda n, sizes: 1 + sum(sizes))
@@ -0,0 +1,166 @@
+"""
+方程求根（Solver）
+功能：求区间上 f(x) = 0 的全部根、f'(x) = 0 的极值点与 f''(x) = 0 的拐点
+先在均匀网格上向量化求值找出所有变号区间，再对全部区间同时做牛顿迭代
+（导数由导函数 AST 的对偶数求值给出，牛顿步跳出区间时改用二分，保证收敛）
+网格按块做区间求值，函数值区间不含 0 的块（包括处处无定义的块）内不可能有根，不必求值
+同一网格格子内的两个根互相抵消变号，无法发现；需要时加密网格
+"""
+import numpy as np
+from autodiff import evaluate_dual_vectorized
+from expression_cache import derivative_cache
+from interval import interval_function
+
+GRID_POINTS = 20000    # 扫描变号区间的网格点数
+MAX_ITERATIONS = 100   # 迭代次数上限（二分 100 次足以把区间缩到浮点精度）
+X_TOLERANCE = 4e-16    # 相对步长小于此值时停止迭代
+ZERO_TOLERANCE = 1e-10 # 极值处 |f| 小于此值时视为（不变号的）重根
+BLOCK_CELLS = 32       # 区间求值剪枝的块大小（网格格子数）
+
+class Features:
+    """函数在区间上的特征点，各为按 x 升序排列的数组"""
+    __slots__ = ('roots', 'minima', 'maxima', 'inflections')
+
+    def __init__(self, roots, minima, maxima, inflections):
+        self.roots = roots
+        self.minima = minima
+        self.maxima = maxima
+        self.inflections = inflections
+
+    def __repr__(self):
+        return (f"Features(roots={len(self.roots)}, minima={len(self.minima)}, "
+                f"maxima={len(self.maxima)}, inflections={len(self.inflections)})")
+
+def dual_function(ast):
+    """ast 的向量化求值函数：x 数组 → (g, g') 两个数组，无定义处为 NaN"""
+    return lambda x: evaluate_dual_vectorized(ast, x)
+
+def find_zeros(func, interval, points=GRID_POINTS, bounds=None, callback=None):
+    """
+    区间内 g(x) = 0 且 g 变号的全部点
+    参数：
+        func: x 数组 → (g, g')，见 dual_function
+        interval: (起点, 终点)
+        points: 网格点数
+        bounds: (lo 数组, hi 数组) → g 的取值区间，见 interval_function；给出时只在可能有根的块内求值
+        callback: 以进度比例（0~1）调用，可抛出异常以中止计算
+    返回：(零点, 穿过零点时 g 是否递增) 两个按 x 升序排列的数组
+    """
+    xs = np.linspace(interval[0], interval[1], points)
+    if bounds is None:
+        ys = func(xs)[0]
+    else:
+        # 被剪掉的格子两端记为 NaN，不会被当作变号区间
+        ys = np.full(points, np.nan)
+        needed = _possible_root_points(bounds, xs)
+        ys[needed] = func(xs[needed])[0]
+
+    refine_callback = None
+    if callback:
+        callback(0.5)
+        refine_callback = lambda fraction: callback(0.5 + fraction / 2)
+
+    # 严格变号的格子：在格子内迭代求根
+    change = np.flatnonzero(ys[:-1] * ys[1:] < 0)
+    roots, valid = refine(func, xs[change], xs[change + 1], ys[change], ys[change + 1],
+                          callback=refine_callback)
+    increasing = ys[change] < 0
+
+    # 恰好落在网格点上、两侧变号的零点
+    exact = np.flatnonzero(ys[1:-1] == 0) + 1
+    exact = exact[ys[exact - 1] * ys[exact + 1] < 0]
+
+    roots = np.concatenate([roots[valid], xs[exact]])
+    increasing = np.concatenate([increasing[valid], ys[exact - 1] < 0])
+    order = np.argsort(roots, kind='stable')
+    return roots[order], increasing[order]
+
+def _possible_root_points(bounds, xs):
+    """网格上需要求值的点：所在格子属于函数值区间含 0 的块"""
+    starts = np.arange(0, len(xs) - 1, BLOCK_CELLS)
+    stops = np.minimum(starts + BLOCK_CELLS, len(xs) - 1)
+    lo, hi = xs[starts], xs[stops]
+    possible = bounds(np.minimum(lo, hi), np.maximum(lo, hi)).contains(0.0)
+    cells = np.repeat(possible, stops - starts)
+    needed = np.zeros(len(xs), dtype=bool)
+    needed[:-1] |= cells
+    needed[1:] |= cells
+    return needed
+
+def refine(func, lo, hi, g_lo, g_hi, max_iterations=MAX_ITERATIONS, callback=None):
+    """
+    对一组变号区间 [lo, hi] 同时求根
+    每轮只对尚未收敛的区间求值一次：按中间点的符号收紧区间，
+    牛顿步落在区间内时采用，否则（导数为零、无定义或步子过大）取区间中点
+    callback(fraction) 每轮之后以已收敛区间的比例调用，可抛出异常以中止迭代
+    返回：(根, 是否为真根)；区间缩到极小而 |g| 不减小的是间断点（如 1/x 在 0 处）
+    """
+    lo, hi = lo.copy(), hi.copy()
+    sign = np.sign(g_hi)  # sign·g 在 lo 处为负、在 hi 处为正
+    x = (lo + hi) / 2
+    scale = hi - lo  # 收敛判断的绝对尺度（根在 0 附近时相对误差无意义）
+    active = np.arange(len(x))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(max_iterations):
+            if not active.size:
+                break
+            g, dg = func(x[active])
+            g = g * sign[active]
+            dg = dg * sign[active]
+
+            # 收紧区间（无定义的点当作正值处理，区间照样缩小）
+            below = g < 0
+            xa = x[active]
+            lo[active[below]] = xa[below]
+            hi[active[~below]] = xa[~below]
+
+            # 牛顿步，越界时二分
+            new = xa - g / dg
+            la, ha = lo[active], hi[active]
+            outside = ~((new > la) & (new < ha))
+            new[outside] = (la[outside] + ha[outside]) / 2
+
+            tolerance = X_TOLERANCE * (np.abs(xa) + scale[active])
+            done = (g == 0) | (np.abs(new - xa) <= tolerance) | (ha - la <= tolerance)
+            x[active] = np.where(g == 0, xa, new)
+            active = active[~done]
+            if callback:
+                callback(1 - active.size / len(x))
+
+    g_root = func(x)[0]
+    valid = np.abs(g_root) <= np.minimum(np.abs(g_lo), np.abs(g_hi))
+    return x, valid
+
+def analyze(ast, interval=(-10, 10), points=GRID_POINTS, callback=None):
+    """
+    求函数在区间上的根、极小值点、极大值点与拐点
+    极值点与拐点分别是一阶、二阶导函数的变号零点（导函数 AST 取自缓存）；
+    只保留原函数有定义的点；|f| 几乎为零的极值点同时是（不变号的）重根
+    callback(fraction) 报告进度（三次求根各占三分之一），可抛出异常以中止计算
+    """
+    def stage(i):
+        """第 i 次求根的进度回调"""
+        if callback:
+            return lambda fraction: callback((i + fraction) / 3)
+        return None
+
+    f = dual_function(ast)
+    roots, _ = find_zeros(f, interval, points, interval_function(ast), stage(0))
+
+    first = derivative_cache.derivative(ast)
+    critical, increasing = find_zeros(dual_function(first), interval, points,
+                                      interval_function(first), stage(1))
+    values = f(critical)[0]
+    defined = np.isfinite(values)
+    minima = critical[defined & increasing]
+    maxima = critical[defined & ~increasing]
+
+    touching = critical[defined & (np.abs(values) < ZERO_TOLERANCE)]
+    if touching.size:
+        roots = np.union1d(roots, touching)
+
+    second = derivative_cache.derivative(ast, order=2)
+    inflections, _ = find_zeros(dual_function(second), interval, points, interval_function(second),
+                                stage(2))
+    inflections = inflections[np.isfinite(f(inflections)[0])]
+    return Features(roots, minima, maxima, inflections)
@@ -0,0 +1,57 @@
+"""
+函数值表的表格模型（Table Model）
+功能：QAbstractTableModel 直接读取 ValueTable 的列数组，视图只请求可见的单元格，
+百万行的表格既不为每个单元格创建控件，也不预先生成字符串
+"""
+import math
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from evaluator import exact_form
+
+# 列名 → 表头
+HEADERS = {'x': 'x', 'value': 'f(x)', 'derivative': "f'(x)"}
+
+class ValueTableModel(QAbstractTableModel):
+    """只读表格模型：单元格文本在视图请求时才格式化"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.table = None  # ValueTable
+
+    def set_table(self, table):
+        """更换显示的函数值表（None 为清空）"""
+        self.beginResetModel()
+        self.table = table
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.table is None:
+            return 0
+        return len(self.table)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.table is None:
+            return 0
+        return len(self.table.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or self.table is None:
+            return None
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        value = float(self.table.column(index.column())[index.row()])
+        if not math.isfinite(value):
+            return "无定义"
+        if role == Qt.ToolTipRole:
+            return repr(value)  # 完整精度
+        if index.column() == 0:
+            return f"{value:.10g}"
+        # 能识别为分数、π 的倍数等时显示精确形式
+        return exact_form(value) or f"{value:.10g}"
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or self.table is None:
+            return None
+        if orientation == Qt.Horizontal:
+            return HEADERS[self.table.columns[section]]
+        return str(section + 1)
@@ -0,0 +1,332 @@
+"""
+泰勒级数求值器（Taylor）
+功能：在原函数 AST 上传播截断幂级数，单遍得到 x0 处 0..N 阶的全部导数
+级数系数 c_k = f⁽ᵏ⁾(x0) / k!，x0 可以是一个数或一组点（NumPy 数组）
+"""
+import math
+import numpy as np
+from parser import *
+from lexer import TokenType
+from evaluator import Evaluator, format_result
+
+class Taylor:
+    """
+    截断幂级数 Σ c_k·t^k（k = 0..N）
+    coeffs 的第 0 维为阶数，其余维度与 x0 的形状相同
+    """
+    __slots__ = ('coeffs',)
+
+    def __init__(self, coeffs):
+        self.coeffs = coeffs
+
+    @property
+    def order(self):
+        return len(self.coeffs) - 1
+
+    @property
+    def value(self):
+        """常数项，即函数值"""
+        return self.coeffs[0]
+
+    @staticmethod
+    def constant(value, order, shape=()):
+        """常数的级数：只有常数项"""
+        coeffs = np.zeros((order + 1,) + shape)
+        coeffs[0] = value
+        return Taylor(coeffs)
+
+    def _lift(self, other):
+        """把常数提升为同阶级数"""
+        if isinstance(other, Taylor):
+            return other
+        return Taylor.constant(other, self.order, self.coeffs.shape[1:])
+
+    def __add__(self, other):
+        if isinstance(other, Taylor):
+            return Taylor(self.coeffs + other.coeffs)
+        coeffs = self.coeffs.copy()
+        coeffs[0] = coeffs[0] + other
+        return Taylor(coeffs)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return (-self) + other
+
+    def __neg__(self):
+        return Taylor(-self.coeffs)
+
+    def __mul__(self, other):
+        if not isinstance(other, Taylor):
+            return Taylor(self.coeffs * other)
+        a, b = self.coeffs, other.coeffs
+        c = np.zeros(np.broadcast_shapes(a.shape, b.shape))
+        # 柯西乘积：c_k = Σ a_j·b_{k-j}
+        for k in range(len(c)):
+            c[k] = np.sum(a[:k + 1] * b[k::-1], axis=0)
+        return Taylor(c)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if not isinstance(other, Taylor):
+            return Taylor(self.coeffs / other)
+        a, b = self.coeffs, other.coeffs
+        c = np.zeros(np.broadcast_shapes(a.shape, b.shape))
+        # c_k = (a_k - Σ_{j=1..k} b_j·c_{k-j}) / b_0
+        for k in range(len(c)):
+            c[k] = (a[k] - np.sum(b[1:k + 1] * c[k - 1::-1][:k], axis=0)) / b[0]
+        return Taylor(c)
+
+    def __rtruediv__(self, other):
+        return self._lift(other) / self
+
+    # ========== 初等函数（递推公式） ==========
+
+    def exp(self):
+        """exp(a)：c_k = (1/k)·Σ_{j=1..k} j·a_j·c_{k-j}"""
+        a = self.coeffs
+        c = np.zeros_like(a)
+        c[0] = np.exp(a[0])
+        for k in range(1, len(a)):
+            j = _indices(k, a)
+            c[k] = np.sum(j * a[1:k + 1] * c[k - 1::-1][:k], axis=0) / k
+        return Taylor(c)
+
+    def log(self):
+        """ln(a)：c_k = (a_k - (1/k)·Σ_{j=1..k-1} j·c_j·a_{k-j}) / a_0"""
+        a = self.coeffs
+        c = np.zeros_like(a)
+        c[0] = np.log(a[0])
+        for k in range(1, len(a)):
+            j = _indices(k - 1, a)
+            c[k] = (a[k] - np.sum(j * c[1:k] * a[k - 1:0:-1], axis=0) / k) / a[0]
+        return Taylor(c)
+
+    def sin_cos(self):
+        """同时计算 sin(a) 与 cos(a)（两者的递推互相依赖）"""
+        a = self.coeffs
+        s = np.zeros_like(a)
+        c = np.zeros_like(a)
+        s[0] = np.sin(a[0])
+        c[0] = np.cos(a[0])
+        for k in range(1, len(a)):
+            j = _indices(k, a)
+            ja = j * a[1:k + 1]
+            s[k] = np.sum(ja * c[k - 1::-1][:k], axis=0) / k
+            c[k] = -np.sum(ja * s[k - 1::-1][:k], axis=0) / k
+        return Taylor(s), Taylor(c)
+
+    def power(self, r):
+        """
+        a^r（r 为常数）
+        a_0 ≠ 0 时：p_k = Σ_{j=1..k} (r·j - (k - j))·a_j·p_{k-j} / (k·a_0)
+        a_0 = 0 且 r 为非负整数时退化为重复乘法
+        """
+        a = self.coeffs
+        if float(r).is_integer() and r >= 0 and np.any(a[0] == 0):
+            result = Taylor.constant(1.0, self.order, a.shape[1:])
+            base = self
+            n = int(r)
+            while n:
+                if n & 1:
+                    result = result * base
+                base = base * base
+                n >>= 1
+            return result
+        p = np.zeros_like(a)
+        p[0] = np.power(a[0], r)
+        for k in range(1, len(a)):
+            j = _indices(k, a)
+            p[k] = np.sum((r * j - (k - j)) * a[1:k + 1] * p[k - 1::-1][:k], axis=0) / (k * a[0])
+        return Taylor(p)
+
+def _indices(k, a):
+    """1..k 的序号，形状可与系数数组广播"""
+    return np.arange(1, k + 1, dtype=float).reshape((k,) + (1,) * (a.ndim - 1))
+
+def _value(u):
+    """级数或常数的值"""
+    return u.value if isinstance(u, Taylor) else u
+
+class TaylorEvaluator(Evaluator):
+    """
+    泰勒级数求值器（单点）
+    变量 x 展开为 x0 + t，遍历 AST 时传播 N 阶截断级数，
+    定义域错误与 Evaluator 一样抛出异常
+    """
+    def __init__(self, x0, order):
+        super().__init__(x_value=x0)
+        self.order = order
+
+    def evaluate(self, node):
+        """求值 AST 节点，忽略浮点警告（定义域由各运算单独检查）"""
+        with np.errstate(all='ignore'):
+            return super().evaluate(node)
+
+    def eval_variable(self, node):
+        """x = x0 + t"""
+        if self.x_value is None:
+            raise Exception("变量 x 未赋值")
+        x0 = np.asarray(self.x_value, dtype=float)
+        series = Taylor.constant(x0, self.order, x0.shape)
+        if self.order >= 1:
+            series.coeffs[1] = 1.0
+        return series
+
+    def eval_binary_op(self, node, left, right):
+        """求值二元运算节点"""
+        if node.op == TokenType.PLUS:
+            return left + right
+        elif node.op == TokenType.MINUS:
+            return left - right
+        elif node.op == TokenType.MULTIPLY:
+            return left * right
+        elif node.op == TokenType.DIVIDE:
+            return self._divide(left, right)
+        elif node.op == TokenType.POWER:
+            return self._power(left, right)
+        else:
+            raise Exception(f"未知运算符: {node.op}")
+
+    def eval_function(self, node, args):
+        """求值函数节点"""
+        if node.name in (TokenType.SIN, TokenType.COS):
+            name = 'sin' if node.name == TokenType.SIN else 'cos'
+            if len(node.args) != 1:
+                raise Exception(f"{name} 函数需要 1 个参数")
+            u = args[0]
+            if not isinstance(u, Taylor):
+                return math.sin(u) if name == 'sin' else math.cos(u)
+            sin_u, cos_u = u.sin_cos()
+            return sin_u if name == 'sin' else cos_u
+
+        elif node.name == TokenType.LOG:
+            if len(node.args) == 1:
+                return self._ln(args[0])
+            elif len(node.args) == 2:
+                base = args[0]
+                arg = args[1]
+                self._check_log_base(base)
+                return self._divide(self._ln(arg), self._ln(base))
+            else:
+                raise Exception("log 函数需要 1 或 2 个参数")
+
+        else:
+            raise Exception(f"未知函数: {node.name}")
+
+    def _divide(self, left, right):
+        """除法（除数为零时报错）"""
+        if np.any(_value(right) == 0):
+            raise Exception("除数不能为零")
+        return left / right
+
+    def _ln(self, u):
+        """自然对数（参数必须为正）"""
+        if np.any(_value(u) <= 0):
+            raise Exception("对数函数参数必须大于 0")
+        return u.log() if isinstance(u, Taylor) else math.log(u)
+
+    def _check_log_base(self, base):
+        """检查对数底数"""
+        b = _value(base)
+        if np.any(b <= 0) or np.any(b == 1):
+            raise Exception("对数底数必须大于 0 且不等于 1")
+
+    def _power(self, base, exponent):
+        """幂运算：常数指数用幂级数递推，变指数用 exp(g·ln f)"""
+        if not isinstance(exponent, Taylor):
+            if not isinstance(base, Taylor):
+                return base ** exponent
+            return base.power(exponent)
+        return (exponent * self._ln(base)).exp()
+
+class VectorTaylorEvaluator(TaylorEvaluator):
+    """
+    泰勒级数求值器（一组展开点）
+    x0 为数组，定义域错误不抛异常，对应位置的全部系数为 NaN
+    """
+    def _mask(self, result, invalid):
+        if isinstance(result, Taylor):
+            return Taylor(np.where(invalid, np.nan, result.coeffs))
+        return np.where(invalid, np.nan, result)
+
+    def _divide(self, left, right):
+        return self._mask(left / right, _value(right) == 0)
+
+    def _ln(self, u):
+        invalid = _value(u) <= 0
+        result = u.log() if isinstance(u, Taylor) else np.log(u)
+        return self._mask(result, invalid)
+
+    def _check_log_base(self, base):
+        # 非法底数由 _ln 与除法的掩码处理（ln(1) = 0 作除数）
+        pass
+
+def taylor_coefficients(node, x0, order):
+    """
+    计算 f 在 x0 处的泰勒系数 c_0..c_N（c_k = f⁽ᵏ⁾(x0) / k!）
+    x0 为数时返回长度 N+1 的数组，出错时抛出异常；
+    x0 为数组时返回形状 (N+1,) + x0.shape 的数组，无定义处为 NaN
+    """
+    if np.ndim(x0) == 0:
+        result = TaylorEvaluator(float(x0), order).evaluate(node)
+        shape = ()
+        if isinstance(result, Taylor) and not np.all(np.isfinite(result.coeffs)):
+            raise Exception("函数在该点处无法展开为泰勒级数")
+    else:
+        x0 = np.asarray(x0, dtype=float)
+        result = VectorTaylorEvaluator(x0, order).evaluate(node)
+        shape = x0.shape
+    if isinstance(result, Taylor):
+        coeffs = np.array(np.broadcast_to(result.coeffs, (order + 1,) + shape), dtype=float)
+    else:
+        coeffs = np.array(Taylor.constant(result, order, shape).coeffs, dtype=float)
+    if shape:
+        coeffs[:, ~np.all(np.isfinite(coeffs), axis=0)] = np.nan
+    return coeffs
+
+def derivatives_at(node, x0, order):
+    """f 在 x0 处的 0..N 阶导数 f⁽ᵏ⁾(x0) = k!·c_k"""
+    coeffs = taylor_coefficients(node, x0, order)
+    factorials = np.array([math.factorial(k) for k in range(order + 1)], dtype=float)
+    return coeffs * factorials.reshape((order + 1,) + (1,) * (coeffs.ndim - 1))
+
+def evaluate_taylor_polynomial(coeffs, x0, x_values):
+    """用秦九韶（Horner）法计算泰勒多项式 Σ c_k·(x - x0)^k"""
+    t = np.asarray(x_values, dtype=float) - x0
+    result = np.zeros_like(t)
+    for c in coeffs[::-1]:
+        result = result * t + c
+    return result
+
+def format_taylor_polynomial(coeffs, x0):
+    """泰勒多项式的可读字符串，如 1 + 2 * (x - 1) + (x - 1)^2"""
+    if x0 == 0:
+        shift = "x"
+    else:
+        shift = f"(x - {format_result(x0)})" if x0 > 0 else f"(x + {format_result(-x0)})"
+
+    parts = []
+    for k, c in enumerate(coeffs):
+        if abs(c) < 1e-12:
+            continue
+        sign = '-' if c < 0 else '+'
+        magnitude = format_result(abs(c))
+        if k == 0:
+            term = magnitude
+        else:
+            power = shift if k == 1 else f"{shift}^{k}"
+            term = power if magnitude == '1' else f"{magnitude} * {power}"
+        parts.append((sign, term))
+
+    if not parts:
+        return "0"
+    first_sign, first_term = parts[0]
+    text = f"-{first_term}" if first_sign == '-' else first_term
+    for sign, term in parts[1:]:
+        text += f" {sign} {term}"
+    return text
@@ -2,10 +2,35 @@
 测试脚本：验证计算器核心功能
 """
 import math
-from lexer import Lexer
-from parser import Parser
-from evaluator import Evaluator, format_result
-from derivative import Derivative, ast_to_string
+import pickle
+import numpy as np
+from lexer import Lexer, TokenType
+from parser import Parser, BinaryOpNode, VariableNode, NumberNode
+from evaluator import (Evaluator, format_result, format_results, best_rational,
+                       evaluate_vectorized, partial_evaluate)
+from derivative import Derivative, ast_to_string, format_with_bindings, shared_subexpressions
+from compiler import compile_ast
+from simplifier import simplify, count_nodes
+from autodiff import value_and_derivative, evaluate_dual_vectorized
+from taylor import derivatives_at, taylor_coefficients, format_taylor_polynomial
+from sampler import adaptive_sample, TileCache
+import io
+import sys
+import cli
+from expression_cache import ExpressionCache, DerivativeCache, normalize
+import gc
+import re
+import os
+import shutil
+import tempfile
+from traversal import postorder, variables, depends_on
+from polynomial import PolynomialNode, as_polynomial, horner, estrin, multiply_power
+from value_table import ValueTable, x_range, parse_x_values
+from interval import evaluate_interval, interval_function
+from disk_cache import DiskCache, ast_digest, CACHE_VERSION, APP_DIR, MARKER
+from bytecode import Bytecode, compile_bytecode, STORE, LOAD
+from integration import integrate, quad, tanh_sinh, parse_interval
+from solver import analyze, find_zeros, dual_function
 
 def test_expression(expr, x_value=None):
     """测试表达式解析和计算"""
@@ -36,12 +61,816 @@ def test_expression(expr, x_value=None):
         derivative_ast = Derivative.differentiate(ast)
         derivative_str = ast_to_string(derivative_ast)
         print(f"导函数: f'(x) = {derivative_str}")
+        print(f"化简后: f'(x) = {ast_to_string(simplify(derivative_ast))}")
         
         print("✅ 测试通过")
         
     except Exception as e:
         print(f"❌ 错误: {str(e)}")
 
+def parse(expr):
+    """解析表达式为 AST"""
+    return Parser(Lexer(expr).tokenize()).parse()
+
+def scalar_values(ast, x_values):
+    """逐点标量求值，无效点记为 NaN"""
+    result = []
+    for x in x_values:
+        try:
+            y = Evaluator(x_value=x).evaluate(ast)
+            result.append(float(y) if isinstance(y, (int, float)) and math.isfinite(y) else math.nan)
+        except Exception:
+            result.append(math.nan)
+    return np.array(result)
+
+def test_lexer():
+    """紧凑 Token 序列与惰性模式结果一致，错误信息带位置"""
+    expr = "log(2, x) + 3.5*π - sin(x)^2"
+    tokens = Lexer(expr).tokenize()
+    lazy = list(Lexer(expr).iter_tokens())
+    assert [(t.type, t.value, t.pos) for t in tokens] == [(t.type, t.value, t.pos) for t in lazy]
+    assert tokens[-1].type == TokenType.EOF and tokens[-1].pos == len(expr.replace(' ', ''))
+    assert [t.value for t in tokens[:6]] == [None, None, 2.0, None, 'x', None]
+    assert Parser(Lexer(expr).iter_tokens()).parse() is parse(expr)
+    
+    for bad, message in [("x + tan(x)", "未知标识符: tan at position 5"),
+                         ("2 * x # 1", "无效字符: # at position 3"),
+                         ("1.2.3 + x", "无效数字: 1.2.3 at position 0")]:
+        for tokenize in (lambda: Lexer(bad).tokenize(), lambda: list(Lexer(bad).iter_tokens())):
+            try:
+                tokenize()
+                assert False, f"应当报错: {bad}"
+            except Exception as e:
+                assert str(e) == message, str(e)
+    try:
+        parse("sin(x")
+        assert False, "应当报错"
+    except Exception as e:
+        assert "position 5" in str(e)
+    
+    # 长表达式：Token 数与位置
+    big = " + ".join(f"sin({i}.5*x^2)" for i in range(500))
+    tokens = Lexer(big).tokenize()
+    assert len(tokens) == 500 * 9 - 1 + 1 and tokens[-1].pos == len(big.replace(' ', ''))
+    print("✅ 词法分析器测试通过")
+
+def test_parser():
+    """运算优先级与结合性；深层嵌套不受递归深度限制"""
+    cases = [
+        ("2^3^2", "BinOp(Number(2.0) TokenType.POWER BinOp(Number(3.0) TokenType.POWER Number(2.0)))"),
+        ("8 - 3 - 2", "BinOp(BinOp(Number(8.0) TokenType.MINUS Number(3.0)) TokenType.MINUS Number(2.0))"),
+        ("-x^2", "BinOp(UnaryOp(TokenType.MINUS Var(x)) TokenType.POWER Number(2.0))"),
+        ("2 * -x + +1", "BinOp(BinOp(Number(2.0) TokenType.MULTIPLY UnaryOp(TokenType.MINUS Var(x))) TokenType.PLUS Number(1.0))"),
+        ("log(2, x/2)", "Func(TokenType.LOG, [Number(2.0), BinOp(Var(x) TokenType.DIVIDE Number(2.0))])"),
+    ]
+    for expr, expected in cases:
+        assert repr(parse(expr)) == expected, expr
+    
+    for bad, message in [("(x + 1", "缺少右括号"), ("sin 2", "函数调用缺少左括号"),
+                         ("log(2, x", "函数调用缺少右括号"), ("2 * ", "无效的因子")]:
+        try:
+            parse(bad)
+            assert False, f"应当报错: {bad}"
+        except Exception as e:
+            assert str(e).startswith(message), str(e)
+    
+    depth = 5000
+    assert parse("(" * depth + "x" + ")" * depth) is parse("x")
+    node = parse("x^" * depth + "x")
+    for _ in range(depth):
+        assert node.left is parse("x")
+        node = node.right
+    assert node is parse("x")
+    node = parse("sin(" * depth + "x" + ")" * depth)
+    for _ in range(depth):
+        node = node.args[0]
+    assert node is parse("x")
+    print("✅ 语法分析器测试通过")
+
+def test_vector_evaluator():
+    """向量化求值与逐点求值结果一致，定义域错误记为 NaN"""
+    x_values = np.linspace(-5, 5, 101)
+    for expr in ["x^2 + sin(x)", "2^x", "log(x)", "1/x", "log(2, x)", "x^3 + 2*x^2 - 5*x + 1", "pi"]:
+        ast = parse(expr)
+        expected = scalar_values(ast, x_values)
+        actual = evaluate_vectorized(ast, x_values)
+        assert actual.shape == x_values.shape, expr
+        assert np.allclose(actual, expected, equal_nan=True), expr
+
+    # pow(1, nan) 与 pow(nan, 0) 为 1：各求值引擎在无定义处仍与逐点求值一样记为 NaN
+    for expr in ["log(x)^0", "1^(1/0)"]:
+        ast = parse(expr)
+        expected = scalar_values(ast, [-1.0, 1.0])
+        assert np.allclose(evaluate_vectorized(ast, [-1.0, 1.0]), expected, equal_nan=True), expr
+        assert np.allclose(Bytecode.from_ast(ast).evaluate_vector(np.array([-1.0, 1.0])), expected,
+                           equal_nan=True), expr
+        assert np.allclose(evaluate_dual_vectorized(ast, [-1.0, 1.0])[0], expected, equal_nan=True), expr
+    print("✅ 向量化求值测试通过")
+
+def test_compiler():
+    """编译后的函数与树遍历求值结果一致，错误同样抛出异常"""
+    x_values = np.linspace(-5, 5, 101)
+    for expr in ["x^2 + sin(x)", "2^x", "log(x)", "1/x", "log(2, x)", "-x^3 + 2*x^2 - 5*x + 1", "e*pi"]:
+        ast = parse(expr)
+        func = compile_ast(ast)
+        expected = scalar_values(ast, x_values)
+        actual = []
+        for x in x_values:
+            try:
+                actual.append(func(float(x)))
+            except Exception:
+                actual.append(math.nan)
+        assert np.allclose(actual, expected, equal_nan=True), expr
+    print("✅ 编译求值测试通过")
+
+def test_simplifier():
+    """化简结果与原导数数值一致，高阶导数节点数不再指数增长"""
+    assert ast_to_string(simplify(Derivative.differentiate(parse("x^3 + 2*x^2 - 5*x + 1")))) == "3 * x^2 + 4 * x - 5"
+    assert ast_to_string(simplify(Derivative.differentiate(parse("x^2")))) == "2 * x"
+    assert ast_to_string(simplify(Derivative.differentiate(parse("sin(x) + cos(x)")))) == "cos(x) - sin(x)"
+    
+    x_values = np.linspace(0.1, 3, 31)
+    for expr in ["sin(x^2)", "x*sin(x)", "x^x", "1/x", "log(2, x) * x^3"]:
+        raw = simplified = parse(expr)
+        counts = []
+        for order in range(4):
+            raw = Derivative.differentiate(raw)
+            simplified = simplify(Derivative.differentiate(simplified))
+            assert np.allclose(scalar_values(simplified, x_values), scalar_values(raw, x_values),
+                               equal_nan=True), expr
+            counts.append((count_nodes(raw), count_nodes(simplified)))
+        assert counts[-1][1] * 5 < counts[-1][0], expr
+        print(f"{expr} 各阶导数节点数 (化简前, 化简后): {counts}")
+    print("✅ 化简测试通过")
+
+def test_hash_consing():
+    """结构相同的节点是同一个对象，节点不可修改，序列化后仍保持一致化"""
+    ast = parse("sin(x^2) + x^2")
+    assert ast.left.args[0] is ast.right
+    assert parse("x^2 + 1") is parse("x ^ 2 + 1")
+    assert pickle.loads(pickle.dumps(ast)) is ast
+    assert NumberNode(2) is not NumberNode(2.0)
+    # 0.0 与 -0.0 相等但符号不同，不能合并为同一节点
+    zero, negative_zero = NumberNode(0.0), NumberNode(-0.0)
+    assert zero is not negative_zero and math.copysign(1.0, negative_zero.value) == -1.0
+    assert NumberNode(-0.0) is negative_zero and NumberNode(0.0) is zero
+    node = BinaryOpNode(VariableNode('x'), TokenType.POWER, NumberNode(2.0))
+    assert node is ast.right and not hasattr(node, '__dict__')
+    try:
+        node.left = NumberNode(1.0)
+        assert False, "节点应不可修改"
+    except AttributeError:
+        pass
+    print("✅ 节点一致化测试通过")
+
+def test_traversal():
+    """显式栈遍历：极深的语法树不会超出递归深度，共享子树只处理一次"""
+    depth = 5000
+    deep = VariableNode('x')
+    for _ in range(depth):
+        deep = BinaryOpNode(deep, TokenType.PLUS, NumberNode(1.0))
+    assert Evaluator(0.5).evaluate(deep) == 0.5 + depth
+    assert evaluate_vectorized(deep, [0.0, 1.0]).tolist() == [depth, depth + 1.0]
+    assert Evaluator(1.0).evaluate(Derivative.differentiate(deep)) == 1
+    assert ast_to_string(deep).count('+') == depth
+    assert count_nodes(deep) == 2 * depth + 1
+    assert ast_to_string(simplify(deep)) == f"x + {depth}"
+    assert compile_ast(deep)(0.5) == 0.5 + depth
+
+    # 编译与化简：深层嵌套的函数调用（闭包过深时改用字节码虚拟机求值）
+    nested = parse("sin(" * depth + "x" + ")" * depth)
+    assert simplify(nested) is nested
+    assert compile_ast(nested)(1.0) == Evaluator(1.0).evaluate(nested)
+    assert ast_to_string(simplify(Derivative.differentiate(deep))) == "1"
+
+    # x^x^...^x：子树被共享，求导为线性时间
+    tower = VariableNode('x')
+    for _ in range(30):
+        tower = BinaryOpNode(VariableNode('x'), TokenType.POWER, tower)
+    Derivative.differentiate(tower)
+    visited = []
+    postorder(parse("x*x + x*x"), lambda node, results: visited.append(node))
+    assert len(visited) == 3
+
+    ast = parse("sin(2) * x + 3")
+    assert variables(ast) == {'x'} and variables(ast.left.left) == frozenset()
+    assert depends_on(ast) and not depends_on(ast.left.left)
+    assert ast._variables is not None
+    print("✅ 显式栈遍历测试通过")
+
+def test_partial_evaluation():
+    """部分求值：常数子树折叠，log(a, f) 的底数外提，出错的常数子树保持原样"""
+    ast = parse("sin(x) * log(2, 10) + cos(pi/3)")
+    folded = partial_evaluate(ast)
+    assert folded is partial_evaluate(ast) and ast._folded is folded
+    assert count_nodes(folded) == 6
+    assert folded.right is NumberNode(math.cos(math.pi / 3))
+    assert math.isclose(folded.left.right.value, math.log(10, 2))
+
+    hoisted = partial_evaluate(parse("log(2, x)"))
+    assert isinstance(hoisted, BinaryOpNode) and hoisted.op == TokenType.MULTIPLY
+    assert hoisted.right is NumberNode(1 / math.log(2))
+    assert math.isclose(Evaluator(8).evaluate(parse("log(2, x)")), 3)
+    assert math.isclose(compile_ast(parse("log(2, x)"))(8), 3)
+
+    # 没有可折叠的子树时返回原节点
+    assert partial_evaluate(parse("sin(x) * x")) is parse("sin(x) * x")
+    # 会出错的常数子树不折叠，错误仍在求值时报告
+    assert partial_evaluate(parse("x + 1/0")) is parse("x + 1/0")
+    for expr, message in [("x + 1/0", "除数不能为零"), ("log(1, x)", "对数底数"), ("x * log(-1)", "对数函数参数")]:
+        try:
+            Evaluator(1).evaluate(parse(expr))
+            assert False, f"{expr} 应该报错"
+        except Exception as e:
+            assert message in str(e)
+    assert np.isnan(evaluate_vectorized(parse("x + log(0)"), [1.0, 2.0])).all()
+    print("✅ 部分求值测试通过")
+
+def test_polynomial():
+    """多项式识别、秦九韶法与 Estrin 法求值、系数求导"""
+    ast = parse("x^3 + 2*x^2 - 5*x + 1")
+    terms = as_polynomial(ast).coefficients()
+    assert terms == ((3, 1.0), (2, 2.0), (1, -5.0), (0, 1.0))
+    assert horner(terms, 2.0) == 7.0
+    assert estrin(terms, np.array([2.0, -1.0])).tolist() == [7.0, 7.0]
+    assert estrin(((60, 1.0), (0, 1.0)), np.array([1.0, -1.0])).tolist() == [2.0, 2.0]
+    assert multiply_power(3, 7) == 3 ** 7
+    assert as_polynomial(parse("x^2/4 - x*x^3")).coefficients() == ((4, -1.0), (2, 0.25))
+    # 不展开多项式的乘积与幂，不识别负数次幂
+    for expr in ["(x+1)*(x-1)", "(x+1)^2", "x^-1", "x^0.5", "sin(x)*x"]:
+        assert as_polynomial(parse(expr)) is None, expr
+
+    # 部分求值后为多项式节点，各种求值方式结果一致
+    assert isinstance(partial_evaluate(ast), PolynomialNode)
+    x_values = np.linspace(-3, 3, 13)
+    for expr in ["x^3 + 2*x^2 - 5*x + 1", "x^10 - x^7/3 + 1", "sin(x)^3 + x^4", "(x+1)*(x-1)", "x^0"]:
+        ast = parse(expr)
+        expected = scalar_values(ast, x_values)
+        assert np.allclose(evaluate_vectorized(ast, x_values), expected), expr
+        assert np.allclose([compile_ast(ast)(x) for x in x_values], expected), expr
+        value, slope = value_and_derivative(ast, 1.5)
+        assert math.isclose(slope, Evaluator(1.5).evaluate(simplify(Derivative.differentiate(ast)))), expr
+
+    # 多项式的导数直接由系数得到
+    assert ast_to_string(Derivative.differentiate(parse("x^3 + 2*x^2 - 5*x + 1"))) == "3 * x^2 + 4 * x - 5"
+    assert ast_to_string(Derivative.differentiate(parse("x^4/2 - 3"))) == "2 * x^3"
+    assert ast_to_string(Derivative.differentiate(parse("sin(x^2)"))) == "cos(x^2) * 2 * x"
+    print("✅ 多项式测试通过")
+
+def test_autodiff():
+    """对偶数单遍求值得到的导数与符号求导一致"""
+    x_values = np.linspace(0.1, 3, 30)
+    for expr in ["x^2 + sin(x)", "2^x", "log(x)", "1/x", "log(2, x)", "x^x", "sin(x^2) * cos(x) / x", "pi"]:
+        ast = parse(expr)
+        expected = scalar_values(Derivative.differentiate(ast), x_values)
+        y, dy = evaluate_dual_vectorized(ast, x_values)
+        assert np.allclose(y, scalar_values(ast, x_values), equal_nan=True), expr
+        assert np.allclose(dy, expected, equal_nan=True), expr
+        for x, d in zip(x_values, expected):
+            assert math.isclose(value_and_derivative(ast, float(x))[1], d, rel_tol=1e-9, abs_tol=1e-12), expr
+    
+    # 定义域外：标量模式抛异常，数组模式为 NaN
+    y, dy = evaluate_dual_vectorized(parse("log(x)"), np.array([-1.0, 0.0, 1.0]))
+    assert np.isnan(dy[:2]).all() and dy[2] == 1
+    try:
+        value_and_derivative(parse("log(x)"), -1.0)
+        assert False, "应抛出异常"
+    except Exception as e:
+        assert "对数" in str(e)
+
+    # 除数为常数零或折叠为零的多项式：数组模式为 NaN，不抛出 ZeroDivisionError
+    for expr in ["x + 1/0", "x*(1/(1-1))", "x/(x-x) + x"]:
+        y, dy = evaluate_dual_vectorized(parse(expr), np.array([-1.0, 0.0, 2.0]))
+        assert np.isnan(y).all() and np.isnan(dy).all(), expr
+    assert len(analyze(parse("x/(x-x) + x"), (-3, 3)).roots) == 0
+
+    # 0 处导数无界时为 NaN；0 的负数次幂给出中文错误信息
+    value, slope = value_and_derivative(parse("x^0.5"), 0.0)
+    assert value == 0 and math.isnan(slope)
+    try:
+        value_and_derivative(parse("x^(-1)"), 0.0)
+        assert False, "应抛出异常"
+    except Exception as e:
+        assert not isinstance(e, ZeroDivisionError) and "负数次幂" in str(e)
+    print("✅ 自动微分测试通过")
+
+def test_taylor():
+    """泰勒级数单遍得到的各阶导数与逐阶符号求导一致"""
+    order = 5
+    x0_values = np.array([0.7, 1.9])
+    for expr in ["x^2 + sin(x)", "2^x", "log(x)", "1/x", "log(2, x)", "x^x", "sin(x^2) * cos(x) / x", "x^3"]:
+        ast = parse(expr)
+        expected = []
+        symbolic = ast
+        for k in range(order + 1):
+            expected.append(scalar_values(symbolic, x0_values))
+            symbolic = simplify(Derivative.differentiate(symbolic))
+        assert np.allclose(derivatives_at(ast, x0_values, order), expected, rtol=1e-8), expr
+        for i, x0 in enumerate(x0_values):
+            assert np.allclose(derivatives_at(ast, x0, order), np.array(expected)[:, i], rtol=1e-8), expr
+    
+    assert format_taylor_polynomial(taylor_coefficients(parse("sin(x)"), 0, 3), 0) == "x - 1/6 * x^3"
+    assert np.isnan(derivatives_at(parse("log(x)"), np.array([-1.0, 1.0]), 2)[:, 0]).all()
+    print("✅ 泰勒展开测试通过")
+
+def test_adaptive_sampling():
+    """平缓处少采样、弯曲处多采样，渐近线处断开"""
+    sample = lambda expr, x_range: adaptive_sample(lambda x: evaluate_vectorized(parse(expr), x), x_range, 1000)
+    
+    x, y = sample("2*x + 1", (-10, 10))
+    assert len(x) < 100 and np.allclose(y, 2 * x + 1)
+    
+    x, y = sample("sin(x)", (-10, 10))
+    assert len(x) <= 1000
+    dense = np.linspace(-10, 10, 100001)
+    assert np.max(np.abs(np.interp(dense, x, y) - np.sin(dense))) < 0.01
+    
+    # 1/x 在 0 两侧之间必须断开，不能连成竖线
+    x, y = sample("1/x", (-10, 9))
+    finite = np.isfinite(y)
+    for i in range(len(x) - 1):
+        if finite[i] and finite[i + 1]:
+            assert not (x[i] < 0 < x[i + 1]), "渐近线处未断开"
+    print("✅ 自适应采样测试通过")
+
+def test_tile_cache():
+    """平移回已采样的区域时不再求值，缩放后按新视图的密度采样"""
+    ast = parse("sin(1/x)")
+    calls = []
+    def func(x):
+        calls.append(len(x))
+        return evaluate_vectorized(ast, x)
+    
+    cache = TileCache()
+    x, y = cache.sample(ast, func, (-1, 1), 800)
+    assert x[0] <= -1 and x[-1] >= 1 and np.all(np.diff(x) >= 0)
+    first = len(calls)
+    
+    cache.sample(ast, func, (0, 2), 800)
+    assert len(calls) > first
+    panned = len(calls)
+    cache.sample(ast, func, (-1, 1), 800)
+    assert len(calls) == panned, "平移回原区域应命中缓存"
+    
+    # 放大后采样更密
+    x_zoom, _ = cache.sample(ast, func, (0.01, 0.02), 800)
+    assert np.count_nonzero((x_zoom >= 0.01) & (x_zoom <= 0.02)) > np.count_nonzero((x >= 0.01) & (x <= 0.02))
+    print("✅ 分块缓存测试通过")
+
+def test_sampling_progress():
+    """采样进度单调递增到 1；回调抛出异常可中止采样且不留下半成品缓存"""
+    ast = parse("sin(1/x)")
+    func = lambda x: evaluate_vectorized(ast, x)
+    progress = []
+    cache = TileCache()
+    cache.sample(ast, func, (-1, 1), 800, callback=progress.append)
+    assert progress and progress[-1] == 1 and all(0 <= p <= 1 for p in progress)
+    assert progress == sorted(progress)
+    
+    class Stop(Exception):
+        pass
+    def stop(fraction):
+        raise Stop()
+    cache = TileCache()
+    try:
+        cache.sample(ast, func, (-1, 1), 800, callback=stop)
+        assert False, "应当中止采样"
+    except Stop:
+        pass
+    assert len(cache._tiles) == 0
+    print("✅ 采样进度与取消测试通过")
+
+def test_expression_cache():
+    """规范化后相同的表达式共用缓存条目；解析错误同样缓存；超出容量淘汰最久未用的条目"""
+    assert normalize(" 2 * π +  sin( x ) ") == "2*pi+sin(x)"
+    assert normalize("2 3") == "23"
+    assert [normalize(text) for text in ["xπ", "2π", "πx", "ππ", "x π"]] == ["x*pi", "2*pi", "pi*x", "pi*pi", "x*pi"]
+    assert ExpressionCache().parse("sin(πx)") is parse("sin(pi*x)")
+    
+    cache = ExpressionCache(max_entries=2)
+    entry = cache.entry("x^2 + π")
+    assert cache.entry("x^2+pi") is entry
+    assert cache.parse(" x ^ 2 + pi ") is parse("x^2 + pi")
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert entry.compiled(2) == 4 + math.pi
+    assert ast_to_string(entry.derivative) == "2 * x"
+    
+    for _ in range(2):
+        try:
+            cache.entry("sin(")
+            assert False, "应当抛出解析错误"
+        except Exception:
+            pass
+    assert cache.misses == 2
+    
+    cache.entry("cos(x)")
+    assert len(cache) == 2 and cache.entry("x^2+pi") is not entry, "最久未用的条目应被淘汰"
+    cache.invalidate("cos(x)")
+    cache.entry("cos(x)")
+    assert cache.stats()['misses'] == 5
+    print("✅ 表达式缓存测试通过")
+
+def test_derivative_cache():
+    """导函数缓存：逐阶复用，LRU 淘汰，原函数回收后条目失效"""
+    cache = DerivativeCache(max_entries=8)
+    ast = parse("x^3 + 17*x")
+    assert [ast_to_string(cache.derivative(ast, order=k)) for k in (1, 2, 3)] == ["3 * x^2 + 17", "6 * x", "6"]
+    assert cache.stats()['misses'] == 3 and len(cache) == 3
+    assert cache.derivative(ast, order=2) is cache.derivative(parse("x^3+17*x"), order=2)
+    assert cache.hits == 2
+    assert cache.derivative(ast, order=0) is ast
+    # 已知 3 阶，5 阶只需再求两阶
+    cache.derivative(ast, order=5)
+    assert len(cache) == 5
+
+    functions = [parse(f"sin(x) * {k}") for k in range(10)]
+    for function in functions:
+        cache.derivative(function)
+    assert len(cache) == 8
+
+    cache.clear()
+    function = parse("x^4 + 23*x")
+    cache.derivative(function, order=2)
+    assert len(cache) == 2
+    del function, functions
+    gc.collect()
+    assert len(cache) == 0
+
+    out = io.StringIO()
+    stdin = sys.stdin
+    try:
+        sys.stdin = io.StringIO("x^3\nsin(x)\n")
+        args = cli.build_parser().parse_args(['diff', '--order', '2'])
+        cli.process(args, out)
+    finally:
+        sys.stdin = stdin
+    assert out.getvalue().splitlines()[1:] == ["x^3,6 * x,", "sin(x),-(sin(x)),"]
+    print("✅ 导函数缓存测试通过")
+
+def test_printer():
+    """打印：深层嵌套不递归，重复子式以中间变量输出一次，超长输出省略"""
+    deep = parse("sin(" * 3000 + "x" + ")" * 3000)
+    assert ast_to_string(deep) == "sin(" * 3000 + "x" + ")" * 3000
+    assert ast_to_string(parse("-(x+1)*(x-2)/(x^2)")) == "-(x + 1) * (x - 2) / (x^2)"
+    assert ast_to_string(deep, max_length=20) == "sin(" * 5 + "…"
+
+    # 没有重复子式时与 ast_to_string 一致
+    assert format_with_bindings(parse("2*x + sin(x)"), "f'(x)") == "f'(x) = 2 * x + sin(x)"
+
+    # x^x 的 3 阶导数：x^x 与 ln(x) 的导数等子式大量重复
+    derivative = parse("x^x")
+    for _ in range(3):
+        derivative = Derivative.differentiate(derivative)
+    shared = shared_subexpressions(derivative)
+    assert shared and all(count_nodes(node) >= 4 for node in shared)
+    text = format_with_bindings(derivative, "f3(x)")
+    lines = text.splitlines()
+    assert lines[0].startswith("u1 = ") and lines[-1].startswith("f3(x) = ")
+    assert len(text) < len(ast_to_string(derivative)) / 1.5
+
+    # 代回中间变量后与原导函数的值相同
+    definitions = {}
+    substitute = lambda body: re.sub(r"u\d+", lambda m: f"({definitions[m.group()]})", body)
+    for line in lines[:-1]:
+        name, body = line.split(" = ", 1)
+        definitions[name] = substitute(body)
+    expanded = substitute(lines[-1].split(" = ", 1)[1]).replace("ln(", "log(")
+    expected = Evaluator(x_value=1.3).evaluate(derivative)
+    assert math.isclose(Evaluator(x_value=1.3).evaluate(parse(expanded)), expected, rel_tol=1e-12)
+
+    elided = format_with_bindings(derivative, "f3(x)", max_length=100)
+    assert elided.endswith("…（输出过长，已省略）") and len(elided) < 150
+    print("✅ 打印测试通过")
+
+def test_format_result():
+    """结果格式化：连分数识别分数、π 与 e 的分数倍、平方根；向量化版本结果相同"""
+    cases = [
+        (3.0, "3"), (-0.75, "-3/4"), (2 / 7, "2/7"), (math.pi, "π"), (-2 * math.pi, "-2π"),
+        (3 * math.pi / 4, "3π/4"), (-math.pi / 2, "-π/2"), (math.e / 3, "e/3"),
+        (math.sqrt(2) / 2, "√2/2"), (-3 * math.sqrt(2) / 2, "-3√2/2"), (math.sqrt(2 / 3), "√6/3"),
+        (1 / 120, "0.0083"), (0.1234567, "0.1235"), (1e20, "100000000000000000000"), (math.nan, "nan"),
+    ]
+    for value, expected in cases:
+        assert format_result(value) == expected, (value, format_result(value))
+    assert best_rational(0.3) == (3, 10) and best_rational(math.pi) is None
+    assert best_rational(1 / 101) is None and best_rational(1 / 101, max_denominator=101) == (1, 101)
+
+    values = [value for value, _ in cases] + list(np.linspace(-5, 5, 1001)) + [math.inf, -math.inf]
+    assert format_results(values) == [format_result(v) for v in values]
+    assert format_results(np.array([])) == []
+    print("✅ 结果格式化测试通过")
+
+def test_value_table():
+    """函数值表：范围与列表输入，一次向量化求值（含导数），导出 CSV 与 NPY"""
+    assert parse_x_values("-1:1:0.5").tolist() == [-1.0, -0.5, 0.0, 0.5, 1.0]
+    assert parse_x_values("0 : pi : pi/2").tolist() == [0.0, math.pi / 2, math.pi]
+    assert parse_x_values("1, log(2, 8), -pi").tolist() == [1.0, 3.0, -math.pi]
+    assert len(x_range(0, 1, 1e-6)) == 1000001
+    for bad, message in [("0:1:0", "步长必须大于 0"), ("1:2", "范围格式"), ("0:1:0.00000001", "点数过多")]:
+        try:
+            parse_x_values(bad)
+            assert False, f"应当报错: {bad}"
+        except Exception as e:
+            assert str(e).startswith(message), str(e)
+
+    table = ValueTable.compute(parse("1/x"), parse_x_values("-1:1:0.5"), derivative=True)
+    assert table.columns == ['x', 'value', 'derivative'] and len(table) == 5
+    assert np.isnan(table.values[2]) and table.derivatives[3] == -4.0
+    constant = ValueTable.compute(parse("pi"), np.arange(3.0))
+    assert constant.values.shape == (3,) and constant.to_array().shape == (3, 2)
+
+    directory = tempfile.mkdtemp()
+    try:
+        table.save_csv(os.path.join(directory, "table.csv"))
+        with open(os.path.join(directory, "table.csv"), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        assert lines[0] == "x,value,derivative" and lines[3] == "0.0,," and lines[4] == "0.5,2.0,-4.0"
+        table.save_npy(os.path.join(directory, "table.npy"))
+        assert np.array_equal(np.load(os.path.join(directory, "table.npy")), table.to_array(), equal_nan=True)
+    finally:
+        shutil.rmtree(directory)
+    print("✅ 函数值表测试通过")
+
+def test_solver():
+    """求根：变号区间批量牛顿迭代，极值点、拐点、重根，间断点不算作根"""
+    features = analyze(parse("x^3 - 3*x"), (-5, 5))
+    assert np.allclose(features.roots, [-math.sqrt(3), 0, math.sqrt(3)], atol=1e-12)
+    assert np.allclose(features.minima, [1]) and np.allclose(features.maxima, [-1])
+    assert np.allclose(features.inflections, [0], atol=1e-12)
+
+    # sin(x^2) 在 (0, 30) 上的根为 √(kπ)，k = 1..286
+    roots, increasing = find_zeros(dual_function(parse("sin(x^2)")), (0, 30))
+    assert len(roots) == 286
+    assert np.allclose(roots, np.sqrt(np.arange(1, 287) * math.pi), rtol=1e-14)
+    assert increasing.tolist() == [k % 2 == 0 for k in range(1, 287)]
+
+    # 重根（不变号）由极值点补上；1/x、ln 的定义域边界不是根
+    assert np.allclose(analyze(parse("(x - 1)^2"), (-3, 3)).roots, [1])
+    assert len(analyze(parse("1/x"), (-1, 1)).roots) == 0
+    features = analyze(parse("x * log(x)"), (-1, 3))
+    assert np.allclose(features.roots, [1]) and np.allclose(features.minima, [1 / math.e])
+    print("✅ 求根测试通过")
+
+def test_interval():
+    """区间求值：包含区间内全部函数值，标记可能无定义的区间；求根与采样按区间剪枝"""
+    rng = np.random.default_rng(0)
+    for expr in ["log(x) + 1/x", "x^3 - 3*x", "sin(x) * cos(3*x)", "x^x", "(x - 2)^0.5",
+                 "log(2, x)", "1/(x - 1)^2", "e^x - x^-0.5"]:
+        ast = parse(expr)
+        lo = rng.uniform(-20, 20, 200)
+        hi = lo + rng.uniform(0, 5, 200)
+        enclosure = evaluate_interval(ast, lo, hi)
+        xs = lo[:, None] + np.linspace(0, 1, 41) * (hi - lo)[:, None]
+        ys = evaluate_vectorized(ast, xs)
+        defined = np.isfinite(ys)
+        inside = (ys >= enclosure.lo[:, None]) & (ys <= enclosure.hi[:, None])
+        assert np.all(inside | ~defined), expr
+        assert np.all(enclosure.undefined | defined.all(axis=1)), expr
+        assert not np.any(enclosure.defined_nowhere() & defined.any(axis=1)), expr
+
+    enclosure = evaluate_interval(parse("log(x) + 1/x"), [-5, -1, 1, 0], [-1, 0, 2, 1])
+    assert enclosure.defined_nowhere().tolist() == [True, True, False, False]
+    assert enclosure.undefined.tolist() == [True, True, False, True]
+    assert enclosure.contains(0.0).tolist() == [False, False, False, True]
+    enclosure = evaluate_interval(parse("sin(x)"), [0, 1], [1, 4])
+    assert enclosure.hi[1] == 1 and enclosure.lo[1] < math.sin(4) < enclosure.hi[0]
+
+    # 剪枝不改变结果：log(x) + 1/x 在 x > 0 时恒大于 0，只有含 0 的块需要求值
+    ast = parse("log(x) + 1/x")
+    evaluated = []
+    func = lambda x: (evaluated.append(len(x)), dual_function(ast)(x))[1]
+    roots, _ = find_zeros(func, (-1000, 1000), bounds=interval_function(ast))
+    assert len(roots) == 0 and sum(evaluated) < 100
+    for expr in ["sin(x^2)", "x * log(x)", "1/x"]:
+        f = dual_function(parse(expr))
+        plain = find_zeros(f, (-10, 10))
+        pruned = find_zeros(f, (-10, 10), bounds=interval_function(parse(expr)))
+        assert all(np.array_equal(p, q) for p, q in zip(plain, pruned)), expr
+
+    # 采样：处处无定义的范围不求值
+    ast = parse("log(x - 500)")
+    evaluated = []
+    func = lambda x: (evaluated.append(len(x)), evaluate_vectorized(ast, x))[1]
+    x, y = adaptive_sample(func, (-100, 100), bounds=interval_function(ast))
+    assert np.all(np.isnan(y)) and not evaluated
+
+    # 折叠为零多项式的分母：处处无定义，不抛出 ZeroDivisionError
+    for expr in ["1/(x-x)", "sin(x)/(x-x)"]:
+        ast = parse(expr)
+        assert evaluate_interval(ast, [0.0, 1.0], [1.0, 2.0]).defined_nowhere().all()
+        x, y = adaptive_sample(lambda x: evaluate_vectorized(ast, x), (-3, 3), bounds=interval_function(ast))
+        assert np.all(np.isnan(y))
+    print("✅ 区间求值测试通过")
+
+def test_integration():
+    """定积分：tanh-sinh 处理端点奇点，振荡函数改用自适应 Gauss–Kronrod，发散时报错"""
+    cases = [("x^2", 0, 1, 1 / 3), ("sin(x)", 0, math.pi, 2), ("log(x)", 0, 1, -1),
+             ("1/x^0.5", 0, 1, 2), ("x*log(x)", 0, 1, -0.25)]
+    for expr, a, b, exact in cases:
+        result = integrate(parse(expr), a, b)
+        assert result.converged and abs(result.value - exact) < 1e-10, (expr, result)
+        assert result.error < 1e-10
+
+    # 上下限颠倒时变号；区间长度为零时为 0
+    assert abs(integrate(parse("x^2"), 1, 0).value + 1 / 3) < 1e-12
+    for expr, a, b, exact in [("x^2", 1, -1, -2 / 3), ("(x-1)^2", 2, 0, -2 / 3), ("log(x)", 1, 0, 1)]:
+        result = integrate(parse(expr), a, b)
+        assert result.converged and abs(result.value - exact) < 1e-10, (expr, result)
+        assert abs(tanh_sinh(lambda x: evaluate_vectorized(parse(expr), x), a, b).value - exact) < 1e-10
+    assert integrate(parse("x^2"), 2, 2).value == 0
+
+    # ∫[0, 30] sin(x^2) dx 需要数千个节点（Fresnel 积分）
+    result = quad(lambda x: np.sin(x ** 2), 0, 30)
+    assert abs(integrate(parse("sin(x^2)"), 0, 30).value - result.value) < 1e-10
+    assert abs(result.value - 0.6255437191) < 1e-9
+
+    for expr, a, b in [("log(x)", -1, 1), ("1/x", 0, 1)]:
+        try:
+            integrate(parse(expr), a, b)
+            assert False, expr
+        except Exception as e:
+            assert "无定义或趋于无穷" in str(e)
+
+    assert parse_interval("0:pi/2") == (0, math.pi / 2)
+    try:
+        parse_interval("1")
+        assert False
+    except Exception as e:
+        assert "下限:上限" in str(e)
+    print("✅ 定积分测试通过")
+
+def test_bytecode():
+    """字节码：与 AST 往返得到同一节点，二进制格式往返，虚拟机与树遍历求值结果及错误一致"""
+    ast = parse("sin(x)^2 + sin(x)^2 * log(2, x) - 3")
+    code = Bytecode.from_ast(ast)
+    assert code.to_ast() is ast
+    assert code.slots == 1 and [word & 0xFF for word in code.code].count(LOAD) == 1  # 共享的子树只展开一次
+    assert Bytecode.from_bytes(code.to_bytes()).to_ast() is ast
+    assert pickle.loads(pickle.dumps(code)) == code
+    assert Bytecode.from_ast(NumberNode(2)).to_ast().value.__class__ is int
+
+    # 导函数、折叠后的多项式节点与参数个数不合法的函数调用同样可以往返
+    trees = [parse("sin(x, 2) + log(1, 2, x)")]
+    for expr in ["x^x", "log(2, x) * x^3 - pi", "(x+1)^3/(x-1)", "e^(-x^2)", "x^3 + 2*x^2 - 5*x + 1"]:
+        tree = parse(expr)
+        trees += [tree, partial_evaluate(tree), simplify(Derivative.differentiate(tree)),
+                  Derivative.differentiate(Derivative.differentiate(tree))]
+    assert any(isinstance(tree, PolynomialNode) for tree in trees)
+    for tree in trees:
+        assert Bytecode.from_bytes(Bytecode.from_ast(tree).to_bytes()).to_ast() is tree
+
+    # 深度很大的树不受递归深度限制
+    deep = parse("+".join(["x"] * 5000))
+    assert Bytecode.from_ast(deep).to_ast() is deep
+
+    # 共享节点超过 65535 个（暂存槽数不受 16 位限制）
+    shared = VariableNode('x')
+    for _ in range(70000):
+        shared = BinaryOpNode(shared, TokenType.PLUS, shared)
+    code = Bytecode.from_ast(shared)
+    assert code.slots > 65535 and Bytecode.from_bytes(code.to_bytes()).to_ast() is shared
+
+    x_values = np.linspace(-3, 3, 61)
+    for tree in trees[1:]:
+        code = compile_bytecode(tree)
+        assert np.allclose([_try(code.evaluate, x) for x in x_values.tolist()],
+                           scalar_values(tree, x_values.tolist()), equal_nan=True)
+        assert np.array_equal(code.evaluate_vector(x_values), evaluate_vectorized(tree, x_values), equal_nan=True)
+    for expr, x_value, message in [("1/x", 0.0, "除数不能为零"), ("log(x)", -1.0, "对数函数参数必须大于 0"),
+                                   ("log(1, x)", 2.0, "对数底数必须大于 0 且不等于 1"),
+                                   ("sin(x, 2)", 1.0, "sin 函数需要 1 个参数"), ("x", None, "变量 x 未赋值")]:
+        try:
+            compile_bytecode(parse(expr)).evaluate(x_value)
+            assert False, expr
+        except Exception as e:
+            assert str(e) == message, (expr, e)
+
+    for data in [b"", b"XXXX" + code.to_bytes()[4:], code.to_bytes()[:-1]]:
+        try:
+            Bytecode.from_bytes(data)
+            assert False
+        except Exception as e:
+            assert "字节码" in str(e)
+    print("✅ 字节码测试通过")
+
+def _try(func, x):
+    """求值，出错或结果不是有限实数时记为 NaN（与 scalar_values 相同）"""
+    try:
+        y = func(x)
+    except Exception:
+        return math.nan
+    return float(y) if isinstance(y, (int, float)) and math.isfinite(y) else math.nan
+
+def test_computation_progress():
+    """求根、定积分与函数值表：回调报告进度（0~1 递增），回调抛出异常时中止计算"""
+    class Stop(Exception):
+        pass
+    def stop(fraction):
+        raise Stop()
+    ast = parse("sin(x^2) * log(x + 20)")
+    tasks = [lambda callback: analyze(ast, (-5, 5), callback=callback),
+             lambda callback: integrate(ast, 0, 30, callback=callback),
+             lambda callback: integrate(parse("log(x)"), 0, 1, callback=callback),
+             lambda callback: ValueTable.compute(ast, np.linspace(-5, 5, 600_000), True, callback=callback)]
+    for task in tasks:
+        progress = []
+        task(progress.append)
+        assert progress and all(0 <= p <= 1 for p in progress) and progress == sorted(progress)
+        try:
+            task(stop)
+            assert False, "应当中止计算"
+        except Stop:
+            pass
+    print("✅ 计算进度与取消测试通过")
+
+def test_disk_cache():
+    """磁盘缓存：结构摘要，表达式、导函数与采样分块在新的缓存对象中命中，按容量淘汰，旧版本目录删除"""
+    directory = tempfile.mkdtemp()
+    try:
+        ast = parse("sin(x)^2 + sin(x)^2 * log(2, x) - 3")
+        assert ast_digest(ast) == ast_digest(parse("sin(x)^2+sin(x)^2*log(2,x)-3"))
+        assert ast_digest(NumberNode(2)) != ast_digest(NumberNode(2.0))
+
+        # 旧版本目录：只删除本程序子目录中带标记文件的目录，其他目录原样保留
+        app = os.path.join(directory, APP_DIR)
+        for path in [os.path.join(directory, 'v1'), os.path.join(app, 'v0'), os.path.join(app, 'v1')]:
+            os.makedirs(path)
+            with open(os.path.join(path, 'notes.txt'), 'w') as f:
+                f.write('x')
+        with open(os.path.join(app, 'v0', MARKER), 'w'):
+            pass
+        store = DiskCache(directory)
+        assert not os.path.exists(os.path.join(app, 'v0'))
+        assert os.path.isfile(os.path.join(directory, 'v1', 'notes.txt'))
+        assert os.path.isfile(os.path.join(app, 'v1', 'notes.txt'))
+        assert os.path.isdir(os.path.join(app, f'v{CACHE_VERSION}'))
+
+        # 表达式与导函数：新的缓存对象（相当于重新启动）从磁盘读取
+        ExpressionCache(store=store).parse("x^3 + x")
+        DerivativeCache(store=store).derivative(parse("x^3 + x"), order=2)
+        reopened = DiskCache(directory)
+        assert ExpressionCache(store=reopened).parse("x^3+x") is parse("x^3 + x")
+        second = DerivativeCache(store=reopened).derivative(parse("x^3 + x"), order=2)
+        assert second is simplify(Derivative.differentiate(simplify(Derivative.differentiate(parse("x^3 + x")))))
+        assert (reopened.hits, reopened.misses) == (3, 0)
+
+        # 采样分块：第二次以内存映射方式读回，不再求值
+        calls = []
+        func = lambda x: (calls.append(len(x)), np.sin(x))[1]
+        first = TileCache(store=reopened).sample('sin', func, (-3, 3), 200)
+        count = len(calls)
+        again = TileCache(store=DiskCache(directory)).sample('sin', func, (-3, 3), 200)
+        assert len(calls) == count
+        assert np.array_equal(first[0], again[0]) and np.array_equal(first[1], again[1])
+
+        # 损坏的文件视为未命中
+        path = store._path('expressions', ("x^3+x",), '.ast')
+        with open(path, 'wb') as f:
+            f.write(b'broken')
+        assert store.load_ast('expressions', ("x^3+x",)) is None and not os.path.exists(path)
+
+        # 容量上限：淘汰最久未使用的文件
+        small = DiskCache(directory, max_bytes=3000)
+        for i in range(5):
+            small.save_array('arrays', (i,), np.zeros(100))
+        assert small.size() <= 3000 and small.load_array('arrays', (4,)) is not None
+        assert small.load_array('arrays', (0,)) is None
+        small.clear()
+        assert len(small) == 0
+    finally:
+        shutil.rmtree(directory)
+    print("✅ 磁盘缓存测试通过")
+
+def test_cli():
+    """命令行批处理：逐行读取表达式，错误写入 error 列，不加载图形界面模块"""
+    stdin = sys.stdin
+    try:
+        sys.stdin = io.StringIO("x^2\n1/x\nlog(x\n")
+        out = io.StringIO()
+        args = cli.build_parser().parse_args(['eval', '-x', '0', '-x', '2', '--batch-size', '2'])
+        args.x_values = cli.read_x_values(args)
+        cli.process(args, out)
+    finally:
+        sys.stdin = stdin
+    lines = out.getvalue().splitlines()
+    assert lines[0] == "expr,x,value,error"
+    assert lines[1:5] == ["x^2,0.0,0.0,", "x^2,2.0,4.0,", "1/x,0.0,,除数不能为零", "1/x,2.0,0.5,"]
+    assert lines[5].startswith('log(x,,,"解析错误')
+
+    # 函数值表的精确形式列
+    try:
+        sys.stdin = io.StringIO("x/4\n")
+        out = io.StringIO()
+        args = cli.build_parser().parse_args(['table', '--start', '0', '--stop', '2', '--step', '1', '--exact'])
+        args.x_values = cli.table_x_values(args)
+        cli.process(args, out)
+    finally:
+        sys.stdin = stdin
+    assert out.getvalue().splitlines() == ["expr,x,value,exact,error", "x/4,0.0,0.0,0,",
+                                           "x/4,1.0,0.25,1/4,", "x/4,2.0,0.5,1/2,"]
+    assert not any(name.startswith(('PyQt5', 'matplotlib')) for name in sys.modules)
+    print("✅ 命令行批处理测试通过")
+
 def main():
     """运行测试"""
     print("数学函数计算器 - 核心功能测试")
@@ -61,6 +890,33 @@ def main():
     for expr, x_val in test_cases:
         test_expression(expr, x_val)
     
+    test_lexer()
+    test_parser()
+    test_vector_evaluator()
+    test_compiler()
+    test_simplifier()
+    test_hash_consing()
+    test_traversal()
+    test_partial_evaluation()
+    test_polynomial()
+    test_autodiff()
+    test_taylor()
+    test_adaptive_sampling()
+    test_tile_cache()
+    test_sampling_progress()
+    test_expression_cache()
+    test_derivative_cache()
+    test_printer()
+    test_format_result()
+    test_value_table()
+    test_solver()
+    test_interval()
+    test_integration()
+    test_computation_progress()
+    test_bytecode()
+    test_disk_cache()
+    test_cli()
+    
     print(f"\n{'='*60}")
     print("所有测试完成！")
 
@@ -0,0 +1,76 @@
+"""
+语法树遍历（Traversal）
+功能：显式栈的后序遍历框架，供求值、求导、打印等各遍共用；
+不受 Python 递归深度限制，结构相同的子树（哈希一致化后为同一节点）每遍只处理一次
+"""
+from parser import ASTNode, VariableNode
+
+def postorder(root, visit, memo=None):
+    """
+    后序遍历
+    参数：
+        root: 根节点
+        visit: visit(node, child_results)，在所有子节点处理完之后调用，返回该节点的结果
+        memo: 节点 → 结果的备忘表（支持 in、取值与赋值），默认新建；可在多次遍历间共享
+    返回：根节点的结果
+    """
+    if memo is None:
+        memo = {}
+    if root in memo:
+        return memo[root]
+
+    # 栈中的项为 (节点, 子节点)：子节点为 None 表示尚未展开，否则其子节点均已处理完毕
+    stack = [(root, None)]
+    push, pop = stack.append, stack.pop
+    while stack:
+        node, children = pop()
+        if children is not None:
+            memo[node] = visit(node, [memo[child] for child in children])
+        elif node not in memo:
+            children = node.children() if isinstance(node, ASTNode) else ()
+            if not children:
+                memo[node] = visit(node, [])
+                continue
+            push((node, children))
+            # 逆序入栈，保证子节点按从左到右的顺序处理
+            for child in reversed(children):
+                if child not in memo:
+                    push((child, None))
+    return memo[root]
+
+class _VariablesMemo:
+    """以节点自身的 _variables 槽作为备忘表：计算一次后所有遍历共享"""
+    def __contains__(self, node):
+        return getattr(node, '_variables', None) is not None
+
+    def __getitem__(self, node):
+        return node._variables
+
+    def __setitem__(self, node, variables):
+        if isinstance(node, ASTNode):
+            object.__setattr__(node, '_variables', variables)
+
+_VARIABLES_MEMO = _VariablesMemo()
+_NO_VARIABLES = frozenset()
+
+def _collect_variables(node, child_variables):
+    """变量节点给出自身的名字，其余节点合并子节点的集合（尽量复用已有的集合对象）"""
+    if isinstance(node, VariableNode):
+        return frozenset((node.name,))
+    result = _NO_VARIABLES
+    for names in child_variables:
+        if not names <= result:
+            result = names if result <= names else result | names
+    return result
+
+def height(node):
+    """树高（叶节点为 1）"""
+    return postorder(node, lambda n, heights: 1 + max(heights, default=0))
+
+def variables(node):
+    """节点中出现的变量名集合（缓存在节点上，之后查询为 O(1)）"""
+    return postorder(node, _collect_variables, _VARIABLES_MEMO)
+
+def depends_on(node, var='x'):
+    """节点是否含有变量 var"""
+    return var in variables(node)
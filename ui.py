@@ -4,16 +4,33 @@
 """
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QGridLayout, QPushButton, QLineEdit, QTextEdit, 
-                             QLabel, QSplitter)
-from PyQt5.QtCore import Qt
+                             QLabel, QSplitter, QSpinBox, QProgressBar, QTabWidget,
+                             QTableView, QHeaderView, QCheckBox, QFileDialog)
+from PyQt5.QtCore import Qt, QThreadPool
+import numpy as np
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
 
-from lexer import Lexer
-from parser import Parser
-from evaluator import Evaluator, format_result
-from derivative import Derivative, ast_to_string
+from evaluator import format_result
+from derivative import ast_to_string, format_with_bindings
+from simplifier import count_nodes
+from expression_cache import expression_cache
+from taylor import taylor_coefficients, format_taylor_polynomial
 from plotter import FunctionPlotter
+from worker import Worker
+from value_table import ValueTable, parse_x_value, parse_x_values
+from table_model import ValueTableModel
+from solver import analyze
+from evaluator import evaluate_vectorized
+from integration import integrate, parse_interval
+
+PLOT_RANGE = (-10, 10)  # 绘图的 x 范围
+PLOT_POINTS = 1000      # 绘图采样点数上限
+OUTPUT_LENGTH = 20000   # 输出面板中导函数的最大字符数，超出部分省略
+LABEL_LENGTH = 80       # 图例中导函数的最大字符数
+FEATURES_SHOWN = 8      # 输出面板中每类特征点最多列出的个数
+AREA_POINTS = 500       # 积分区域着色的采样点数
 
 class CalculatorWindow(QMainWindow):
     """计算器主窗口"""
@@ -23,6 +40,9 @@ class CalculatorWindow(QMainWindow):
         self.current_ast = None  # 当前函数的 AST
         self.derivative_ast = None  # 导函数的 AST
         self.result_index = 0  # 结果显示索引（用于多次按 = 切换显示）
+        self.thread_pool = QThreadPool.globalInstance()
+        self.worker = None  # 正在运行的后台任务
+        self.value_table = None  # 当前的函数值表
         self.init_ui()
     
     def init_ui(self):
@@ -38,7 +58,7 @@ class CalculatorWindow(QMainWindow):
         # 左侧：输入和按钮区域
         left_panel = self.create_left_panel()
         
-        # 右侧：绘图区域
+        # 右侧：绘图与函数值表
         right_panel = self.create_right_panel()
         
         # 使用分割器
@@ -59,12 +79,13 @@ class CalculatorWindow(QMainWindow):
         layout.addWidget(QLabel("函数输入 f(x) ="))
         self.function_input = QLineEdit()
         self.function_input.setPlaceholderText("例如: x^2 + sin(x)")
+        self.function_input.textChanged.connect(self.on_input_changed)
         layout.addWidget(self.function_input)
         
         # x 值输入区
         layout.addWidget(QLabel("x 值（数值计算用）"))
         self.x_input = QLineEdit()
-        self.x_input.setPlaceholderText("例如: 3.14 或 pi")
+        self.x_input.setPlaceholderText("例如: 3.14 或 pi；函数值表: -5:5:0.5 或 1, 2, pi/2")
         layout.addWidget(self.x_input)
         
         # 输出显示区
@@ -74,6 +95,12 @@ class CalculatorWindow(QMainWindow):
         self.output_display.setMaximumHeight(150)
         layout.addWidget(self.output_display)
         
+        # 后台计算进度
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.hide()
+        layout.addWidget(self.progress_bar)
+        
         # 按钮区域
         button_grid = self.create_button_grid()
         layout.addLayout(button_grid)
@@ -147,8 +174,39 @@ class CalculatorWindow(QMainWindow):
         self.plot_deriv_btn.clicked.connect(self.plot_derivative)
         grid.addWidget(self.plot_deriv_btn, deriv_row, 2, 1, 3)
         
+        # 泰勒展开（在 x 值处展开）
+        taylor_row = 7
+        self.taylor_btn = QPushButton('泰勒展开')
+        self.taylor_btn.clicked.connect(self.taylor_expand)
+        grid.addWidget(self.taylor_btn, taylor_row, 0, 1, 2)
+        
+        grid.addWidget(QLabel('阶数'), taylor_row, 2)
+        self.taylor_order = QSpinBox()
+        self.taylor_order.setRange(1, 20)
+        self.taylor_order.setValue(5)
+        grid.addWidget(self.taylor_order, taylor_row, 3, 1, 2)
+        
+        # 函数值表（x 输入为范围或列表）
+        table_row = 8
+        self.table_btn = QPushButton('函数值表')
+        self.table_btn.clicked.connect(self.make_table)
+        grid.addWidget(self.table_btn, table_row, 0, 1, 2)
+        
+        self.table_derivative = QCheckBox('含导数')
+        grid.addWidget(self.table_derivative, table_row, 2)
+        
+        self.solve_btn = QPushButton('求根/极值')
+        self.solve_btn.clicked.connect(self.find_features)
+        grid.addWidget(self.solve_btn, table_row, 3, 1, 2)
+        
+        # 定积分（x 输入为积分区间 a:b）
+        integral_row = 9
+        self.integral_btn = QPushButton('定积分')
+        self.integral_btn.clicked.connect(self.compute_integral)
+        grid.addWidget(self.integral_btn, integral_row, 0, 1, 5)
+        
         # 光标移动按钮
-        cursor_row = 7
+        cursor_row = 10
         left_btn = QPushButton('←')
         left_btn.clicked.connect(self.move_cursor_left)
         grid.addWidget(left_btn, cursor_row, 0)
@@ -162,7 +220,7 @@ class CalculatorWindow(QMainWindow):
         grid.addWidget(backspace_btn, cursor_row, 2, 1, 3)
         
         # 版权提示
-        copyright_row = 8
+        copyright_row = 11
         copyright_label = QLabel('© 2026 数学函数计算器 - 教学版  by 张力 Zennon')
         copyright_label.setAlignment(Qt.AlignCenter)
         copyright_label.setStyleSheet("color: gray; font-size: 14px;")
@@ -170,19 +228,27 @@ class CalculatorWindow(QMainWindow):
         return grid
     
     def create_right_panel(self):
-        """创建右侧绘图面板"""
+        """创建右侧面板：函数图像与函数值表两个标签页"""
+        self.right_tabs = QTabWidget()
+        self.right_tabs.addTab(self.create_plot_panel(), "函数图像")
+        self.table_panel = self.create_table_panel()
+        self.right_tabs.addTab(self.table_panel, "函数值表")
+        return self.right_tabs
+    
+    def create_plot_panel(self):
+        """创建绘图面板"""
         panel = QWidget()
         layout = QVBoxLayout(panel)
         
-        layout.addWidget(QLabel("函数图像"))
-        
         # 创建 Matplotlib 画布
         self.figure = Figure(figsize=(8, 6))
         self.canvas = FigureCanvas(self.figure)
+        # 工具栏提供平移、缩放（缩放后曲线按新视图重新采样）
+        layout.addWidget(NavigationToolbar(self.canvas, panel))
         layout.addWidget(self.canvas)
         
-        # 初始化绘图器
-        self.plotter = FunctionPlotter(self.canvas)
+        # 初始化绘图器（采样分块与表达式缓存共用磁盘缓存）
+        self.plotter = FunctionPlotter(self.canvas, store=expression_cache.store)
         
         # 清除图像按钮
         clear_plot_btn = QPushButton('清除图像')
@@ -191,6 +257,30 @@ class CalculatorWindow(QMainWindow):
         
         return panel
     
+    def create_table_panel(self):
+        """创建函数值表面板（表格视图只绘制可见的行）"""
+        panel = QWidget()
+        layout = QVBoxLayout(panel)
+        
+        self.table_model = ValueTableModel(panel)
+        self.table_view = QTableView()
+        self.table_view.setModel(self.table_model)
+        # 固定行高：百万行时视图无需逐行测量
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.table_view)
+        
+        buttons = QHBoxLayout()
+        export_csv_btn = QPushButton('导出 CSV')
+        export_csv_btn.clicked.connect(lambda: self.export_table('csv'))
+        buttons.addWidget(export_csv_btn)
+        export_npy_btn = QPushButton('导出 NPY')
+        export_npy_btn.clicked.connect(lambda: self.export_table('npy'))
+        buttons.addWidget(export_npy_btn)
+        layout.addLayout(buttons)
+        
+        return panel
+    
     # ========== 按钮事件处理 ==========
     
     def insert_text(self, text):
@@ -241,46 +331,81 @@ class CalculatorWindow(QMainWindow):
     
     def clear_plot(self):
         """清除图像"""
+        self.cancel_task()
         self.plotter.clear()
     
+    # ========== 后台任务 ==========
+    
+    def on_input_changed(self):
+        """函数表达式被修改：取消正在进行的计算，之前的结果失效"""
+        self.cancel_task()
+        self.current_ast = None
+        self.derivative_ast = None
+    
+    def run_in_background(self, fn, on_finished, error_prefix):
+        """
+        在线程池中运行 fn(report)，取消之前未完成的任务
+        完成后在主线程中调用 on_finished(result)
+        """
+        self.cancel_task()
+        worker = Worker(fn)
+        worker.signals.finished.connect(lambda result: self.on_task_finished(worker, on_finished, result, error_prefix))
+        worker.signals.error.connect(lambda message: self.on_task_error(worker, f"{error_prefix}: {message}"))
+        worker.signals.progress.connect(self.progress_bar.setValue)
+        self.worker = worker
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.thread_pool.start(worker)
+    
+    def cancel_task(self):
+        """取消正在运行的后台任务"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+        self.progress_bar.hide()
+    
+    def on_task_finished(self, worker, on_finished, result, error_prefix):
+        """后台任务完成（主线程）；已被取代的任务结果直接丢弃"""
+        if worker is not self.worker:
+            return
+        self.worker = None
+        self.progress_bar.hide()
+        try:
+            on_finished(result)
+        except Exception as e:
+            self.show_error(f"{error_prefix}: {str(e)}")
+    
+    def on_task_error(self, worker, message):
+        """后台任务出错（主线程）"""
+        if worker is not self.worker:
+            return
+        self.worker = None
+        self.progress_bar.hide()
+        self.show_error(message)
+    
     # ========== 核心功能 ==========
     
     def parse_expression(self, expr_text):
         """解析表达式为 AST"""
+        entry = self.expression_entry(expr_text)
+        return None if entry is None else entry.ast
+    
+    def expression_entry(self, expr_text):
+        """取出表达式的缓存条目（AST、编译函数、导函数），文本未变时不重新解析"""
         try:
-            # 预处理：将 π 和 pi 统一
-            expr_text = expr_text.replace('π', 'pi')
-            
-            # 词法分析
-            lexer = Lexer(expr_text)
-            tokens = lexer.tokenize()
-            
-            # 语法分析
-            parser = Parser(tokens)
-            ast = parser.parse()
-            
-            return ast
+            return expression_cache.entry(expr_text)
         except Exception as e:
             self.show_error(f"表达式解析错误: {str(e)}")
             return None
     
     def parse_x_value(self, x_text):
-        """解析 x 的值"""
+        """解析 x 的值（可以是常数表达式，如 pi/2，与函数值表、命令行相同）"""
         if not x_text:
             return None
         
         try:
-            # 处理特殊常数
-            x_text = x_text.strip().lower()
-            if x_text == 'pi' or x_text == 'π':
-                import math
-                return math.pi
-            elif x_text == 'e':
-                import math
-                return math.e
-            else:
-                return float(x_text)
-        except:
+            return parse_x_value(x_text)
+        except Exception:
             self.show_error(f"无效的 x 值: {x_text}")
             return None
     
@@ -292,11 +417,11 @@ class CalculatorWindow(QMainWindow):
             return
         
         # 解析表达式
-        ast = self.parse_expression(expr_text)
-        if ast is None:
+        entry = self.expression_entry(expr_text)
+        if entry is None:
             return
         
-        self.current_ast = ast
+        self.current_ast = entry.ast
         
         # 获取 x 值
         x_text = self.x_input.text().strip()
@@ -308,8 +433,7 @@ class CalculatorWindow(QMainWindow):
         
         # 计算结果
         try:
-            evaluator = Evaluator(x_value=x_value)
-            result = evaluator.evaluate(ast)
+            result = entry.compiled(x_value)
             
             # 格式化输出
             formatted = format_result(result)
@@ -323,7 +447,7 @@ class CalculatorWindow(QMainWindow):
             self.show_error(f"计算错误: {str(e)}")
     
     def plot_function(self):
-        """绘制函数图像"""
+        """绘制函数图像（后台采样）"""
         expr_text = self.function_input.text().strip()
         if not expr_text:
             self.show_error("请输入函数表达式")
@@ -335,73 +459,286 @@ class CalculatorWindow(QMainWindow):
             return
         
         self.current_ast = ast
+        max_points = self.plotter.view_points(PLOT_POINTS)
         
-        # 绘制函数
-        try:
-            self.plotter.plot_function(ast, label=f'f(x) = {expr_text}', 
-                                      color='blue', linestyle='-')
+        def work(report):
+            return self.plotter.sample_curve(ast, PLOT_RANGE, max_points, callback=report)
+        
+        def done(samples):
+            self.plotter.add_curve(ast, *samples, PLOT_POINTS,
+                                   label=f'f(x) = {expr_text}', color='blue', linestyle='-')
             self.output_display.setText(f"已绘制函数: f(x) = {expr_text}")
-        except Exception as e:
-            self.show_error(f"绘图错误: {str(e)}")
+        
+        self.output_display.setText("正在绘图……")
+        self.run_in_background(work, done, "绘图错误")
     
     def compute_derivative(self):
-        """计算导函数"""
+        """计算导函数（后台求导）"""
         expr_text = self.function_input.text().strip()
         if not expr_text:
             self.show_error("请输入函数表达式")
             return
         
         # 解析表达式
-        if self.current_ast is None:
-            ast = self.parse_expression(expr_text)
-            if ast is None:
-                return
-            self.current_ast = ast
-        
-        # 求导
-        try:
-            derivative_ast = Derivative.differentiate(self.current_ast)
+        entry = self.expression_entry(expr_text)
+        if entry is None:
+            return
+        self.current_ast = entry.ast
+        
+        def work(report):
+            # 符号求导与化简的结果缓存在条目中；重复出现的子式以 u1、u2… 只输出一次
+            # 各步之间报告进度，取消后不再进行下一步
+            raw_derivative = entry.raw_derivative
+            report(0.4)
+            derivative = entry.derivative
+            report(0.8)
+            return raw_derivative, derivative, format_with_bindings(derivative, "f'(x)", max_length=OUTPUT_LENGTH)
+        
+        def done(result):
+            raw_ast, derivative_ast, derivative_str = result
             self.derivative_ast = derivative_ast
             
-            # 转换为字符串
-            derivative_str = ast_to_string(derivative_ast)
-            
             output = f"原函数: f(x) = {expr_text}\n"
-            output += f"导函数: f'(x) = {derivative_str}"
+            if '\n' in derivative_str:
+                output += f"导函数（u1、u2… 为重复出现的子式）:\n{derivative_str}\n"
+            else:
+                output += f"导函数: {derivative_str}\n"
+            output += f"（节点数：化简前 {count_nodes(raw_ast)}，化简后 {count_nodes(derivative_ast)}）"
             
             self.output_display.setText(output)
-            
-        except Exception as e:
-            self.show_error(f"求导错误: {str(e)}")
+        
+        self.output_display.setText("正在求导……")
+        self.run_in_background(work, done, "求导错误")
     
     def plot_derivative(self):
-        """绘制导函数图像"""
-        if self.derivative_ast is None:
-            # 先计算导函数
-            self.compute_derivative()
-            if self.derivative_ast is None:
-                return
-        
-        # 绘制导函数
-        try:
-            expr_text = self.function_input.text().strip()
-            derivative_str = ast_to_string(self.derivative_ast)
-            
-            # 先绘制原函数
-            if self.current_ast:
-                self.plotter.plot_function(self.current_ast, 
-                                          label=f'f(x) = {expr_text}',
-                                          color='blue', linestyle='-')
-            
-            # 再绘制导函数
-            self.plotter.plot_function(self.derivative_ast,
-                                      label=f"f'(x) = {derivative_str}",
-                                      color='red', linestyle='--')
-            
+        """绘制原函数与导函数图像（后台求导与采样）"""
+        expr_text = self.function_input.text().strip()
+        if not expr_text:
+            self.show_error("请输入函数表达式")
+            return
+        
+        entry = self.expression_entry(expr_text)
+        if entry is None:
+            return
+        ast = self.current_ast = entry.ast
+        max_points = self.plotter.view_points(PLOT_POINTS)
+        
+        def work(report):
+            # 导函数字符串仅用于图例；曲线在原函数上用自动微分求值
+            derivative = entry.derivative
+            report(0.2)
+            f_samples = self.plotter.sample_curve(ast, PLOT_RANGE, max_points,
+                                                  callback=lambda p: report(0.2 + p * 0.4))
+            df_samples = self.plotter.sample_curve(ast, PLOT_RANGE, max_points, derivative=True,
+                                                   callback=lambda p: report(0.6 + p * 0.4))
+            return derivative, ast_to_string(derivative, max_length=LABEL_LENGTH), f_samples, df_samples
+        
+        def done(result):
+            derivative, derivative_str, f_samples, df_samples = result
+            self.derivative_ast = derivative
+            self.plotter.add_curve(ast, *f_samples, PLOT_POINTS,
+                                   label=f'f(x) = {expr_text}', color='blue', linestyle='-')
+            self.plotter.add_curve(ast, *df_samples, PLOT_POINTS,
+                                   label=f"f'(x) = {derivative_str}", color='red', linestyle='--',
+                                   derivative=True)
             self.output_display.setText(f"已绘制原函数和导函数")
+        
+        self.output_display.setText("正在绘图……")
+        self.run_in_background(work, done, "绘图错误")
+    
+    def taylor_expand(self):
+        """在 x 值处做泰勒展开，显示多项式并绘制近似曲线"""
+        expr_text = self.function_input.text().strip()
+        if not expr_text:
+            self.show_error("请输入函数表达式")
+            return
+        
+        ast = self.parse_expression(expr_text)
+        if ast is None:
+            return
+        self.current_ast = ast
+        
+        x_text = self.x_input.text().strip()
+        x0 = self.parse_x_value(x_text)
+        if x0 is None:
+            self.show_error("请输入展开点 x 的值")
+            return
+        
+        order = self.taylor_order.value()
+        max_points = self.plotter.view_points(PLOT_POINTS)
+        
+        def work(report):
+            coeffs = taylor_coefficients(ast, x0, order)
+            samples = self.plotter.sample_curve(ast, PLOT_RANGE, max_points, callback=report)
+            return coeffs, samples
+        
+        def done(result):
+            coeffs, samples = result
+            output = f"f(x) 在 x = {x_text} 处的 {order} 阶泰勒展开：\n"
+            output += f"f(x) ≈ {format_taylor_polynomial(coeffs, x0)}"
+            self.output_display.setText(output)
             
+            self.plotter.add_curve(ast, *samples, PLOT_POINTS,
+                                   label=f'f(x) = {expr_text}', color='blue', linestyle='-')
+            self.plotter.plot_taylor(coeffs, x0, PLOT_RANGE, PLOT_POINTS, label=f'P{order}(x)')
+        
+        self.run_in_background(work, done, "泰勒展开错误")
+    
+    def find_features(self):
+        """求方程 f(x) = 0 的根、极值点与拐点，并在图像上标出（后台计算）"""
+        expr_text = self.function_input.text().strip()
+        if not expr_text:
+            self.show_error("请输入函数表达式")
+            return
+        
+        entry = self.expression_entry(expr_text)
+        if entry is None:
+            return
+        ast = self.current_ast = entry.ast
+        # 已有图像时在当前视图范围内求解
+        x_range = tuple(self.plotter.ax.get_xlim()) if self.plotter.plots else PLOT_RANGE
+        plot_curve = not self.plotter.plots
+        max_points = self.plotter.view_points(PLOT_POINTS)
+        
+        def work(report):
+            features = analyze(ast, x_range, callback=lambda p: report(p * 0.8))
+            # (点, 输出中的名称, 图例, 颜色, 标记)；图例字体不含汉字，用数学记号
+            groups = [(features.roots, "根", "f(x) = 0", 'black', 'o'),
+                      (features.minima, "极小值点", "min", 'green', 'v'),
+                      (features.maxima, "极大值点", "max", 'purple', '^'),
+                      (features.inflections, "拐点", "f''(x) = 0", 'orange', 'D')]
+            marks = [(xs, evaluate_vectorized(ast, xs), name, legend, color, marker)
+                     for xs, name, legend, color, marker in groups]
+            samples = None
+            if plot_curve:
+                samples = self.plotter.sample_curve(ast, x_range, max_points,
+                                                    callback=lambda p: report(0.8 + p * 0.2))
+            return marks, samples
+        
+        def done(result):
+            marks, samples = result
+            if samples is not None:
+                self.plotter.add_curve(ast, *samples, PLOT_POINTS,
+                                       label=f'f(x) = {expr_text}', color='blue', linestyle='-')
+            lines = [f"f(x) = {expr_text}，x ∈ [{x_range[0]:.4g}, {x_range[1]:.4g}]"]
+            for xs, ys, name, legend, color, marker in marks:
+                self.plotter.mark_points(xs, ys, legend, color, marker)
+                shown = "，".join(format_result(x) for x in xs[:FEATURES_SHOWN].tolist())
+                if len(xs) > FEATURES_SHOWN:
+                    shown += " ……"
+                lines.append(f"{name}（{len(xs)} 个）: {shown}" if len(xs) else f"{name}: 无")
+            self.output_display.setText("\n".join(lines))
+        
+        self.output_display.setText("正在求根……")
+        self.run_in_background(work, done, "求根错误")
+    
+    def compute_integral(self):
+        """求定积分 ∫[a, b] f(x) dx（x 值输入框为区间 a:b），并在图像上给积分区域着色（后台计算）"""
+        expr_text = self.function_input.text().strip()
+        if not expr_text:
+            self.show_error("请输入函数表达式")
+            return
+        
+        entry = self.expression_entry(expr_text)
+        if entry is None:
+            return
+        ast = self.current_ast = entry.ast
+        
+        try:
+            a, b = parse_interval(self.x_input.text().strip())
         except Exception as e:
-            self.show_error(f"绘图错误: {str(e)}")
+            self.show_error(f"无效的积分区间: {str(e)}")
+            return
+        plot_curve = not self.plotter.plots
+        max_points = self.plotter.view_points(PLOT_POINTS)
+        
+        def work(report):
+            result = integrate(ast, a, b, callback=lambda p: report(p * 0.8))
+            xs = np.linspace(min(a, b), max(a, b), AREA_POINTS)
+            area = (xs, evaluate_vectorized(ast, xs))
+            # 曲线画在积分区间两侧各延伸一半区间长度的范围内
+            margin = max(abs(b - a) / 2, 1.0)
+            x_range = (min(a, b) - margin, max(a, b) + margin)
+            samples = None
+            if plot_curve:
+                samples = self.plotter.sample_curve(ast, x_range, max_points,
+                                                    callback=lambda p: report(0.8 + p * 0.2))
+            return result, area, samples
+        
+        def done(outcome):
+            result, area, samples = outcome
+            if samples is not None:
+                self.plotter.add_curve(ast, *samples, PLOT_POINTS,
+                                       label=f'f(x) = {expr_text}', color='blue', linestyle='-')
+            self.plotter.shade_area(*area, label=f'$\\int_{{{a:g}}}^{{{b:g}}} f(x)\\,dx$')
+            lines = [f"∫[{a:g}, {b:g}] f(x) dx = {format_result(result.value)}",
+                     f"误差估计: {result.error:.3g}，求值点数: {result.evaluations}"]
+            if not result.converged:
+                lines.append("⚠ 未达到要求的精度（积分可能发散）")
+            self.output_display.setText("\n".join(lines))
+        
+        self.output_display.setText("正在计算定积分……")
+        self.run_in_background(work, done, "积分错误")
+    
+    def make_table(self):
+        """生成函数值表：在 x 的范围或列表上一次向量化求值（后台计算）"""
+        expr_text = self.function_input.text().strip()
+        if not expr_text:
+            self.show_error("请输入函数表达式")
+            return
+        
+        entry = self.expression_entry(expr_text)
+        if entry is None:
+            return
+        ast = self.current_ast = entry.ast
+        
+        x_text = self.x_input.text().strip()
+        try:
+            xs = parse_x_values(x_text)
+        except Exception as e:
+            self.show_error(f"无效的 x 范围: {str(e)}")
+            return
+        derivative = self.table_derivative.isChecked()
+        
+        def work(report):
+            return ValueTable.compute(ast, xs, derivative, callback=report)
+        
+        def done(table):
+            self.value_table = table
+            self.table_model.set_table(table)
+            self.right_tabs.setCurrentWidget(self.table_panel)
+            undefined = int(np.count_nonzero(~np.isfinite(table.values)))
+            output = f"已生成函数值表：{len(table)} 行"
+            if undefined:
+                output += f"（其中 {undefined} 个点无定义）"
+            self.output_display.setText(output)
+        
+        self.output_display.setText("正在生成函数值表……")
+        self.run_in_background(work, done, "函数值表错误")
+    
+    def export_table(self, fmt):
+        """导出函数值表为 CSV 或 NPY（后台写文件）"""
+        table = self.value_table
+        if table is None:
+            self.show_error("请先生成函数值表")
+            return
+        file_filter = "CSV 文件 (*.csv)" if fmt == 'csv' else "NumPy 数组 (*.npy)"
+        path, _ = QFileDialog.getSaveFileName(self, "导出函数值表", f"函数值表.{fmt}", file_filter)
+        if not path:
+            return
+        
+        def work(report):
+            if fmt == 'csv':
+                table.save_csv(path, callback=report)
+            else:
+                table.save_npy(path)
+            return path
+        
+        def done(path):
+            self.output_display.setText(f"已导出 {len(table)} 行到 {path}")
+        
+        self.output_display.setText("正在导出……")
+        self.run_in_background(work, done, "导出错误")
     
     def show_error(self, message):
         """显示错误信息"""
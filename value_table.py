@@ -0,0 +1,132 @@
+"""
+函数值表（Value Table）
+功能：在 x 的等差序列或给定的 x 列表上一次性向量化求值（可同时求导数），
+结果以列数组保存，导出为 CSV 或 NPY
+本模块不导入 PyQt5，界面中的表格模型见 table_model.py，命令行的 table 子命令也使用本模块
+"""
+import math
+import numpy as np
+from evaluator import Evaluator, evaluate_vectorized
+from autodiff import evaluate_dual_vectorized
+from expression_cache import expression_cache
+
+MAX_ROWS = 10_000_000  # 函数值表的最大行数
+CSV_CHUNK = 100_000    # 导出 CSV 时每次转换的行数
+COMPUTE_CHUNK = 250_000  # 生成函数值表时每次求值的行数
+
+def x_range(start, stop, step):
+    """起点到终点（含）、给定步长的 x 序列"""
+    if not step > 0:
+        raise Exception("步长必须大于 0")
+    count = math.floor((stop - start) / step + 1e-9) + 1
+    if count > MAX_ROWS:
+        raise Exception(f"点数过多（{count}），最多 {MAX_ROWS} 个")
+    return start + step * np.arange(max(count, 0))
+
+def parse_x_value(text):
+    """解析 x 值（可以是常数表达式，如 pi/2）"""
+    return float(Evaluator().evaluate(expression_cache.parse(text)))
+
+def parse_x_values(text):
+    """
+    解析函数值表的 x 输入
+    "起点:终点:步长"（如 -5:5:0.5）为等差序列，否则为逗号分隔的 x 列表（如 1, 2, pi/2）；
+    每一项都可以是常数表达式，函数参数中的逗号（如 log(2, 8)）不作为分隔符
+    """
+    parts = _split_top_level(text, ':')
+    if len(parts) == 3:
+        start, stop, step = (parse_x_value(part) for part in parts)
+        return x_range(start, stop, step)
+    if len(parts) != 1:
+        raise Exception("范围格式应为 起点:终点:步长")
+    values = [parse_x_value(part) for part in _split_top_level(text, ',') if part.strip()]
+    if not values:
+        raise Exception("请输入 x 的范围或列表")
+    return np.array(values, dtype=float)
+
+def _split_top_level(text, separator):
+    """按括号外的分隔符切分"""
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+class ValueTable:
+    """
+    函数值表：x、f(x) 与（可选的）f'(x) 三列 float64 数组
+    无定义的点（定义域外、除以零等）为 NaN
+    """
+    def __init__(self, xs, values, derivatives=None):
+        self.xs = xs
+        self.values = values
+        self.derivatives = derivatives
+
+    @staticmethod
+    def compute(ast, xs, derivative=False, callback=None):
+        """
+        在 x 上分块向量化求值（每块 COMPUTE_CHUNK 行）；derivative 为 True 时用自动微分同时求导数
+        callback(fraction) 每块之后报告进度，可抛出异常以中止计算
+        """
+        xs = np.asarray(xs, dtype=float)
+        values = np.empty(xs.shape)
+        derivatives = np.empty(xs.shape) if derivative else None
+        for start in range(0, len(xs), COMPUTE_CHUNK):
+            chunk = slice(start, start + COMPUTE_CHUNK)
+            if derivative:
+                values[chunk], derivatives[chunk] = evaluate_dual_vectorized(ast, xs[chunk])
+            else:
+                values[chunk] = evaluate_vectorized(ast, xs[chunk])
+            if callback:
+                callback(min(start + COMPUTE_CHUNK, len(xs)) / len(xs))
+        return ValueTable(xs, values, derivatives)
+
+    @property
+    def columns(self):
+        """列名"""
+        if self.derivatives is None:
+            return ['x', 'value']
+        return ['x', 'value', 'derivative']
+
+    def column(self, index):
+        """第 index 列的数组"""
+        return (self.xs, self.values, self.derivatives)[index]
+
+    def __len__(self):
+        return len(self.xs)
+
+    def to_array(self):
+        """n×2 或 n×3 的二维数组"""
+        return np.column_stack([self.column(i) for i in range(len(self.columns))])
+
+    def save_npy(self, path):
+        """导出为 NPY（二维 float64 数组，列顺序同 columns）"""
+        np.save(path, self.to_array())
+
+    def save_csv(self, path, callback=None):
+        """
+        导出为 CSV（带表头，无定义的值写为空，数值格式与命令行 table 子命令一致）
+        分块转换以限制内存占用；callback(fraction) 报告进度
+        """
+        columns = [self.column(i) for i in range(len(self.columns))]
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(','.join(self.columns) + '\n')
+            for start in range(0, len(self), CSV_CHUNK):
+                chunk = [_csv_strings(column[start:start + CSV_CHUNK]) for column in columns]
+                f.write('\n'.join(map(','.join, zip(*chunk))))
+                f.write('\n')
+                if callback:
+                    callback(min(start + CSV_CHUNK, len(self)) / len(self))
+
+def _csv_strings(values):
+    """一列数值的 CSV 文本（与 csv 模块写出 float 相同），NaN 与无穷写为空"""
+    strings = list(map(repr, values.tolist()))
+    for i in np.flatnonzero(~np.isfinite(values)).tolist():
+        strings[i] = ''
+    return strings
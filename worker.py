@@ -0,0 +1,69 @@
+"""
+后台任务（Worker）
+功能：在线程池中执行求值、求导与采样，避免阻塞界面；
+支持进度报告与取消，结果通过 Qt 信号回到主线程
+"""
+import threading
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+class Cancelled(Exception):
+    """任务已被取消"""
+    pass
+
+class CancelToken:
+    """取消标记：主线程调用 cancel()，后台任务在检查点调用 check()"""
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """请求取消"""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """已取消时抛出 Cancelled，中止后台计算"""
+        if self._event.is_set():
+            raise Cancelled()
+
+class WorkerSignals(QObject):
+    """后台任务的信号（在主线程中接收）"""
+    finished = pyqtSignal(object)  # 计算结果
+    error = pyqtSignal(str)        # 错误信息
+    progress = pyqtSignal(int)     # 进度百分比
+
+class Worker(QRunnable):
+    """
+    后台任务
+    fn(report) 在线程池中运行，report(fraction) 报告进度（0~1）并检查取消
+    """
+    def __init__(self, fn):
+        super().__init__()
+        # 由 Python 持有对象，避免线程池在 run() 结束后删除底层对象
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.token = CancelToken()
+        self.signals = WorkerSignals()
+
+    def report(self, fraction):
+        """报告进度；任务已取消时中止计算"""
+        self.token.check()
+        self.signals.progress.emit(int(fraction * 100))
+
+    def cancel(self):
+        """取消任务（已在运行的计算在下一个检查点停止）"""
+        self.token.cancel()
+
+    def run(self):
+        try:
+            result = self.fn(self.report)
+        except Cancelled:
+            return
+        except Exception as e:
+            if not self.token.cancelled:
+                self.signals.error.emit(str(e))
+            return
+        if not self.token.cancelled:
+            self.signals.finished.emit(result)